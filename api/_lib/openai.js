@@ -0,0 +1,109 @@
+/**
+ * OpenAI APIを使った要約・フレーズ生成の共通処理
+ * api/_lib/ 以下はVercelのServerless Functionとしてデプロイされない（各APIから読み込んで使う）
+ * OpenAI APIキーはVercelの環境変数に保存
+ */
+import OpenAI from 'openai';
+
+const openai = new OpenAI({
+  apiKey: process.env.OPENAI_API_KEY,
+});
+
+/**
+ * ニュースを要約
+ */
+export async function summarizeNews(title, content) {
+  const prompt = `以下のニュース記事を簡潔に要約してください（100-150語程度）。
+
+タイトル: ${title}
+
+本文:
+${content.substring(0, 3000)}
+
+要約:`;
+
+  const response = await openai.chat.completions.create({
+    model: 'gpt-4o-mini',
+    messages: [
+      {
+        role: 'system',
+        content: 'You are a helpful assistant that summarizes news articles concisely in English.',
+      },
+      {
+        role: 'user',
+        content: prompt,
+      },
+    ],
+    max_tokens: 200,
+    temperature: 0.7,
+  });
+
+  return response.choices[0].message.content.trim();
+}
+
+/**
+ * Advancedフレーズを生成
+ * excludeには既に紹介済みのフレーズを指定する（不足分の追加生成時など）
+ */
+export async function generatePhrases(title, summary, count = 10, exclude = []) {
+  const prompt = `以下のニュース記事を基に、議論や意見を述べる際に使えるAdvancedレベルの英語フレーズ、表現、または単語を${count}個生成してください。
+各フレーズ/表現/単語には、その意味や使用例を簡潔に説明してください。
+
+ニュースタイトル: ${title}
+要約: ${summary}
+
+形式:
+1. フレーズ/表現/単語 - 説明
+${formatExclude(exclude)}
+出力:`;
+
+  const response = await openai.chat.completions.create({
+    model: 'gpt-4o-mini',
+    messages: [
+      {
+        role: 'system',
+        content: 'You are an English language expert that provides advanced-level phrases, expressions, and vocabulary for discussing news topics.',
+      },
+      {
+        role: 'user',
+        content: prompt,
+      },
+    ],
+    max_tokens: 800,
+    temperature: 0.8,
+  });
+
+  const phrasesText = response.choices[0].message.content.trim();
+  return parsePhrases(phrasesText, count);
+}
+
+// 既に紹介済みのフレーズをプロンプトに含める
+export function formatExclude(exclude) {
+  if (!Array.isArray(exclude) || exclude.length === 0) return '';
+  const items = exclude.slice(0, 50).map((phrase) => `- ${String(phrase).split(' - ')[0]}`);
+  return `\n以下のフレーズ/表現/単語は既に紹介済みのため、含めないでください:\n${items.join('\n')}\n`;
+}
+
+export function parsePhrases(text, count) {
+  const phrases = [];
+  const lines = text.split('\n');
+
+  for (const line of lines) {
+    const trimmed = line.trim();
+    if (!trimmed) continue;
+
+    // 番号付きリストや箇条書きを処理
+    let cleaned = trimmed;
+    if (trimmed[0].match(/[\d\-•]/)) {
+      cleaned = trimmed.replace(/^[\d\-•\)\.\s]+/, '').trim();
+    }
+
+    if (cleaned.length > 10) {
+      phrases.push(cleaned);
+      if (phrases.length >= count) break;
+    }
+  }
+
+  // パースに失敗した場合は全体を返す
+  return phrases.length > 0 ? phrases : [text];
+}
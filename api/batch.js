@@ -0,0 +1,67 @@
+/**
+ * Vercel Serverless Function: 要約・フレーズ一括生成API
+ * 複数のニュースを1回のリクエストで受け取り、要約とフレーズ生成を並列に実行する
+ */
+import { generatePhrases, summarizeNews } from './_lib/openai.js';
+
+// 1リクエストで受け付けるニュース数の上限
+const MAX_ARTICLES = 10;
+
+/**
+ * 1件のニュースを処理（要約の後にフレーズを生成）
+ * 失敗した場合は他のニュースに影響しないようエラー内容を返す
+ */
+async function processArticle(article, count) {
+  if (!article || !article.title || !article.content) {
+    return { error: 'Title and content are required' };
+  }
+
+  try {
+    const summary = await summarizeNews(article.title, article.content);
+    const phrases = await generatePhrases(article.title, summary, count, article.exclude);
+    return { summary, phrases };
+  } catch (error) {
+    console.error(`Error processing article: ${article.title}`, error);
+    return { error: error.message };
+  }
+}
+
+export default async function handler(req, res) {
+  // CORS設定
+  res.setHeader('Access-Control-Allow-Origin', '*');
+  res.setHeader('Access-Control-Allow-Methods', 'POST, OPTIONS');
+  res.setHeader('Access-Control-Allow-Headers', 'Content-Type');
+
+  if (req.method === 'OPTIONS') {
+    return res.status(200).end();
+  }
+
+  if (req.method !== 'POST') {
+    return res.status(405).json({ error: 'Method not allowed' });
+  }
+
+  try {
+    const { articles, count = 10 } = req.body;
+
+    if (!Array.isArray(articles) || articles.length === 0) {
+      return res.status(400).json({ error: 'Articles are required' });
+    }
+
+    if (articles.length > MAX_ARTICLES) {
+      return res.status(400).json({ error: `Up to ${MAX_ARTICLES} articles are allowed` });
+    }
+
+    // 各ニュースの処理を並列に実行（結果はリクエストの順序で返す）
+    const results = await Promise.all(
+      articles.map((article) => processArticle(article, count))
+    );
+
+    return res.status(200).json({ results });
+  } catch (error) {
+    console.error('Error in batch API:', error);
+    return res.status(500).json({
+      error: 'Failed to process articles',
+      message: error.message,
+    });
+  }
+}
@@ -4,105 +4,12 @@
  */
 import { writeFile, readFile, mkdir } from 'fs/promises';
 import { join } from 'path';
-import OpenAI from 'openai';
-
-const openai = new OpenAI({
-  apiKey: process.env.OPENAI_API_KEY,
-});
+import { generatePhrases, summarizeNews } from './_lib/openai.js';
 
 // データ保存先（Vercelの/tmpディレクトリを使用）
 const DATA_DIR = '/tmp/daily-news';
 const DATA_FILE = join(DATA_DIR, 'news-data.json');
 
-/**
- * ニュースを要約
- */
-async function summarizeNews(title, content) {
-  const prompt = `以下のニュース記事を簡潔に要約してください（100-150語程度）。
-
-タイトル: ${title}
-
-本文:
-${content.substring(0, 3000)}
-
-要約:`;
-
-  const response = await openai.chat.completions.create({
-    model: 'gpt-4o-mini',
-    messages: [
-      {
-        role: 'system',
-        content: 'You are a helpful assistant that summarizes news articles concisely in English.',
-      },
-      {
-        role: 'user',
-        content: prompt,
-      },
-    ],
-    max_tokens: 200,
-    temperature: 0.7,
-  });
-
-  return response.choices[0].message.content.trim();
-}
-
-/**
- * Advancedフレーズを生成
- */
-async function generatePhrases(title, summary, count = 10) {
-  const prompt = `以下のニュース記事を基に、議論や意見を述べる際に使えるAdvancedレベルの英語フレーズ、表現、または単語を${count}個生成してください。
-各フレーズ/表現/単語には、その意味や使用例を簡潔に説明してください。
-
-ニュースタイトル: ${title}
-要約: ${summary}
-
-形式:
-1. フレーズ/表現/単語 - 説明
-
-出力:`;
-
-  const response = await openai.chat.completions.create({
-    model: 'gpt-4o-mini',
-    messages: [
-      {
-        role: 'system',
-        content: 'You are an English language expert that provides advanced-level phrases, expressions, and vocabulary for discussing news topics.',
-      },
-      {
-        role: 'user',
-        content: prompt,
-      },
-    ],
-    max_tokens: 800,
-    temperature: 0.8,
-  });
-
-  const phrasesText = response.choices[0].message.content.trim();
-  return parsePhrases(phrasesText, count);
-}
-
-function parsePhrases(text, count) {
-  const phrases = [];
-  const lines = text.split('\n');
-
-  for (const line of lines) {
-    const trimmed = line.trim();
-    if (!trimmed) continue;
-
-    let cleaned = trimmed;
-    if (trimmed[0].match(/[\d\-•]/)) {
-      cleaned = trimmed.replace(/^[\d\-•\)\.\s]+/, '').trim();
-    }
-
-    if (cleaned.length > 10) {
-      phrases.push(cleaned);
-      if (phrases.length >= count) break;
-    }
-  }
-
-  return phrases.length > 0 ? phrases : [text];
-}
-
 /**
  * DMM英会話のDaily Newsを取得
  */
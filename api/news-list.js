@@ -1,17 +1,26 @@
 /**
  * Vercel Serverless Function: 保存されたニュース一覧を取得するAPI
+ * main.pyが書き出したダイジェスト（DIGEST_URLを設定した場合はVercel Blobにアップロードしたもの、
+ * 設定していない場合はデプロイに含めたpublic/digest/latest.json）をそのまま返す。
+ * ダイジェストがない場合は/api/daily-newsが保存したデータを返す
  */
 import { readFile } from 'fs/promises';
 import { join } from 'path';
+import { gzipSync } from 'zlib';
 
 const DATA_DIR = '/tmp/daily-news';
 const DATA_FILE = join(DATA_DIR, 'news-data.json');
 
+const DIGEST_FILE = join(process.cwd(), 'public', 'digest', 'latest.json');
+// Vercel Blobにアップロードしたlatest.jsonの公開URL（例: https://<ストアID>.public.blob.vercel-storage.com/digest/latest.json）
+const DIGEST_URL = process.env.DIGEST_URL || '';
+const DIGEST_CACHE_CONTROL = 'public, max-age=0, s-maxage=300, stale-while-revalidate=86400';
+
 export default async function handler(req, res) {
   // CORS設定
   res.setHeader('Access-Control-Allow-Origin', '*');
   res.setHeader('Access-Control-Allow-Methods', 'GET, OPTIONS');
-  res.setHeader('Access-Control-Allow-Headers', 'Content-Type');
+  res.setHeader('Access-Control-Allow-Headers', 'Content-Type, If-None-Match');
 
   if (req.method === 'OPTIONS') {
     return res.status(200).end();
@@ -22,6 +31,10 @@ export default async function handler(req, res) {
   }
 
   try {
+    if (await sendDigest(req, res)) {
+      return;
+    }
+
     // データファイルを読み込む
     const data = await readFile(DATA_FILE, 'utf-8');
     const newsData = JSON.parse(data);
@@ -45,3 +58,56 @@ export default async function handler(req, res) {
   }
 }
 
+// ダイジェストの内容（latest.json）と、あればgzip圧縮版を読み込む（ない場合はnull）
+async function loadDigest() {
+  if (DIGEST_URL) {
+    const response = await fetch(DIGEST_URL, { cache: 'no-store' });
+    if (response.ok) {
+      const body = Buffer.from(await response.arrayBuffer());
+      return { body, compressed: null };
+    }
+    if (response.status !== 404) {
+      console.error(`Failed to fetch digest: ${response.status}`);
+    }
+  }
+
+  try {
+    const body = await readFile(DIGEST_FILE);
+    const compressed = await readFile(`${DIGEST_FILE}.gz`).catch((error) => {
+      if (error.code === 'ENOENT') return null;
+      throw error;
+    });
+    return { body, compressed };
+  } catch (error) {
+    if (error.code === 'ENOENT') return null;
+    throw error;
+  }
+}
+
+// ダイジェストをキャッシュヘッダー付きで返す（ETagが一致する場合は304、gzipを受け付ける場合は圧縮版）
+async function sendDigest(req, res) {
+  const digest = await loadDigest();
+  if (!digest) return false;
+  const { body } = digest;
+
+  const { etag } = JSON.parse(body.toString('utf-8'));
+  res.setHeader('Cache-Control', DIGEST_CACHE_CONTROL);
+  res.setHeader('Vary', 'Accept-Encoding');
+  if (etag) {
+    res.setHeader('ETag', etag);
+    const ifNoneMatch = req.headers['if-none-match'] || '';
+    if (ifNoneMatch.split(',').map((tag) => tag.trim().replace(/^W\//, '')).includes(etag)) {
+      res.status(304).end();
+      return true;
+    }
+  }
+
+  res.setHeader('Content-Type', 'application/json; charset=utf-8');
+  if (/\bgzip\b/.test(req.headers['accept-encoding'] || '')) {
+    res.setHeader('Content-Encoding', 'gzip');
+    res.status(200).send(digest.compressed || gzipSync(body));
+    return true;
+  }
+  res.status(200).send(body);
+  return true;
+}
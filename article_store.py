@@ -0,0 +1,192 @@
+"""
+処理済みの記事を保存する永続ストアモジュール
+正規化したURLと本文ハッシュをキーに、本文・要約・フレーズ・配信状況をSQLiteに記録する
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from config import ARTICLE_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+# 記事の処理段階
+STATUS_SCRAPED = 'scraped'
+STATUS_PROCESSED = 'processed'
+STATUS_DELIVERED = 'delivered'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    date TEXT,
+    summary TEXT,
+    phrases TEXT,
+    status TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+
+def canonical_url(url: str) -> str:
+    """
+    記事URLを正規化（スキーム・ホストの小文字化、クエリ・フラグメント・末尾スラッシュの除去）
+
+    Args:
+        url: 記事のURL
+
+    Returns:
+        正規化したURL
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, '', ''))
+
+
+def article_id(url: str) -> str:
+    """記事を識別する短いID（正規化したURLのハッシュの先頭12文字、ログ・計測で記事を突き合わせるのに使う）"""
+    return hashlib.sha256(canonical_url(url).encode('utf-8')).hexdigest()[:12]
+
+
+def content_hash(content: str) -> str:
+    """記事本文のハッシュを計算"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class ArticleStore:
+    """記事の処理状況を記録するSQLiteストア"""
+
+    def __init__(self, path: str = ARTICLE_STORE_PATH):
+        """
+        Args:
+            path: SQLiteデータベースのパス
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute(SCHEMA)
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        記事のレコードを取得
+
+        Args:
+            url: 記事のURL
+
+        Returns:
+            レコード（存在しない場合はNone）
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM articles WHERE url = ?", (canonical_url(url),)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def list_by_status(self, status: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        指定した処理段階の記事を取得（直近に記録した記事から最大limit件を、記録した順に返す）
+
+        Args:
+            status: 処理段階（STATUS_SCRAPED・STATUS_PROCESSED・STATUS_DELIVERED）
+            limit: 取得する件数の上限（省略時はすべて）
+
+        Returns:
+            レコードのリスト
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM articles WHERE status = ? ORDER BY updated_at DESC, rowid DESC LIMIT ?",
+                (status, -1 if limit is None else limit)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in reversed(rows)]
+
+    def save_scraped(self, news: Dict[str, str]) -> Dict:
+        """
+        スクレイピングした記事を記録
+
+        本文が変わっていない場合は既存の要約・フレーズ・配信状況を保持し、
+        変わっている場合は処理段階をscrapedに戻す
+
+        Args:
+            news: ニュース辞書（title, url, content, dateを含む）
+
+        Returns:
+            記録後のレコード
+        """
+        url = canonical_url(news['url'])
+        digest = content_hash(news['content'])
+        now = datetime.now().isoformat()
+
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT content_hash FROM articles WHERE url = ?", (url,)
+            ).fetchone()
+
+            if row and row['content_hash'] == digest:
+                self._conn.execute(
+                    "UPDATE articles SET title = ?, date = ?, updated_at = ? WHERE url = ?",
+                    (news['title'], news.get('date'), now, url)
+                )
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO articles "
+                    "(url, content_hash, title, content, date, summary, phrases, status, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, ?)",
+                    (url, digest, news['title'], news['content'], news.get('date'), STATUS_SCRAPED, now)
+                )
+
+            row = self._conn.execute("SELECT * FROM articles WHERE url = ?", (url,)).fetchone()
+        return self._row_to_dict(row)
+
+    def save_processed(self, url: str, summary: str, phrases: List[str]):
+        """
+        要約とフレーズを記録し、処理段階をprocessedにする
+
+        Args:
+            url: 記事のURL
+            summary: 要約
+            phrases: フレーズのリスト
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE articles SET summary = ?, phrases = ?, status = ?, updated_at = ? WHERE url = ?",
+                (summary, json.dumps(phrases, ensure_ascii=False), STATUS_PROCESSED,
+                 datetime.now().isoformat(), canonical_url(url))
+            )
+
+    def mark_delivered(self, url: str):
+        """
+        記事の処理段階をdeliveredにする
+
+        Args:
+            url: 記事のURL
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE articles SET status = ?, updated_at = ? WHERE url = ?",
+                (STATUS_DELIVERED, datetime.now().isoformat(), canonical_url(url))
+            )
+
+    def close(self):
+        """データベース接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        record['phrases'] = json.loads(record['phrases']) if record['phrases'] else []
+        return record
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Daily Newsのアーカイブ（過去の一覧ページ）を巡回して記事を蓄積するバックフィルモジュール
+
+ページごとに記事を取得してJSONLファイルに追記し、ページが終わるたびに再開位置を記録する。
+中断した場合は次回の実行で続きのページから再開し、記事ストアに記録済みの記事は取得しない
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import requests
+
+from article_store import ArticleStore, canonical_url
+from config import (
+    DMM_DAILY_NEWS_URL,
+    PHRASES_PER_NEWS,
+    BACKFILL_PAGE_URL_TEMPLATE,
+    BACKFILL_MAX_PAGES,
+    BACKFILL_PAGE_SIZE,
+    BACKFILL_WORKERS,
+    BACKFILL_HOST_DELAY,
+    BACKFILL_OUTPUT_PATH,
+    BACKFILL_CHECKPOINT_PATH,
+)
+from dmm_scraper import DMMNewsScraper
+from logging_config import setup_logging
+from metrics import get_metrics
+from news_processor import NewsProcessor
+from news_source import HostThrottle
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveBackfill:
+    """アーカイブの一覧ページを順に巡回し、未取得の記事をJSONLファイルに追記するクラス"""
+
+    def __init__(self, scraper: DMMNewsScraper, store: ArticleStore,
+                 output_path: str = BACKFILL_OUTPUT_PATH, checkpoint_path: str = BACKFILL_CHECKPOINT_PATH,
+                 page_url_template: str = BACKFILL_PAGE_URL_TEMPLATE, page_size: int = BACKFILL_PAGE_SIZE,
+                 workers: int = BACKFILL_WORKERS, host_delay: float = BACKFILL_HOST_DELAY,
+                 processor: Optional[NewsProcessor] = None):
+        """
+        Args:
+            scraper: 一覧・記事ページの取得に使用するスクレイパー
+            store: 取得済みの記事を記録する記事ストア（重複の除外に使用）
+            output_path: 記事を追記するJSONLファイル
+            checkpoint_path: 再開位置を記録するファイル
+            page_url_template: アーカイブの各ページのURL（{base_url}と{page}を置き換える）
+            page_size: 1ページから抽出する記事数の上限
+            workers: 記事ページを並列取得するワーカー数
+            host_delay: 同じホストへのリクエストの最小間隔（秒）
+            processor: 指定した場合、要約とフレーズも生成して記録する
+        """
+        self.scraper = scraper
+        self.store = store
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path
+        self.page_url_template = page_url_template
+        self.page_size = page_size
+        self.workers = max(1, workers)
+        self.throttle = HostThrottle(host_delay)
+        self.processor = processor
+
+    def page_url(self, page: int) -> str:
+        """アーカイブのページ番号からURLを求める"""
+        return self.page_url_template.format(base_url=self.scraper.base_url, page=page)
+
+    def run(self, max_pages: int = BACKFILL_MAX_PAGES, restart: bool = False) -> Dict[str, Any]:
+        """
+        前回の続きのページから巡回
+
+        Args:
+            max_pages: この実行で巡回するページ数の上限
+            restart: Trueの場合、再開位置を無視して最初のページから巡回する（出力ファイルには追記する）
+
+        Returns:
+            実行結果（巡回したページ数、追記した記事数、重複で除外した記事数、アーカイブの終端に達したか）
+        """
+        checkpoint = {} if restart else self._load_checkpoint()
+        page = checkpoint.get('next_page', 1)
+        offset = checkpoint.get('output_offset') if checkpoint.get('output_path') == self.output_path else None
+        written_urls = self._recover_output(offset)
+        result = {'pages': 0, 'written': 0, 'skipped': 0, 'completed': False}
+
+        directory = os.path.dirname(self.output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        logger.info("バックフィルを%sページ目から開始します（最大%sページ）", page, max_pages)
+        with open(self.output_path, 'ab') as output, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill') as executor:
+            for _ in range(max_pages):
+                url = self.page_url(page)
+                with get_metrics().span('backfill.page') as span:
+                    candidates = self._page_candidates(url)
+                    if candidates is None:
+                        result['completed'] = True
+                        break
+
+                    new = [c for c in candidates if not self._is_known(c[1], written_urls)]
+                    result['skipped'] += len(candidates) - len(new)
+                    written = self._backfill_page(new, output, executor)
+                    result['written'] += written
+                    span['articles'] = written
+
+                page += 1
+                result['pages'] += 1
+                # このページまでの記事を書き終えた時点を再開位置にする
+                output.flush()
+                os.fsync(output.fileno())
+                self._save_checkpoint(page, output.tell(), result)
+                written_urls.clear()
+                logger.info("%sページ目: %s件を追記、%s件は取得済み", page - 1, written, len(candidates) - len(new))
+
+        if self.scraper.http_cache is not None:
+            self.scraper.http_cache.flush()
+
+        logger.info(
+            "バックフィルを終了しました: %sページ、%s件を追記、%s件は取得済み%s",
+            result['pages'], result['written'], result['skipped'], '（アーカイブの終端）' if result['completed'] else ''
+        )
+        return result
+
+    def _page_candidates(self, url: str) -> Optional[List[Tuple[str, str]]]:
+        """一覧ページの候補記事（ページが存在しないか記事がない場合はアーカイブの終端としてNone）"""
+        self.throttle.wait(url)
+        try:
+            candidates = self.scraper.get_listing_candidates(url, self.page_size)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+        return candidates or None
+
+    def _is_known(self, url: str, written_urls: Set[str]) -> bool:
+        """記事ストアに記録済みか、中断したページで出力済みの記事か"""
+        return canonical_url(url) in written_urls or self.store.get(url) is not None
+
+    def _backfill_page(self, candidates: List[Tuple[str, str]], output, executor: ThreadPoolExecutor) -> int:
+        """1ページ分の記事を並列に取得し、一覧ページの順序で出力する"""
+        futures = [executor.submit(self._fetch_content, url) for _, url in candidates]
+        articles = []
+        for (title, url), future in zip(candidates, futures):
+            content = future.result()
+            if content:
+                articles.append({'title': title, 'url': url, 'content': content, 'date': None})
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(articles)
+        if self.processor is not None and articles:
+            results = self.processor.process_news_batch(articles, PHRASES_PER_NEWS)
+
+        for news, processed in zip(articles, results):
+            record = dict(news, fetched_at=datetime.now().isoformat())
+            if processed is not None:
+                record.update(summary=processed['summary'], phrases=processed['phrases'])
+            # 出力してから記事ストアに記録する（中断しても記事が出力から欠けないようにする）
+            output.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+            output.flush()
+            self.store.save_scraped(news)
+            if processed is not None:
+                self.store.save_processed(news['url'], processed['summary'], processed['phrases'])
+        return len(articles)
+
+    def _fetch_content(self, url: str) -> str:
+        self.throttle.wait(url)
+        return self.scraper.get_news_content(url)
+
+    def _recover_output(self, offset: Optional[int]) -> Set[str]:
+        """
+        中断時の出力ファイルを整える（書きかけの行を削除し、再開位置以降に出力済みの記事のURLを返す）
+
+        Args:
+            offset: 最後に完了したページの終わりの位置（バイト、Noneの場合は重複を記事ストアだけで判定する）
+        """
+        if not os.path.exists(self.output_path):
+            return set()
+
+        urls = set()
+        with open(self.output_path, 'rb+') as f:
+            f.seek(offset or 0)
+            end = f.tell()
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                if offset is not None:
+                    try:
+                        urls.add(canonical_url(json.loads(line)['url']))
+                    except (ValueError, KeyError):
+                        break
+                end += len(line)
+            if end < os.path.getsize(self.output_path):
+                logger.warning("出力ファイルの書きかけの行を削除します: %s", self.output_path)
+                f.truncate(end)
+        return urls
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("再開位置を読み込めませんでした。最初のページから巡回します: %s", e)
+            return {}
+
+    def _save_checkpoint(self, next_page: int, output_offset: int, result: Dict[str, Any]):
+        """再開位置を保存（一時ファイルに書き込んでから置き換える）"""
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'next_page': next_page,
+                'output_path': self.output_path,
+                'output_offset': output_offset,
+                'updated_at': datetime.now().isoformat(),
+                'last_run': result,
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="Daily Newsのアーカイブを巡回して記事を蓄積する")
+    parser.add_argument('--pages', type=int, default=BACKFILL_MAX_PAGES, help='この実行で巡回するページ数の上限')
+    parser.add_argument('--output', default=BACKFILL_OUTPUT_PATH, help='記事を追記するJSONLファイル')
+    parser.add_argument('--checkpoint', default=BACKFILL_CHECKPOINT_PATH, help='再開位置を記録するファイル')
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS, help='記事ページを並列取得するワーカー数')
+    parser.add_argument('--delay', type=float, default=BACKFILL_HOST_DELAY, help='同じホストへのリクエストの最小間隔（秒）')
+    parser.add_argument('--process', action='store_true', help='要約とフレーズも生成する（Vercel APIを使用）')
+    parser.add_argument('--restart', action='store_true', help='再開位置を無視して最初のページから巡回する')
+    parser.add_argument('--base-url', default=DMM_DAILY_NEWS_URL, help='Daily Newsの一覧ページURL')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> bool:
+    """
+    バックフィルを実行
+
+    Returns:
+        エラーなく終了した場合True（中断した場合も次回は続きから再開できる）
+    """
+    args = parse_args(argv)
+    setup_logging()
+    scraper = DMMNewsScraper(base_url=args.base_url, max_workers=args.workers)
+    store = ArticleStore()
+    try:
+        backfill = ArchiveBackfill(
+            scraper, store, output_path=args.output, checkpoint_path=args.checkpoint,
+            workers=args.workers, host_delay=args.delay,
+            processor=NewsProcessor() if args.process else None
+        )
+        backfill.run(args.pages, restart=args.restart)
+        return True
+    except KeyboardInterrupt:
+        logger.warning("バックフィルを中断しました。次回は最後に完了したページの続きから再開します")
+        return False
+    except Exception as e:
+        logger.error("バックフィル中にエラーが発生しました: %s", e, exc_info=True)
+        return False
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
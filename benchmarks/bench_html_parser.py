@@ -0,0 +1,137 @@
+"""
+HTML解析バックエンドのマイクロベンチマーク
+
+保存済みの一覧・記事ページ（benchmarks/fixtures）を各バックエンドで解析し、
+1ページあたりの処理時間と、従来の実装（html.parserで全体を解析）との抽出結果の一致を確認する
+「学習済み」は前回成功したセレクタ（selector_cache）を最初に試した場合の記事ページの処理時間
+
+使い方:
+    python benchmarks/bench_html_parser.py [--repeat 50]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from html_parser import BeautifulSoupBackend, SelectolaxBackend  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def reference_listing_items(html: bytes, limit: int):
+    """従来のDMMNewsScraper.get_latest_newsと同じ方法で一覧ページを解析（比較用）"""
+    soup = BeautifulSoup(html, 'html.parser')
+    news_items = soup.select('article, .news-item, .daily-news-item, a[href*="/daily-news/"]')
+    if not news_items:
+        news_items = soup.find_all('a', href=lambda x: x and '/daily-news/' in x)
+
+    items = []
+    for item in news_items[:limit]:
+        if item.name == 'a':
+            url = item.get('href', '')
+        else:
+            link = item.find('a')
+            url = link.get('href', '') if link else ''
+        title_elem = item.find(['h1', 'h2', 'h3', 'h4', '.title', '.news-title'])
+        if not title_elem:
+            title_elem = item
+        items.append((title_elem.get_text(strip=True), url))
+    return items
+
+
+def reference_extract_content(html: bytes) -> str:
+    """従来のDMMNewsScraper._get_news_contentと同じ方法で本文を抽出（比較用）"""
+    soup = BeautifulSoup(html, 'html.parser')
+    content_selectors = ['.article-content', '.news-content', '.content', 'article p', '.text-content', 'main p']
+
+    content = ""
+    for selector in content_selectors:
+        elements = soup.select(selector)
+        if elements:
+            content = ' '.join([elem.get_text(strip=True) for elem in elements])
+            if len(content) > 100:
+                break
+
+    if not content or len(content) < 100:
+        paragraphs = soup.find_all('p')
+        content = ' '.join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20])
+
+    return content[:5000]
+
+
+def create_backends() -> List:
+    """比較するバックエンドを生成（インストールされていないものは除外）"""
+    backends = [
+        BeautifulSoupBackend('html.parser', strain=False),
+        BeautifulSoupBackend('html.parser'),
+        BeautifulSoupBackend('lxml', strain=False),
+        BeautifulSoupBackend('lxml'),
+    ]
+    try:
+        backends.append(SelectolaxBackend())
+    except ImportError:
+        print("selectolaxがインストールされていないためスキップします")
+    return backends
+
+
+def measure(func: Callable, pages: List[bytes], repeat: int) -> float:
+    """全ページの解析をrepeat回繰り返し、1ページあたりの平均時間（ミリ秒）を返す"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            func(html)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML解析バックエンドのマイクロベンチマーク')
+    parser.add_argument('--repeat', type=int, default=50, help='各ページを解析する回数')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='保存済みページのディレクトリ')
+    args = parser.parse_args()
+
+    listing_paths = sorted(glob.glob(os.path.join(args.fixtures, 'listing*.html')))
+    article_paths = sorted(glob.glob(os.path.join(args.fixtures, 'article*.html')))
+    listings = [open(path, 'rb').read() for path in listing_paths]
+    articles = [open(path, 'rb').read() for path in article_paths]
+    limit = 20
+
+    expected_listings = [reference_listing_items(html, limit) for html in listings]
+    expected_articles = [reference_extract_content(html) for html in articles]
+
+    reference_listing = measure(lambda html: reference_listing_items(html, limit), listings, args.repeat)
+    reference_article = measure(reference_extract_content, articles, args.repeat)
+
+    print(f"一覧ページ {len(listings)}件・記事ページ {len(articles)}件 × {args.repeat}回")
+    print(f"{'バックエンド':<24}{'一覧(ms)':>10}{'記事(ms)':>10}{'学習済み(ms)':>14}{'速度比':>8}  抽出結果")
+    print(f"{'従来の実装':<24}{reference_listing:>10.2f}{reference_article:>10.2f}{'-':>14}{1.0:>7.1f}x")
+
+    mismatched = False
+    for backend in create_backends():
+        same = (
+            [backend.listing_items(html, limit) for html in listings] == expected_listings
+            and [backend.extract_content(html) for html in articles] == expected_articles
+        )
+
+        listing_ms = measure(lambda html: backend.listing_items(html, limit), listings, args.repeat)
+        article_ms = measure(backend.extract_content, articles, args.repeat)
+        speedup = (reference_listing + reference_article) / (listing_ms + article_ms)
+
+        learned = {html: backend.extract_content_with_selector(html)[1] for html in articles}
+        same = same and [backend.extract_content(html, learned[html]) for html in articles] == expected_articles
+        mismatched = mismatched or not same
+        learned_ms = measure(lambda html: backend.extract_content(html, learned[html]), articles, args.repeat)
+
+        print(f"{backend.name:<24}{listing_ms:>10.2f}{article_ms:>10.2f}{learned_ms:>14.2f}{speedup:>7.1f}x  "
+              f"{'一致' if same else '不一致'}")
+
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+起動時のモジュール読み込み時間のベンチマーク（python -X importtime）
+
+エントリーポイントと主なモジュールを毎回新しいPythonプロセスで読み込み、
+- 読み込み時間（累積）のパーセンタイル
+- 読み込み時間（自身）の大きいモジュール
+- 遅延読み込みにしているはずの重い依存（requests・bs4・numpyなど）が読み込まれていないか
+を表示する。重い依存が読み込まれている場合や、--baselineの結果から中央値が許容範囲を超えて
+遅くなった場合は終了コード1を返す
+
+使い方:
+    python benchmarks/bench_import.py --runs 10 --output import.json
+    python benchmarks/bench_import.py --baseline import.json --max-regression 0.2
+"""
+import argparse
+import os
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from bench_pipeline import report, summarize  # noqa: E402
+
+# 計測するモジュール → 読み込み時点では読み込まれないはずの依存
+TARGETS = {
+    'main': ('requests', 'urllib3', 'bs4', 'soupsieve', 'lxml', 'numpy'),
+    'dmm_scraper': ('bs4', 'soupsieve', 'lxml', 'numpy'),
+    'news_processor': ('bs4', 'soupsieve', 'lxml', 'numpy'),
+    'line_bot': ('bs4', 'soupsieve', 'lxml', 'numpy'),
+    'scheduler': ('bs4', 'soupsieve', 'lxml', 'numpy'),
+}
+
+# 読み込み時間（自身）の大きいモジュールを表示する数
+TOP_MODULES = 5
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """
+    -X importtimeの出力を解析
+
+    Returns:
+        (モジュール名, 階層の深さ, 自身の時間(μs), 累積時間(μs))のリスト（読み込みが完了した順）
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 見出し行
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(fields[0]), int(fields[1])))
+    return entries
+
+
+def measure(module: str) -> List[Tuple[str, int, int, int]]:
+    """新しいPythonプロセスでモジュールを読み込み、-X importtimeの結果を返す"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{module}の読み込みに失敗しました:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+
+def loaded_forbidden(entries: List[Tuple[str, int, int, int]], forbidden: Tuple[str, ...]) -> List[str]:
+    """読み込まれていた重い依存（パッケージ名）"""
+    names = {name for name, _, _, _ in entries}
+    return [package for package in forbidden
+            if any(name == package or name.startswith(f'{package}.') for name in names)]
+
+
+def run_target(module: str, forbidden: Tuple[str, ...], runs: int) -> Dict[str, Any]:
+    """モジュールをruns回読み込み、読み込み時間と読み込まれたモジュールを集計"""
+    measure(module)  # .pycの生成を計測に含めない
+    samples = []
+    entries: List[Tuple[str, int, int, int]] = []
+    for _ in range(runs):
+        entries = measure(module)
+        top = [e for e in entries if e[0] == module and e[1] == 0]
+        samples.append(top[-1][3] / 1e6 if top else 0.0)
+
+    heaviest = sorted(entries, key=lambda e: -e[2])[:TOP_MODULES]
+    return {
+        'import_time': summarize(samples),
+        'modules': len(entries),
+        'heaviest': [{'module': name, 'self': self_us / 1e6, 'cumulative': cumulative_us / 1e6}
+                     for name, _, self_us, cumulative_us in heaviest],
+        'forbidden_loaded': loaded_forbidden(entries, forbidden),
+    }
+
+
+def import_times(result: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """比較する項目: モジュールごとの読み込み時間（summarizeの結果）"""
+    return {module: values['import_time'] for module, values in result.get('targets', {}).items()}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='起動時のモジュール読み込み時間のベンチマーク')
+    parser.add_argument('--runs', type=int, default=5, help='各モジュールを読み込む回数')
+    parser.add_argument('--module', action='append', choices=sorted(TARGETS),
+                        help='計測するモジュール（複数指定可、省略時はすべて）')
+    parser.add_argument('--output', help='結果を保存するJSONファイル')
+    parser.add_argument('--baseline', help='比較する以前の結果（JSONファイル）')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='中央値の悪化をこの割合まで許容する（0.2で20%%）')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    modules = args.module or list(TARGETS)
+
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'config': {'runs': args.runs},
+        'targets': {module: run_target(module, TARGETS[module], args.runs) for module in modules},
+    }
+
+    print(f"{'モジュール':<18}{'読込数':>8}{'p50(ms)':>10}{'p90(ms)':>10}{'max(ms)':>10}")
+    for module, values in result['targets'].items():
+        print(f"{module:<18}{values['modules']:>8}" + ''.join(
+            f"{values['import_time'][p] * 1000:>10.1f}" for p in ('p50', 'p90', 'max')))
+
+    print(f"\n読み込み時間（自身）の大きいモジュール（上位{TOP_MODULES}件）")
+    for module, values in result['targets'].items():
+        heaviest = ', '.join(f"{m['module']} {m['self'] * 1000:.1f}ms" for m in values['heaviest'])
+        print(f"  {module}: {heaviest}")
+
+    failed = False
+    for module, values in result['targets'].items():
+        if values['forbidden_loaded']:
+            print(f"\n{module}の読み込みで重い依存が読み込まれています: {', '.join(values['forbidden_loaded'])}")
+            failed = True
+
+    if not report(result, args.output, args.baseline, args.max_regression, metrics=import_times):
+        failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
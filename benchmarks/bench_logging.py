@@ -0,0 +1,133 @@
+"""
+ログ出力が呼び出し元のスレッドに与える遅延のベンチマーク
+
+複数のスレッドから同時にログを出し、logger.info() 1回の呼び出しにかかる時間を
+- sync: ログを出したスレッドでファイル・標準出力に書き込む（以前の設定）
+- queue: logging_config.setup_logging()（キューに入れ、書き込みはバックグラウンドのスレッドで行う）
+で比較する。無効なレベル（DEBUG）の呼び出しの時間もあわせて表示する。
+設定ごとに新しいPythonプロセスで計測し、標準出力への書き込みは /dev/null に捨てる
+
+使い方:
+    python benchmarks/bench_logging.py --threads 8 --calls 2000 --output logging.json
+    python benchmarks/bench_logging.py --baseline logging.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from bench_pipeline import report, summarize  # noqa: E402
+
+MODES = ('sync', 'queue')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='ログ出力が呼び出し元のスレッドに与える遅延のベンチマーク')
+    parser.add_argument('--threads', type=int, default=8, help='同時にログを出すスレッド数')
+    parser.add_argument('--calls', type=int, default=2000, help='スレッドごとのログの回数')
+    parser.add_argument('--output', help='結果を保存するJSONファイル')
+    parser.add_argument('--baseline', help='比較する以前の結果（JSONファイル）')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='中央値の悪化をこの割合まで許容する（0.2で20%%）')
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def run_worker(mode: str, threads: int, calls: int):
+    """1つの設定で計測し、呼び出しごとの時間（秒）をJSONで標準出力に書き出す"""
+    import logging
+
+    sys.path.insert(0, PROJECT_DIR)
+    log_file = os.path.join(tempfile.mkdtemp(prefix='bench-logging-'), 'bench.log')
+    result_stream = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+
+    if mode == 'sync':
+        from logging_config import LOG_FORMAT
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=[
+            logging.FileHandler(log_file, encoding='utf-8'),
+            logging.StreamHandler(sys.stdout),
+        ])
+    else:
+        from logging_config import setup_logging, shutdown_logging
+        setup_logging('INFO', log_file)
+
+    logger = logging.getLogger('bench')
+    samples = {'info': [], 'debug': []}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def work(index: int):
+        info, debug = [], []
+        barrier.wait()
+        for i in range(calls):
+            start = time.perf_counter()
+            logger.info("ニュース %s/%s を処理中: %s", i, calls, f'worker-{index}')
+            info.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            logger.debug("レスポンス: %s", index)
+            debug.append(time.perf_counter() - start)
+        with lock:
+            samples['info'] += info
+            samples['debug'] += debug
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    samples['wall_time'] = [time.perf_counter() - start]
+
+    if mode == 'queue':
+        # キューに残ったログを書き出すまでの時間も計測する
+        start = time.perf_counter()
+        shutdown_logging()
+        samples['drain'] = [time.perf_counter() - start]
+    json.dump(samples, result_stream)
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        run_worker(args.worker, args.threads, args.calls)
+        return
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    stages = {}
+    for mode in MODES:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', mode,
+             '--threads', str(args.threads), '--calls', str(args.calls)],
+            capture_output=True, text=True, check=True, cwd=PROJECT_DIR
+        )
+        for name, samples in json.loads(completed.stdout).items():
+            stages[f'{mode}.{name}'] = summarize(samples)
+
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'config': {'threads': args.threads, 'calls': args.calls},
+        'wall_time': stages['queue.wall_time'],
+        'stages': stages,
+    }
+
+    print(f"{'計測':<20}{'件数':>8}{'p50(µs)':>10}{'p90(µs)':>10}{'p99(µs)':>10}")
+    for stage, values in stages.items():
+        print(f"{stage:<20}{values['count']:>8}" + ''.join(f"{values[p] * 1e6:>10.1f}" for p in ('p50', 'p90', 'p99')))
+
+    if not report(result, output, baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+取得・処理・送信パイプライン全体のオフラインベンチマーク
+
+DMM英会話・Vercel API・LINEの代わりにローカルのスタブサーバー（stub_servers.py）を起動して main.main() を実行し、
+全体の実行時間・ステージごとのレイテンシのパーセンタイル・リクエスト数をJSONで保存する。
+--baselineに以前の結果を指定すると、中央値が許容範囲を超えて遅くなった項目を報告して終了コード1を返す
+
+使い方:
+    python benchmarks/bench_pipeline.py --runs 5 --api-latency 0.3 --output results.json
+    python benchmarks/bench_pipeline.py --baseline results.json --max-regression 0.2
+"""
+import argparse
+import functools
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from stub_servers import StubBehavior, StubServer, dmm_handler, feed_handler, line_handler, vercel_handler  # noqa: E402
+
+# 計測するメソッド: (モジュール名, クラス名, メソッド名) → ステージ名
+STAGES = {
+    ('dmm_scraper', 'DMMNewsScraper', '_fetch'): 'scraper.fetch',
+    ('dmm_scraper', 'DMMNewsScraper', '_extract_content'): 'scraper.extract',
+    ('news_processor', 'NewsProcessor', 'process_news_batch'): 'processor.batch',
+    ('news_processor', 'NewsProcessor', '_post_api'): 'processor.api',
+    ('line_bot', 'LineBotSender', '_send_request'): 'line.request',
+}
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近傍順位法によるパーセンタイル"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(p / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """件数・平均・パーセンタイル（秒）"""
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else 0.0,
+    }
+
+
+class StageTimer:
+    """クラスのメソッドを包んで呼び出しごとの所要時間を記録する"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def instrument(self, cls, method_name: str, stage: str):
+        original = getattr(cls, method_name)
+        timer = self
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with timer._lock:
+                    timer.samples[stage].append(elapsed)
+
+        setattr(cls, method_name, timed)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='パイプライン全体のオフラインベンチマーク')
+    parser.add_argument('--runs', type=int, default=3, help='main.main()を実行する回数')
+    parser.add_argument('--streaming', action=argparse.BooleanOptionalAction, default=True,
+                        help='ストリーミングパイプラインで実行する')
+    parser.add_argument('--cache', action='store_true',
+                        help='HTTPキャッシュ・結果キャッシュを有効にする（既定では毎回すべて取得・生成する）')
+    parser.add_argument('--hedge', action='store_true',
+                        help='Vercel APIの応答が遅い場合に同じリクエストをもう1回送る（VERCEL_HEDGE_ENABLED）')
+    parser.add_argument('--seed', type=int, default=1, help='遅延のゆらぎとエラー発生の乱数シード')
+    parser.add_argument('--feed', action='store_true',
+                        help='RSSフィードのスタブを2つ目のニュースソースとして追加する（NEWS_SOURCES=dmm,feed）')
+    for name, latency in (('dmm', 0.05), ('api', 0.3), ('line', 0.05), ('feed', 0.05)):
+        parser.add_argument(f'--{name}-latency', type=float, default=latency, help=f'{name}スタブの応答遅延（秒）')
+        parser.add_argument(f'--{name}-jitter', type=float, default=latency / 2, help=f'{name}スタブの遅延のゆらぎ（秒）')
+        parser.add_argument(f'--{name}-error-rate', type=float, default=0.0, help=f'{name}スタブがエラーを返す割合')
+    parser.add_argument('--line-error-status', type=int, default=500, help='LINEスタブがエラー時に返すステータス')
+    parser.add_argument('--output', help='結果を保存するJSONファイル')
+    parser.add_argument('--baseline', help='比較する以前の結果（JSONファイル）')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='中央値の悪化をこの割合まで許容する（0.2で20%%）')
+    return parser.parse_args()
+
+
+def start_stubs(args) -> Dict[str, StubServer]:
+    """スタブサーバーを起動"""
+    stubs = {
+        'dmm': StubServer('dmm', dmm_handler(), StubBehavior(
+            args.dmm_latency, args.dmm_jitter, args.dmm_error_rate), seed=args.seed),
+        'vercel': StubServer('vercel', vercel_handler, StubBehavior(
+            args.api_latency, args.api_jitter, args.api_error_rate), seed=args.seed + 1),
+        'line': StubServer('line', line_handler, StubBehavior(
+            args.line_latency, args.line_jitter, args.line_error_rate, args.line_error_status), seed=args.seed + 2),
+    }
+    if args.feed:
+        stubs['feed'] = StubServer('feed', feed_handler(), StubBehavior(
+            args.feed_latency, args.feed_jitter, args.feed_error_rate), seed=args.seed + 3)
+    for stub in stubs.values():
+        stub.start()
+    return stubs
+
+
+def configure_environment(stubs: Dict[str, StubServer], workdir: str, cache: bool, hedge: bool = False):
+    """プロジェクトのモジュールを読み込む前に、接続先と保存先を環境変数で差し替える"""
+    os.environ.update({
+        'DMM_DAILY_NEWS_URL': f"{stubs['dmm'].base_url}/app/daily-news/",
+        'VERCEL_API_URL': stubs['vercel'].base_url,
+        'LINE_API_BASE_URL': stubs['line'].base_url,
+        'NEWS_SOURCES': 'dmm,feed' if 'feed' in stubs else 'dmm',
+        'NEWS_FEEDS': f"feed={stubs['feed'].base_url}/feed.xml" if 'feed' in stubs else '',
+        'LINE_CHANNEL_ACCESS_TOKEN': 'benchmark-token',
+        'LINE_USER_ID': 'Ubenchmark',
+        'SUBSCRIBERS_FILE': '',
+        'ARTICLE_STORE_PATH': os.path.join(workdir, 'articles.db'),
+        'SUBSCRIBERS_DB_PATH': os.path.join(workdir, 'subscribers.db'),
+        'HTTP_CACHE_DIR': os.path.join(workdir, 'http'),
+        'RESULT_CACHE_PATH': os.path.join(workdir, 'results.db'),
+        'SELECTOR_CACHE_PATH': os.path.join(workdir, 'selectors.json'),
+        'PHRASE_INDEX_PATH': os.path.join(workdir, 'phrases.db'),
+        'DIGEST_OUTPUT_DIR': os.path.join(workdir, 'digest'),
+        'METRICS_REPORT_DIR': os.path.join(workdir, 'metrics'),
+        'METRICS_TEXTFILE_PATH': os.path.join(workdir, 'metrics', 'daily_news.prom'),
+        'HTTP_CACHE_ENABLED': 'true' if cache else 'false',
+        'RESULT_CACHE_ENABLED': 'true' if cache else 'false',
+        'VERCEL_HEDGE_ENABLED': 'true' if hedge else 'false',
+    })
+
+
+def timing_metrics(result: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """比較する項目: 全体の時間とステージごとの時間（summarizeの結果）"""
+    metrics = {'wall_time': result.get('wall_time', {})}
+    metrics.update((f"stages.{stage}", values) for stage, values in result.get('stages', {}).items())
+    return metrics
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], max_regression: float,
+            metrics: Callable[[Dict[str, Any]], Dict[str, Dict[str, float]]] = timing_metrics) -> List[str]:
+    """以前の結果と中央値を比較し、許容範囲を超えて遅くなった項目を返す（項目はmetricsで取り出す）"""
+    regressions = []
+    previous_metrics = metrics(baseline)
+    for name, current in metrics(result).items():
+        previous = previous_metrics.get(name, {})
+        if previous.get('p50') and current['p50'] > previous['p50'] * (1 + max_regression):
+            regressions.append(
+                f"{name}: p50 {previous['p50'] * 1000:.1f}ms → {current['p50'] * 1000:.1f}ms"
+                f"（{current['p50'] / previous['p50'] - 1:+.0%}）"
+            )
+    return regressions
+
+
+def report(result: Dict[str, Any], output: Optional[str], baseline: Optional[str], max_regression: float,
+           metrics: Callable[[Dict[str, Any]], Dict[str, Dict[str, float]]] = timing_metrics) -> bool:
+    """
+    結果をJSONファイルに保存し、以前の結果と比較して表示する
+
+    Args:
+        result: 今回の結果
+        output: 結果を保存するJSONファイル（Noneの場合は保存しない）
+        baseline: 比較する以前の結果のJSONファイル（Noneの場合は比較しない）
+        max_regression: 中央値の悪化を許容する割合
+        metrics: 結果から比較する項目（名前 → summarizeの結果）を取り出す関数
+
+    Returns:
+        許容範囲を超えて遅くなった項目がなければTrue
+    """
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n結果を保存しました: {output}")
+
+    if baseline:
+        with open(baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(result, json.load(f), max_regression, metrics)
+        if regressions:
+            print("\n性能が低下しています:")
+            for line in regressions:
+                print(f"  {line}")
+            return False
+        print("\n以前の結果からの性能低下はありません")
+    return True
+
+
+def main():
+    args = parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    stubs = start_stubs(args)
+    workdir = tempfile.mkdtemp(prefix='bench-pipeline-')
+    configure_environment(stubs, workdir, args.cache, args.hedge)
+    # 実行ログ（daily_news.log）などは作業ディレクトリに書き出す
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+
+    import logging
+    import importlib
+    import main as app
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    timer = StageTimer()
+    for (module_name, class_name, method_name), stage in STAGES.items():
+        timer.instrument(getattr(importlib.import_module(module_name), class_name), method_name, stage)
+
+    runs = []
+    try:
+        for i in range(args.runs):
+            # 毎回新しい記事ストアで実行する（キャッシュは--cache指定時のみ引き継ぐ）
+            for name in ('articles.db', 'subscribers.db'):
+                path = os.path.join(workdir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+            start = time.perf_counter()
+            success = app.main(streaming=args.streaming)
+            elapsed = time.perf_counter() - start
+            runs.append({'wall_time': elapsed, 'success': bool(success)})
+            print(f"run {i + 1}/{args.runs}: {elapsed:.2f}s {'成功' if success else '失敗'}")
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'runs': runs,
+        'wall_time': summarize([run['wall_time'] for run in runs]),
+        'stages': {stage: summarize(samples) for stage, samples in sorted(timer.samples.items())},
+        'requests': {name: stub.stats() for name, stub in stubs.items()},
+    }
+
+    print(f"\n{'ステージ':<20}{'件数':>8}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}")
+    print(f"{'wall_time':<20}{result['wall_time']['count']:>8}" + ''.join(
+        f"{result['wall_time'][p] * 1000:>10.1f}" for p in ('p50', 'p90', 'p99')))
+    for stage, values in result['stages'].items():
+        print(f"{stage:<20}{values['count']:>8}" + ''.join(f"{values[p] * 1000:>10.1f}" for p in ('p50', 'p90', 'p99')))
+    print()
+    for name, stats in result['requests'].items():
+        print(f"{name}: {stats['requests']}" + (f" エラー {stats['errors']}" if stats['errors'] else ''))
+
+    if not report(result, output, baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+ローカル抽出型要約（summarizer.py）のベンチマーク
+
+保存済みの記事ページ（benchmarks/fixtures）から抽出した本文を使い、
+- 本文の長さごとの要約・圧縮の処理時間
+- /api/summarizeに送るリクエストボディの大きさ（従来の先頭3000文字と圧縮後の比較）
+を表示する
+
+使い方:
+    python benchmarks/bench_summarizer.py [--repeat 20] [--max-chars 1500]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_parser import create_backend  # noqa: E402
+from summarizer import ExtractiveSummarizer, split_sentences  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# 処理時間を計測する本文の長さ（文字数）
+LENGTHS = (3000, 10000, 30000, 100000)
+
+
+def load_articles(fixtures_dir: str) -> List[str]:
+    """記事ページの本文を抽出"""
+    parser = create_backend('lxml')
+    texts = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, 'article*.html'))):
+        with open(path, 'rb') as f:
+            html = f.read()
+        texts.append(parser.extract_content(html))
+    return texts
+
+
+def build_text(sentences: List[str], length: int) -> str:
+    """文を繰り返し並べて指定の長さの本文を作る"""
+    parts, total, i = [], 0, 0
+    while total < length:
+        sentence = sentences[i % len(sentences)]
+        parts.append(sentence)
+        total += len(sentence) + 1
+        i += 1
+    return ' '.join(parts)
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """repeat回実行した1回あたりの平均時間（ミリ秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def payload_size(title: str, content: str) -> int:
+    return len(json.dumps({'title': title, 'content': content}, ensure_ascii=False).encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ローカル抽出型要約のベンチマーク')
+    parser.add_argument('--repeat', type=int, default=20, help='各計測を繰り返す回数')
+    parser.add_argument('--max-chars', type=int, default=1500, help='圧縮後の本文の文字数の上限')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='保存済みページのディレクトリ')
+    args = parser.parse_args()
+
+    summarizer = ExtractiveSummarizer()
+    articles = load_articles(args.fixtures)
+    sentences = [s for text in articles for s in split_sentences(text)]
+    # numpyは最初の要約時に読み込まれるため、計測の前に1回実行しておく
+    summarizer.summarize(build_text(sentences, LENGTHS[0]))
+
+    print(f"{'本文(文字)':>12}{'文数':>8}{'要約(ms)':>12}{'圧縮(ms)':>12}")
+    for length in LENGTHS:
+        text = build_text(sentences, length)
+        summarize_ms = measure(lambda: summarizer.summarize(text), args.repeat)
+        condense_ms = measure(lambda: summarizer.condense(text, args.max_chars), args.repeat)
+        print(f"{len(text):>12}{len(split_sentences(text)):>8}{summarize_ms:>12.2f}{condense_ms:>12.2f}")
+
+    print(f"\n/api/summarizeのリクエストボディ（従来: 先頭3000文字、圧縮: {args.max_chars}文字以下）")
+    print(f"{'記事':>6}{'本文(文字)':>12}{'従来(B)':>10}{'圧縮(B)':>10}{'削減率':>8}")
+    before_total = after_total = 0
+    for i, text in enumerate(articles + [build_text(sentences, 10000)], 1):
+        title = f'Article {i}'
+        before = payload_size(title, text[:3000])
+        after = payload_size(title, summarizer.condense(text, args.max_chars))
+        before_total += before
+        after_total += after
+        print(f"{i:>6}{len(text):>12}{before:>10}{after:>10}{1 - after / before:>8.0%}")
+    print(f"{'合計':>6}{'':>12}{before_total:>10}{after_total:>10}{1 - after_total / before_total:>8.0%}")
+
+    print("\n簡易要約（APIが使えない場合）の例:")
+    print(f"  従来: {' '.join(articles[0].split()[:50])}...")
+    print(f"  抽出: {summarizer.summarize(articles[0])}")
+
+
+if __name__ == '__main__':
+    main()
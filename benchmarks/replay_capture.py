@@ -0,0 +1,147 @@
+"""
+記録したHTTPのやり取り（main.py run --record / HTTP_CAPTURE_DIR）を再生してパイプライン全体を実行する
+
+DMM英会話・Vercel API・LINEには接続せず、記録したレスポンスを記録した所要時間（--timing recorded）
+または待ち時間なし（--timing fast）で返して main.main() を実行する。記事ストア・キャッシュなどは
+一時ディレクトリに作り直すため、本番のデータは変更しない。
+出力の形式は bench_pipeline.py と同じで、--baselineに以前の結果を指定すると中央値を比較する
+
+記録時に結果キャッシュから返したVercel APIの結果は、実行前に一時ディレクトリの結果キャッシュに入れる。
+それ以外の記録にないリクエスト（フレーズの重複除外による追加生成など）は接続エラーとして扱い、
+「記録にない」件数として報告する。再生時のタイミングで
+リクエストの分け方が変わり記録が足りなくなったURLには、直前のレスポンスを返して「再利用」として数える
+
+使い方:
+    python main.py run --record data/captures/slow-day.jsonl.gz
+    python benchmarks/replay_capture.py data/captures/slow-day.jsonl.gz --runs 3 --output replay.json
+    python benchmarks/replay_capture.py data/captures/slow-day.jsonl.gz --timing fast --baseline replay.json
+"""
+import argparse
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from bench_pipeline import STAGES, StageTimer, report, summarize  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='記録したHTTPのやり取りを再生してパイプライン全体を実行する')
+    parser.add_argument('capture', help='記録ファイル（.jsonl.gz）')
+    parser.add_argument('--timing', choices=('recorded', 'fast'), default='recorded',
+                        help='recorded: 記録した所要時間で応答する / fast: 待たずに応答する')
+    parser.add_argument('--runs', type=int, default=1, help='main.main()を実行する回数')
+    parser.add_argument('--streaming', action=argparse.BooleanOptionalAction, default=True,
+                        help='ストリーミングパイプラインで実行する')
+    parser.add_argument('--output', help='結果を保存するJSONファイル')
+    parser.add_argument('--baseline', help='比較する以前の結果（JSONファイル）')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='中央値の悪化をこの割合まで許容する（0.2で20%%）')
+    return parser.parse_args()
+
+
+def configure_environment(state_dir: str):
+    """プロジェクトのモジュールを読み込む前に、保存先を一時ディレクトリに差し替える"""
+    os.environ.update({
+        'ARTICLE_STORE_PATH': os.path.join(state_dir, 'articles.db'),
+        'SUBSCRIBERS_DB_PATH': os.path.join(state_dir, 'subscribers.db'),
+        'HTTP_CACHE_DIR': os.path.join(state_dir, 'http'),
+        'RESULT_CACHE_PATH': os.path.join(state_dir, 'results.db'),
+        'SELECTOR_CACHE_PATH': os.path.join(state_dir, 'selectors.json'),
+        'PHRASE_INDEX_PATH': os.path.join(state_dir, 'phrases.db'),
+        'DIGEST_OUTPUT_DIR': os.path.join(state_dir, 'digest'),
+        'METRICS_REPORT_DIR': os.path.join(state_dir, 'metrics'),
+        'METRICS_TEXTFILE_PATH': os.path.join(state_dir, 'metrics', 'daily_news.prom'),
+        'HTTP_CAPTURE_DIR': '',
+        'INCREMENTAL_MODE': 'false',
+    })
+    # LINE Botの設定がない環境でも送信処理まで再生できるようにする（送信先は記録したレスポンス）
+    os.environ.setdefault('LINE_CHANNEL_ACCESS_TOKEN', 'replay-token')
+    os.environ.setdefault('LINE_USER_ID', 'Ureplay')
+
+
+def main():
+    args = parse_args()
+    capture = os.path.abspath(args.capture)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    workdir = tempfile.mkdtemp(prefix='replay-capture-')
+    state_dir = os.path.join(workdir, 'state')
+    configure_environment(state_dir)
+    # 実行ログ（daily_news.log）などは作業ディレクトリに書き出す
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+
+    import logging
+    import main as app
+    from http_recorder import start_replay
+    from result_cache import ResultCache
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    timer = StageTimer()
+    for (module_name, class_name, method_name), stage in STAGES.items():
+        timer.instrument(getattr(importlib.import_module(module_name), class_name), method_name, stage)
+
+    runs = []
+    try:
+        for i in range(args.runs):
+            # 毎回空の記事ストア・キャッシュから始め、記録した実行と同じリクエストを送らせる
+            shutil.rmtree(state_dir, ignore_errors=True)
+            os.makedirs(state_dir)
+            replayer = start_replay(capture, args.timing)
+            if replayer.cached_results:
+                cache = ResultCache()
+                for cached in replayer.cached_results:
+                    cache.set(cached['endpoint'], cached['payload'], cached['value'])
+                cache.close()
+
+            start = time.perf_counter()
+            success = app.main(streaming=args.streaming)
+            elapsed = time.perf_counter() - start
+            runs.append({
+                'wall_time': elapsed,
+                'success': bool(success),
+                'replayed': replayer.served,
+                'reused': replayer.reused,
+                'unmatched': replayer.unmatched,
+                'unused': replayer.unused(),
+            })
+            print(
+                f"run {i + 1}/{args.runs}: {elapsed:.2f}s {'成功' if success else '失敗'}"
+                f"（再生 {replayer.served}/{len(replayer)}件、再利用 {replayer.reused}件、記録にない {replayer.unmatched}件、"
+                f"未使用 {replayer.unused()}件）"
+            )
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'capture': capture,
+        'config': {key: value for key, value in vars(args).items() if key not in ('capture', 'output', 'baseline')},
+        'runs': runs,
+        'wall_time': summarize([run['wall_time'] for run in runs]),
+        'stages': {stage: summarize(samples) for stage, samples in sorted(timer.samples.items())},
+    }
+
+    print(f"\n{'ステージ':<20}{'件数':>8}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}")
+    print(f"{'wall_time':<20}{result['wall_time']['count']:>8}" + ''.join(
+        f"{result['wall_time'][p] * 1000:>10.1f}" for p in ('p50', 'p90', 'p99')))
+    for stage, values in result['stages'].items():
+        print(f"{stage:<20}{values['count']:>8}" + ''.join(f"{values[p] * 1000:>10.1f}" for p in ('p50', 'p90', 'p99')))
+
+    if not report(result, output, baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
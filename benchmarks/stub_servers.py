@@ -0,0 +1,254 @@
+"""
+ベンチマーク用のローカルスタブサーバー
+
+DMM英会話（保存済みの一覧・記事ページ）、Vercel API（/api/summarize・/api/phrases・/api/batch）、
+LINE Messaging API（push・multicast）の代わりに応答する。
+応答には遅延・ゆらぎ・エラーを設定でき、パスごとのリクエスト数を記録する
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# (ステータスコード, Content-Type, 本文, 追加のヘッダー)
+StubResponse = Tuple[int, str, bytes, Dict[str, str]]
+
+
+class StubBehavior(NamedTuple):
+    """スタブサーバーの応答の設定"""
+    latency: float = 0.0        # 応答までの遅延（秒）
+    jitter: float = 0.0         # 遅延に加えるゆらぎの最大値（秒、0〜jitterの一様分布）
+    error_rate: float = 0.0     # エラーを返す割合（0〜1）
+    error_status: int = 500     # エラー時に返すHTTPステータス
+
+
+class StubServer:
+    """別スレッドで動作するHTTPスタブサーバー"""
+
+    def __init__(self, name: str, handler: Callable[[str, str, Dict[str, str], bytes], StubResponse],
+                 behavior: StubBehavior = StubBehavior(), seed: Optional[int] = None):
+        """
+        Args:
+            name: サーバー名（結果の集計に使用）
+            handler: (メソッド, パス, リクエストヘッダー, 本文) を受け取り StubResponse を返す関数
+            behavior: 遅延・エラーの設定
+            seed: 遅延のゆらぎとエラーの発生に使う乱数のシード
+        """
+        self.name = name
+        self.handler = handler
+        self.behavior = behavior
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """
+        空いているポートでサーバーを起動
+
+        Returns:
+            サーバーのURL（例: http://127.0.0.1:54321）
+        """
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def do_POST(self):
+                stub._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f'stub-{self.name}', daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        """サーバーを停止"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset_counts(self):
+        """リクエスト数の記録をリセット"""
+        with self._lock:
+            self.requests.clear()
+            self.errors.clear()
+
+    def _route(self, path: str) -> str:
+        """集計用にパスのID部分をまとめる"""
+        return re.sub(r'/\d+(/[^/?]*)?', '/:id', path.split('?')[0])
+
+    def _handle(self, request: BaseHTTPRequestHandler):
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else b''
+        route = self._route(request.path)
+
+        with self._lock:
+            self.requests[route] += 1
+            delay = self.behavior.latency + self._random.uniform(0, self.behavior.jitter)
+            failed = self._random.random() < self.behavior.error_rate
+            if failed:
+                self.errors[route] += 1
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if failed:
+            status, content_type, data, headers = self.behavior.error_status, 'application/json', b'{}', {}
+        else:
+            status, content_type, data, headers = self.handler(
+                request.command, request.path, dict(request.headers), body
+            )
+
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(data)))
+        for key, value in headers.items():
+            request.send_header(key, value)
+        request.end_headers()
+        if data and request.command != 'HEAD':
+            request.wfile.write(data)
+
+    def stats(self) -> Dict[str, Any]:
+        """パスごとのリクエスト数と発生させたエラー数"""
+        with self._lock:
+            return {'requests': dict(self.requests), 'errors': dict(self.errors)}
+
+
+def _json_response(data: Any, status: int = 200) -> StubResponse:
+    return status, 'application/json', json.dumps(data, ensure_ascii=False).encode('utf-8'), {}
+
+
+def dmm_handler(fixtures_dir: str = FIXTURES_DIR, archive_pages: int = 5) -> Callable:
+    """
+    保存済みのページを返すDMM英会話のスタブ
+
+    一覧ページ（/app/daily-news/）はlisting.htmlを、記事ページ（/app/daily-news/article/<ID>/...）は
+    article-*.htmlをIDに応じて順番に返す。ETagによる条件付きGETに対応する。
+    一覧ページは ?page=<N> でアーカイブの過去のページ（記事IDをずらしたもの）を返し、archive_pagesを超えると404を返す
+    """
+    listing = open(os.path.join(fixtures_dir, 'listing.html'), 'rb').read()
+    articles = [
+        open(os.path.join(fixtures_dir, name), 'rb').read()
+        for name in sorted(os.listdir(fixtures_dir)) if name.startswith('article')
+    ]
+
+    def handle(method: str, path: str, headers: Dict[str, str], body: bytes) -> StubResponse:
+        match = re.search(r'/article/(\d+)', path)
+        if match:
+            page = articles[int(match.group(1)) % len(articles)]
+        elif path.split('?')[0].rstrip('/').endswith('/daily-news'):
+            number = int((re.search(r'[?&]page=(\d+)', path) or [0, 1])[1])
+            if not 1 <= number <= archive_pages:
+                return 404, 'text/html', b'not found', {}
+            page = listing if number == 1 else re.sub(
+                rb'/article/(\d+)', lambda m: b'/article/%d' % (int(m.group(1)) + (number - 1) * 1000), listing
+            )
+        else:
+            return 404, 'text/html', b'not found', {}
+
+        etag = '"' + hashlib.md5(page).hexdigest() + '"'
+        if headers.get('If-None-Match') == etag:
+            return 304, 'text/html', b'', {'ETag': etag}
+        return 200, 'text/html; charset=utf-8', page, {'ETag': etag}
+
+    return handle
+
+
+def feed_handler(fixtures_dir: str = FIXTURES_DIR, items: int = 6) -> Callable:
+    """
+    RSSフィードのニュースソースのスタブ
+
+    /feed.xmlはitems件の項目を返す。偶数番目の項目はフィードに本文を含め、奇数番目は説明が短いため
+    記事ページ（/news/<ID>、article-*.htmlを順番に返す）から本文を抽出させる
+    """
+    articles = [
+        open(os.path.join(fixtures_dir, name), 'rb').read()
+        for name in sorted(os.listdir(fixtures_dir)) if name.startswith('article')
+    ]
+    body_text = ' '.join(['Learners around the world are following this story closely.'] * 4)
+
+    def handle(method: str, path: str, headers: Dict[str, str], body: bytes) -> StubResponse:
+        match = re.search(r'/news/(\d+)', path)
+        if match:
+            return 200, 'text/html; charset=utf-8', articles[int(match.group(1)) % len(articles)], {}
+        if path.split('?')[0] != '/feed.xml':
+            return 404, 'text/html', b'not found', {}
+
+        base_url = f"http://{headers.get('Host', 'localhost')}"
+        entries = ''.join(
+            f"<item><title>Feed story {i}: learners discuss topic number {i}</title>"
+            f"<link>{base_url}/news/{i}</link>"
+            f"<description>{body_text if i % 2 == 0 else 'Short teaser.'}</description>"
+            f"<pubDate>Mon, 06 Jan 2025 09:00:00 +0000</pubDate></item>"
+            for i in range(1, items + 1)
+        )
+        feed = f'<?xml version="1.0"?><rss version="2.0"><channel><title>Stub feed</title>{entries}</channel></rss>'
+        return 200, 'application/rss+xml', feed.encode('utf-8'), {}
+
+    return handle
+
+
+def vercel_handler(method: str, path: str, headers: Dict[str, str], body: bytes) -> StubResponse:
+    """要約・フレーズ生成APIのスタブ（OpenAIを呼ばず、入力から決まった結果を返す）"""
+    payload = json.loads(body or b'{}')
+
+    def summary_for(title: str) -> str:
+        return f"This is a short summary of \"{title}\" for benchmarking."
+
+    def phrases_for(title: str, count: int, skip: int = 0) -> list:
+        # 記事ごとに異なるフレーズにする（excludeで指定された件数の分は番号をずらす）
+        return [f"{title[:30]} phrase {i + 1} - 意味" for i in range(skip, skip + count)]
+
+    if path == '/api/summarize':
+        return _json_response({'summary': summary_for(payload.get('title', ''))})
+    if path == '/api/phrases':
+        return _json_response({'phrases': phrases_for(
+            payload.get('title', ''), payload.get('count', 10), len(payload.get('exclude', [])))})
+    if path == '/api/batch':
+        count = payload.get('count', 10)
+        return _json_response({'results': [
+            {'summary': summary_for(article.get('title', '')), 'phrases': phrases_for(article.get('title', ''), count)}
+            for article in payload.get('articles', [])
+        ]})
+    return _json_response({'error': 'Not found'}, 404)
+
+
+def line_handler(method: str, path: str, headers: Dict[str, str], body: bytes) -> StubResponse:
+    """LINE Messaging API（push・multicast）のスタブ"""
+    if path in ('/v2/bot/message/push', '/v2/bot/message/multicast'):
+        messages = json.loads(body or b'{}').get('messages', [])
+        if not 1 <= len(messages) <= 5:
+            return _json_response({'message': 'The request body has 1 error(s)'}, 400)
+        for message in messages:
+            # Flex Messageのバブル数・サイズの上限（クライアントと同じ形式で変換したJSONのサイズ）
+            carousel = message.get('contents', {}) if message.get('type') == 'flex' else {}
+            bubbles = carousel.get('contents', []) if carousel.get('type') == 'carousel' else []
+            if (len(bubbles) > 12 or len(json.dumps(carousel)) > 50 * 1024
+                    or any(len(json.dumps(bubble)) > 30 * 1024 for bubble in bubbles)):
+                return _json_response({'message': 'A message (messages[0]) in the request body is invalid'}, 400)
+        return _json_response({})
+    return _json_response({'message': 'Not found'}, 404)
@@ -13,11 +13,142 @@ VERCEL_API_URL = os.getenv("VERCEL_API_URL", "")  # Vercelデプロイ後のURL
 # LINE Bot設定
 LINE_CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
 LINE_USER_ID = os.getenv("LINE_USER_ID")  # 送信先のLINEユーザーID
+LINE_API_BASE_URL = os.getenv("LINE_API_BASE_URL", "https://api.line.me")  # LINE Messaging APIのURL（ベンチマーク時はスタブサーバー）
 
 # DMM英会話 Daily News URL
-DMM_DAILY_NEWS_URL = "https://eikaiwa.dmm.com/app/daily-news/"
+DMM_DAILY_NEWS_URL = os.getenv("DMM_DAILY_NEWS_URL", "https://eikaiwa.dmm.com/app/daily-news/")  # 一覧ページのURL
 
 # その他の設定
 MAX_NEWS_COUNT = 3  # 取得するニュース数
 PHRASES_PER_NEWS = 10  # ニュース1件あたりのフレーズ数
 
+# スクレイピング設定
+SCRAPER_MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", "4"))  # 詳細ページを並列取得するワーカー数
+SCRAPER_PER_HOST_CONCURRENCY = int(os.getenv("SCRAPER_PER_HOST_CONCURRENCY", "2"))  # ホストごとの同時接続数上限
+
+# HTTPクライアント設定
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # 接続プールを保持するホスト数
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))  # ホストごとに保持する接続数
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # 接続タイムアウト（秒）
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))  # 読み込みタイムアウト（秒）
+HTTP_ENABLE_HTTP2 = os.getenv("HTTP_ENABLE_HTTP2", "false").lower() == "true"  # HTTP/2を使用する（httpx[http2]が必要）
+
+# HTTPキャッシュ設定
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"  # 一覧・記事ページの条件付きGETキャッシュを使用する
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".cache/http")  # キャッシュの保存先
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))  # 圧縮済み本文の合計サイズ上限
+
+# 記事ストア設定
+ARTICLE_STORE_PATH = os.getenv("ARTICLE_STORE_PATH", "data/articles.db")  # 処理済み記事を記録するSQLiteファイル
+INCREMENTAL_MODE = os.getenv("INCREMENTAL_MODE", "false").lower() == "true"  # 配信済みで未変更の記事をスキップする
+
+# 要約・フレーズ生成結果のキャッシュ設定
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"  # Vercel APIの結果をキャッシュする
+RESULT_CACHE_BYPASS = os.getenv("RESULT_CACHE_BYPASS", "false").lower() == "true"  # キャッシュを参照せずに再生成する
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", ".cache/results.db")  # ディスクキャッシュの保存先
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 60 * 60)))  # 有効期限（秒）
+RESULT_CACHE_MEMORY_SIZE = int(os.getenv("RESULT_CACHE_MEMORY_SIZE", "256"))  # メモリに保持するエントリ数
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))  # ディスクに保持するエントリ数の上限
+
+# フレーズの重複除外設定
+PHRASE_INDEX_ENABLED = os.getenv("PHRASE_INDEX_ENABLED", "true").lower() == "true"  # 過去に配信したフレーズを別の記事で繰り返さない
+PHRASE_INDEX_PATH = os.getenv("PHRASE_INDEX_PATH", "data/phrases.db")  # 配信したフレーズを記録するSQLiteファイル
+PHRASE_REFILL_ATTEMPTS = int(os.getenv("PHRASE_REFILL_ATTEMPTS", "2"))  # 重複で不足したフレーズを追加生成する回数の上限
+
+# 一括処理API設定
+BATCH_API_ENABLED = os.getenv("BATCH_API_ENABLED", "true").lower() == "true"  # /api/batchで全ニュースを一括処理する
+BATCH_API_MAX_ARTICLES = 10  # 1リクエストで送信するニュース数の上限（api/batch.jsのMAX_ARTICLESと合わせる）
+
+# ローカル要約設定
+SUMMARIZER_CONDENSE_ENABLED = os.getenv("SUMMARIZER_CONDENSE_ENABLED", "true").lower() == "true"  # Vercel APIに送る本文を重要な文だけに圧縮する
+SUMMARIZER_CONDENSE_CHARS = int(os.getenv("SUMMARIZER_CONDENSE_CHARS", "1500"))  # 圧縮後の本文の文字数の上限
+SUMMARIZER_FALLBACK_SENTENCES = int(os.getenv("SUMMARIZER_FALLBACK_SENTENCES", "3"))  # APIが使えない場合の簡易要約の文数
+
+# Vercel API呼び出しの再試行設定
+VERCEL_TIMEOUTS = tuple(float(t) for t in os.getenv("VERCEL_TIMEOUTS", "10,20,30").split(","))  # 試行ごとの読み込みタイムアウト（秒、試行回数を兼ねる）
+VERCEL_BATCH_TIMEOUTS = tuple(float(t) for t in os.getenv("VERCEL_BATCH_TIMEOUTS", "30,60").split(","))  # /api/batchの試行ごとの読み込みタイムアウト（秒）
+VERCEL_RETRY_BACKOFF = float(os.getenv("VERCEL_RETRY_BACKOFF", "0.5"))  # 再試行の待機時間の基準（秒、試行ごとに2倍にしてジッターを加える）
+VERCEL_RUN_DEADLINE = float(os.getenv("VERCEL_RUN_DEADLINE", "300"))  # 1回の実行でVercel APIの呼び出しに使える時間（秒）
+VERCEL_CIRCUIT_FAILURES = int(os.getenv("VERCEL_CIRCUIT_FAILURES", "3"))  # 連続して失敗した場合に以降の呼び出しを止める回数
+VERCEL_HEDGE_ENABLED = os.getenv("VERCEL_HEDGE_ENABLED", "false").lower() == "true"  # 応答が遅い場合に同じリクエストをもう1回送る
+VERCEL_HEDGE_DELAY = float(os.getenv("VERCEL_HEDGE_DELAY", "5"))  # 応答時間の記録が少ない間の追加送信までの待機時間（秒）
+VERCEL_HEDGE_MIN_DELAY = float(os.getenv("VERCEL_HEDGE_MIN_DELAY", "1"))  # 追加送信までの待機時間の下限（秒）
+
+# パイプライン設定
+PIPELINE_STREAMING = os.getenv("PIPELINE_STREAMING", "true").lower() == "true"  # 取得・処理・送信を重ねて実行する
+PIPELINE_PROCESS_WORKERS = int(os.getenv("PIPELINE_PROCESS_WORKERS", "3"))  # 処理ステージの並列数
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))  # ステージ間キューの最大長
+
+# LINE配信設定
+LINE_RATE_LIMIT_PER_SEC = float(os.getenv("LINE_RATE_LIMIT_PER_SEC", "10"))  # push APIの呼び出しレート上限（回/秒）
+LINE_MAX_RETRIES = int(os.getenv("LINE_MAX_RETRIES", "3"))  # 429・サーバーエラー時の再送回数
+LINE_MESSAGE_FORMAT = os.getenv("LINE_MESSAGE_FORMAT", "flex")  # ニュースの送信形式（flex: 1記事1バブルのカルーセル / text: 記事ごとのテキスト）
+
+# 複数の購読者への配信設定（購読者が登録されている場合はmulticastで配信）
+SUBSCRIBERS_DB_PATH = os.getenv("SUBSCRIBERS_DB_PATH", "data/subscribers.db")  # 購読者リストと配信状況を記録するSQLiteファイル
+SUBSCRIBERS_FILE = os.getenv("SUBSCRIBERS_FILE", "")  # 購読者IDを1行ずつ記載したファイル（実行時に取り込む）
+MULTICAST_BATCH_SIZE = int(os.getenv("MULTICAST_BATCH_SIZE", "500"))  # 1回のmulticastで送信する購読者数（最大500）
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "4"))  # 並列に送信するバッチ数
+FANOUT_MAX_ATTEMPTS = int(os.getenv("FANOUT_MAX_ATTEMPTS", "5"))  # 購読者ごとの最大送信試行回数
+
+# HTML解析設定
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "lxml")  # 解析バックエンド（lxml / html.parser / selectolax）
+
+# セレクタ学習キャッシュ設定
+SELECTOR_CACHE_ENABLED = os.getenv("SELECTOR_CACHE_ENABLED", "true").lower() == "true"  # ホスト・ページ種別ごとに成功したセレクタを記憶して最初に試す
+SELECTOR_CACHE_PATH = os.getenv("SELECTOR_CACHE_PATH", ".cache/selectors.json")  # 学習結果の保存先
+SELECTOR_CACHE_RELEARN_MISSES = int(os.getenv("SELECTOR_CACHE_RELEARN_MISSES", "3"))  # 連続して失敗したら学習し直す回数
+
+# 記事ページのストリーミング取得設定
+ARTICLE_STREAMING = os.getenv("ARTICLE_STREAMING", "true").lower() == "true"  # 本文が確定した時点で記事ページの読み込みを止める
+ARTICLE_MAX_BYTES = int(os.getenv("ARTICLE_MAX_BYTES", str(2 * 1024 * 1024)))  # 記事ページを読み込む最大バイト数
+ARTICLE_STREAM_CHUNK_SIZE = int(os.getenv("ARTICLE_STREAM_CHUNK_SIZE", str(16 * 1024)))  # 1回に読み込むバイト数
+
+# 計測設定
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # ステージごとの処理時間とカウンターを記録する
+METRICS_REPORT_DIR = os.getenv("METRICS_REPORT_DIR", "data/metrics")  # 実行ごとのJSONレポートの保存先（空で無効）
+METRICS_TEXTFILE_PATH = os.getenv("METRICS_TEXTFILE_PATH", "data/metrics/daily_news.prom")  # Prometheusのtextfileのパス（空で無効）
+
+# アーカイブのバックフィル設定
+BACKFILL_PAGE_URL_TEMPLATE = os.getenv("BACKFILL_PAGE_URL_TEMPLATE", "{base_url}?page={page}")  # アーカイブの各ページのURL
+BACKFILL_MAX_PAGES = int(os.getenv("BACKFILL_MAX_PAGES", "100"))  # 1回の実行で巡回するページ数の上限
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "100"))  # 1ページから抽出する記事数の上限
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))  # 記事ページを並列取得するワーカー数
+BACKFILL_HOST_DELAY = float(os.getenv("BACKFILL_HOST_DELAY", "1.0"))  # 同じホストへのリクエストの最小間隔（秒）
+BACKFILL_OUTPUT_PATH = os.getenv("BACKFILL_OUTPUT_PATH", "data/backfill/articles.jsonl")  # 取得した記事を追記するJSONLファイル
+BACKFILL_CHECKPOINT_PATH = os.getenv("BACKFILL_CHECKPOINT_PATH", "data/backfill/checkpoint.json")  # 再開位置を記録するファイル
+
+# 常駐（デーモン）モード設定
+DAEMON_SCHEDULE = os.getenv("DAEMON_SCHEDULE", "0 18 * * *")  # 配信時刻（cron形式: 分 時 日 月 曜日）
+DAEMON_TIMEZONE = os.getenv("DAEMON_TIMEZONE", "Asia/Tokyo")  # 配信時刻のタイムゾーン
+DAEMON_PREFETCH_LEAD = float(os.getenv("DAEMON_PREFETCH_LEAD", "1800"))  # 配信時刻の何秒前に取得・要約を始めるか
+DAEMON_WARMUP_LEAD = float(os.getenv("DAEMON_WARMUP_LEAD", "15"))  # 配信時刻の何秒前にLINE APIへ接続しておくか
+DAEMON_HEALTH_HOST = os.getenv("DAEMON_HEALTH_HOST", "127.0.0.1")  # ヘルスチェック・状態確認エンドポイントのアドレス
+DAEMON_HEALTH_PORT = int(os.getenv("DAEMON_HEALTH_PORT", "8787"))  # ヘルスチェック・状態確認エンドポイントのポート（0で無効）
+
+# ログ設定
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # ログレベル（DEBUG / INFO / WARNING / ERROR）
+LOG_FILE = os.getenv("LOG_FILE", "daily_news.log")  # ログの出力先ファイル（空の場合は標準出力のみ）
+LOG_JSON = os.getenv("LOG_JSON", "true").lower() == "true"  # ログファイルを1行1レコードのJSON（実行ID・記事IDつき）で書き出す
+LOG_ROTATE = os.getenv("LOG_ROTATE", "size")  # ログファイルのローテーション（size: サイズ / midnight・D・H など: 時間 / none: しない）
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # サイズでローテーションする場合の1ファイルの上限（バイト）
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "7"))  # 残しておくローテーション済みのログファイル数
+
+# Web向けダイジェスト設定
+DIGEST_ENABLED = os.getenv("DIGEST_ENABLED", "true").lower() == "true"  # 処理結果をWebフロントエンド向けの静的ファイルとして書き出す
+DIGEST_OUTPUT_DIR = os.getenv("DIGEST_OUTPUT_DIR", "public/digest")  # 書き出し先（Vercelでは/digest/として配信される）
+DIGEST_KEEP_VERSIONS = int(os.getenv("DIGEST_KEEP_VERSIONS", "30"))  # 残しておく過去のバージョン数
+DIGEST_BLOB_TOKEN = os.getenv("BLOB_READ_WRITE_TOKEN", "")  # Vercel Blobのトークン（設定した場合はダイジェストをVercel Blobにもアップロードする）
+DIGEST_BLOB_PREFIX = os.getenv("DIGEST_BLOB_PREFIX", "digest")  # Vercel Blobでのダイジェストのパスの先頭
+DIGEST_BLOB_API_URL = os.getenv("DIGEST_BLOB_API_URL", "https://blob.vercel-storage.com")  # Vercel BlobのAPIのURL
+
+# HTTPの記録・再生設定
+HTTP_CAPTURE_DIR = os.getenv("HTTP_CAPTURE_DIR", "")  # 実行ごとのHTTPのやり取りを記録するディレクトリ（空で無効）
+HTTP_CAPTURE_KEEP = int(os.getenv("HTTP_CAPTURE_KEEP", "14"))  # 残しておく記録の数
+
+# ニュースソース設定
+NEWS_SOURCES = os.getenv("NEWS_SOURCES", "dmm")  # 取得するニュースソース（カンマ区切り。dmm、NEWS_FEEDSで定義した名前、または「モジュール名:クラス名」）
+NEWS_FEEDS = os.getenv("NEWS_FEEDS", "")  # RSS/Atomフィードのニュースソース（「名前=URL」をカンマ区切り）
+SOURCE_TIMEOUT = float(os.getenv("SOURCE_TIMEOUT", "60"))  # ソースごとの取得時間の上限（秒、超えたソースの記事は待たない）
+SOURCE_TIMEOUTS = os.getenv("SOURCE_TIMEOUTS", "")  # ソースごとに上限を変える場合（「名前=秒」をカンマ区切り）
+SOURCE_HOST_DELAY = float(os.getenv("SOURCE_HOST_DELAY", "0"))  # 同じホストへのリクエストの最小間隔（秒、複数のソースで共有）
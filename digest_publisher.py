@@ -0,0 +1,219 @@
+"""
+Webフロントエンド向けのダイジェストを書き出すモジュール
+
+その日のニュースの要約とフレーズを、内容のハッシュ付きのJSON（とgzip圧縮版）として書き出す。
+Webの閲覧時は静的ファイルを返すだけになり、スクレイピングやOpenAI APIの呼び出しは発生しない
+
+    <出力先>/latest.json       最新のダイジェスト（短時間だけキャッシュさせ、ETagで再検証する）
+    <出力先>/v/<日付>-<ハッシュ>.json  バージョンごとのダイジェスト（内容が変わらないため長期間キャッシュできる）
+
+出力先はgitの管理外のため、Gitと連携したVercelのデプロイには含まれない。BLOB_READ_WRITE_TOKENを設定すると
+書き出したダイジェストをVercel Blob（<DIGEST_BLOB_PREFIX>/latest.json など、URLは固定）にもアップロードし、
+/api/news-list はそこから読み込む（Vercelの環境変数DIGEST_URLにlatest.jsonのURLを設定する）
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import (
+    DIGEST_OUTPUT_DIR,
+    DIGEST_KEEP_VERSIONS,
+    DIGEST_BLOB_TOKEN,
+    DIGEST_BLOB_PREFIX,
+    DIGEST_BLOB_API_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+# ダイジェストの形式のバージョン（フロントエンドとの互換性が変わる場合に上げる）
+DIGEST_FORMAT_VERSION = 1
+
+LATEST_NAME = 'latest.json'
+VERSIONS_DIR = 'v'
+
+# ファイル名に含めるハッシュの長さ（16進数の文字数）
+HASH_PREFIX_LENGTH = 12
+
+# Vercel Blobにアップロード済みのダイジェストのハッシュを記録するファイル（出力先の中）
+UPLOADED_NAME = '.uploaded'
+
+# Vercel BlobのCDNでキャッシュさせる時間（秒、latest.jsonは60秒が下限）
+BLOB_LATEST_MAX_AGE = 60
+BLOB_VERSION_MAX_AGE = 31536000
+
+# Vercel BlobのAPIのバージョン・タイムアウト（秒）
+BLOB_API_VERSION = '7'
+BLOB_TIMEOUT = 30
+
+
+def content_hash(news: List[Dict[str, Any]]) -> str:
+    """ニュースの内容のハッシュ（キーの順序や空白の違いに影響されない）"""
+    canonical = json.dumps(news, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class DigestPublisher:
+    """ダイジェストをバージョン付きの静的ファイルとして書き出すクラス"""
+
+    def __init__(self, output_dir: str = DIGEST_OUTPUT_DIR, keep_versions: int = DIGEST_KEEP_VERSIONS,
+                 blob_token: str = DIGEST_BLOB_TOKEN, blob_prefix: str = DIGEST_BLOB_PREFIX):
+        """
+        Args:
+            output_dir: 書き出し先のディレクトリ
+            keep_versions: 残しておく過去のバージョン数
+            blob_token: Vercel Blobのトークン（空の場合はアップロードしない）
+            blob_prefix: Vercel Blobでのダイジェストのパスの先頭
+        """
+        self.output_dir = output_dir
+        self.keep_versions = max(1, keep_versions)
+        self.blob_token = blob_token
+        self.blob_prefix = blob_prefix.strip('/')
+
+    def publish(self, news: List[Dict[str, Any]], generated_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        ダイジェストを書き出す（内容が最新のダイジェストと同じ場合は書き換えない）
+
+        Args:
+            news: ニュースのリスト（title, url, summary, phrases, dateを含む）
+            generated_at: 生成日時（省略時は現在時刻）
+
+        Returns:
+            書き出したダイジェストの情報（contentHash, etag, path, changed）
+        """
+        digest_hash = content_hash(news)
+        etag = f'"{digest_hash[:32]}"'
+        latest = self._load_latest()
+        if latest is not None and latest.get('contentHash') == f'sha256:{digest_hash}' \
+                and latest.get('version') == DIGEST_FORMAT_VERSION:
+            logger.info("ダイジェストの内容に変更はありません: %s", latest.get('path'))
+            # 前回のアップロードに失敗していた場合はアップロードし直す
+            uploaded = self._upload_once(latest['contentHash'], latest['path'],
+                                         json.dumps(latest, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            return {'contentHash': latest['contentHash'], 'etag': latest['etag'], 'path': latest['path'],
+                    'changed': False, 'uploaded': uploaded}
+
+        generated_at = generated_at or datetime.now().astimezone()
+        name = f"{generated_at.strftime('%Y-%m-%d')}-{digest_hash[:HASH_PREFIX_LENGTH]}.json"
+        document = {
+            'version': DIGEST_FORMAT_VERSION,
+            'date': generated_at.strftime('%Y-%m-%d'),
+            'generatedAt': generated_at.isoformat(),
+            'lastUpdated': generated_at.isoformat(),
+            'contentHash': f'sha256:{digest_hash}',
+            'etag': etag,
+            'path': f'{VERSIONS_DIR}/{name}',
+            'news': news,
+        }
+        body = json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+
+        # バージョンごとのファイルを書き終えてから最新のダイジェストを差し替える
+        versions_dir = os.path.join(self.output_dir, VERSIONS_DIR)
+        os.makedirs(versions_dir, exist_ok=True)
+        for path, data in (
+            (os.path.join(versions_dir, name), body),
+            (os.path.join(versions_dir, f'{name}.gz'), compressed),
+            (os.path.join(self.output_dir, f'{LATEST_NAME}.gz'), compressed),
+            (os.path.join(self.output_dir, LATEST_NAME), body),
+        ):
+            self._write_atomic(path, data)
+        self._prune(versions_dir)
+
+        logger.info(
+            "ダイジェストを書き出しました: %s（%s件、%sバイト、gzip %sバイト）",
+            document['path'], len(news), len(body), len(compressed)
+        )
+        uploaded = self._upload_once(document['contentHash'], document['path'], body)
+        return {'contentHash': document['contentHash'], 'etag': etag, 'path': document['path'],
+                'changed': True, 'uploaded': uploaded}
+
+    def _upload_once(self, digest_hash: str, path: str, body: bytes) -> bool:
+        """
+        ダイジェストをVercel Blobにアップロード（同じ内容をアップロード済みの場合は何もしない）
+
+        Args:
+            digest_hash: ダイジェストのcontentHash
+            path: バージョンごとのダイジェストのパス（出力先からの相対パス）
+            body: latest.jsonの内容
+
+        Returns:
+            アップロード済みの場合True（トークンが未設定・アップロードに失敗した場合はFalse）
+        """
+        if not self.blob_token:
+            return False
+        marker = os.path.join(self.output_dir, UPLOADED_NAME)
+        try:
+            with open(marker, 'r', encoding='utf-8') as f:
+                if f.read().strip() == digest_hash:
+                    return True
+        except OSError:
+            pass
+
+        import requests
+        from http_client import get_http_client
+        try:
+            # バージョンごとのダイジェストをアップロードしてから最新のダイジェストを差し替える
+            self._put_blob(get_http_client(), path, body, BLOB_VERSION_MAX_AGE)
+            url = self._put_blob(get_http_client(), LATEST_NAME, body, BLOB_LATEST_MAX_AGE)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning("ダイジェストをVercel Blobにアップロードできませんでした: %s", e)
+            return False
+
+        self._write_atomic(marker, digest_hash.encode('utf-8'))
+        logger.info("ダイジェストをVercel Blobにアップロードしました: %s", url)
+        return True
+
+    def _put_blob(self, http, path: str, body: bytes, max_age: int) -> str:
+        """1つのファイルを上書きでアップロードし、公開URLを返す"""
+        pathname = f"{self.blob_prefix}/{path}" if self.blob_prefix else path
+        response = http.request(
+            'PUT', f"{DIGEST_BLOB_API_URL.rstrip('/')}/",
+            params={'pathname': pathname},
+            data=body,
+            headers={
+                'Authorization': f'Bearer {self.blob_token}',
+                'x-api-version': BLOB_API_VERSION,
+                'x-content-type': 'application/json; charset=utf-8',
+                'x-add-random-suffix': '0',
+                'x-allow-overwrite': '1',
+                'x-cache-control-max-age': str(max_age),
+            },
+            timeout=BLOB_TIMEOUT
+        )
+        response.raise_for_status()
+        return response.json()['url']
+
+    def _load_latest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.output_dir, LATEST_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("最新のダイジェストを読み込めませんでした。新しく書き出します: %s", e)
+            return None
+
+    def _write_atomic(self, path: str, data: bytes):
+        """一時ファイルに書き込んでから置き換える（配信中のファイルが途中まで書かれた状態にならないようにする）"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _prune(self, versions_dir: str):
+        """古いバージョンを削除（新しい順にkeep_versions個を残す）"""
+        versions = sorted(
+            (entry for entry in os.scandir(versions_dir) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True
+        )
+        for entry in versions[self.keep_versions:]:
+            for path in (entry.path, f'{entry.path}.gz'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
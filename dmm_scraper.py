@@ -1,108 +1,344 @@
 """
 DMM英会話のDaily Newsを取得するモジュール
 """
-import requests
-from bs4 import BeautifulSoup
 import logging
-from typing import List, Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
+from urllib.parse import urljoin, urlparse
+from config import (
+    SCRAPER_MAX_WORKERS,
+    SCRAPER_PER_HOST_CONCURRENCY,
+    HTTP_CACHE_ENABLED,
+    DMM_DAILY_NEWS_URL,
+    HTML_PARSER_BACKEND,
+    SELECTOR_CACHE_ENABLED,
+    ARTICLE_STREAMING,
+    ARTICLE_MAX_BYTES,
+    ARTICLE_STREAM_CHUNK_SIZE,
+)
+from http_client import HttpClient, get_http_client
+from http_cache import BodyReader, CachedResponse, HttpCache
+from logging_config import article_context
+from metrics import get_metrics
+from news_source import HostLimiter, NewsSource
+from selector_cache import SelectorCache
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ストリーミング取得で本文が確定したかを最初に確認するまでに読み込むバイト数（以降は2倍ずつ増やす）
+STREAM_FIRST_CHECK_BYTES = 64 * 1024
 
-class DMMNewsScraper:
+
+class DMMNewsScraper(NewsSource):
     """DMM英会話のDaily Newsをスクレイピングするクラス"""
     
-    def __init__(self, base_url: str = "https://eikaiwa.dmm.com/app/daily-news/"):
+    name = 'dmm'
+    
+    def __init__(self, base_url: str = DMM_DAILY_NEWS_URL,
+                 max_workers: Optional[int] = None, per_host_limit: Optional[int] = None,
+                 http_client: Optional[HttpClient] = None, http_cache: Optional[HttpCache] = None,
+                 parser_backend: Optional[str] = None, selector_cache: Optional[SelectorCache] = None,
+                 streaming: bool = ARTICLE_STREAMING, max_bytes: int = ARTICLE_MAX_BYTES,
+                 host_limiter: Optional[HostLimiter] = None, fallback: bool = True):
+        """
+        Args:
+            base_url: Daily Newsの一覧ページURL
+            max_workers: 詳細ページを並列取得するワーカー数（1で逐次取得）
+            per_host_limit: 同一ホストへの同時接続数の上限（host_limiterを指定した場合はそちらに従う）
+            http_client: 使用するHTTPクライアント（省略時は共有クライアント）
+            http_cache: 条件付きGETキャッシュ（省略時は設定に従って生成）
+            parser_backend: HTML解析バックエンド名（省略時は設定に従う）
+            selector_cache: 成功したセレクタを記憶するキャッシュ（省略時は設定に従って生成）
+            streaming: Trueの場合、記事ページを少しずつ読み込み、本文が確定した時点で読み込みを止める
+            max_bytes: 記事ページを読み込む最大バイト数（ストリーミング取得時）
+            host_limiter: ホストごとの同時接続数・リクエスト間隔の制限（他のニュースソースと共有する場合に指定）
+            fallback: Trueの場合、1件も取得できなければサンプルニュースを返す
+        """
         self.base_url = base_url
+        self.http = http_client or get_http_client()
+        if http_cache is None and HTTP_CACHE_ENABLED:
+            http_cache = HttpCache()
+        self.http_cache = http_cache
+        self.parser_backend = parser_backend or HTML_PARSER_BACKEND
+        self._parser = None
+        self._parser_lock = threading.Lock()
+        if selector_cache is None and SELECTOR_CACHE_ENABLED:
+            selector_cache = SelectorCache()
+        self.selector_cache = selector_cache
+        self.streaming = streaming
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers or SCRAPER_MAX_WORKERS
+        self.per_host_limit = per_host_limit or SCRAPER_PER_HOST_CONCURRENCY
+        self.host_limiter = host_limiter or HostLimiter(self.per_host_limit)
+        self.fallback = fallback
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
     
+    @property
+    def parser(self):
+        """
+        HTML解析バックエンド
+        
+        BeautifulSoupなどの読み込みに時間がかかるため、最初に解析するときに生成する
+        （一覧・記事ページがすべてキャッシュから再利用できた場合は読み込まない）
+        """
+        if self._parser is None:
+            with self._parser_lock:
+                if self._parser is None:
+                    from html_parser import create_backend
+                    self._parser = create_backend(self.parser_backend)
+        return self._parser
+    
     def get_latest_news(self, count: int = 3) -> List[Dict[str, str]]:
         """
         最新のニュースを取得
         
+        一覧ページから候補記事を抽出し、詳細ページを並列に取得する。
+        結果は一覧ページの順序を保ち、count件集まった時点で未着手の取得はキャンセルする。
+        
         Args:
             count: 取得するニュース数
             
         Returns:
             ニュースのリスト（タイトル、URL、本文を含む）
         """
+        return list(self.iter_latest_news(count))
+    
+    def iter_latest_news(self, count: int = 3) -> Iterator[Dict[str, str]]:
+        """
+        最新のニュースを取得でき次第（一覧ページの順序で）返す
+        
+        1件も取得できなかった場合はフォールバックニュースを返す
+        
+        Args:
+            count: 取得するニュース数
+            
+        Yields:
+            ニュース（タイトル、URL、本文を含む）
+        """
+        yielded = 0
         try:
-            response = requests.get(self.base_url, headers=self.headers, timeout=30)
-            response.raise_for_status()
+            response = self._fetch(self.base_url, page='listing')
+            
+            # 一覧ページが更新されていなければ前回抽出した候補を再利用する
+            candidates_key = f'candidates:{count}'
+            cached_candidates = self.http_cache.annotation(self.base_url, candidates_key) if response.from_cache else None
+            if cached_candidates:
+                candidates = [tuple(c) for c in cached_candidates]
+            else:
+                candidates = self._parse_candidates(response.content, count)
+                if self.http_cache is not None:
+                    self.http_cache.annotate(self.base_url, candidates_key, candidates)
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            news_list = []
+            for news in self._iter_news_contents(candidates, count):
+                yielded += 1
+                yield news
+            self._log_cache_stats()
+            
+            if not yielded:
+                logger.warning("ニュースが見つかりませんでした。ページ構造が変更されている可能性があります。")
+            
+        except Exception as e:
+            logger.error("ニュース取得中にエラーが発生: %s", e)
+        finally:
+            if self.http_cache is not None:
+                self.http_cache.flush()
+        
+        if not yielded and self.fallback:
+            # フォールバック: サンプルデータを返す（テスト用）
+            yield from self.fallback_news(count)
+    
+    def get_listing_candidates(self, url: str, limit: int) -> List[Tuple[str, str]]:
+        """
+        任意の一覧ページ（アーカイブの過去のページなど）から候補記事を抽出
+        
+        Args:
+            url: 一覧ページのURL
+            limit: 抽出する候補の最大数
+            
+        Returns:
+            (タイトル, URL) のリスト（一覧ページの順序、URL重複なし）
             
-            # DMM英会話のDaily Newsページの構造に応じてセレクタを調整
-            # 一般的な構造を想定
-            news_items = soup.select('article, .news-item, .daily-news-item, a[href*="/daily-news/"]')
+        Raises:
+            requests.exceptions.RequestException: 一覧ページを取得できなかった場合
+        """
+        response = self._fetch(url, page='listing')
+        return self._parse_candidates(response.content, (limit + 1) // 2)
+    
+    def get_news_content(self, url: str) -> str:
+        """
+        記事ページの本文を取得（ホストごとの同時接続数を制限する）
+        
+        Args:
+            url: ニュース記事のURL
             
-            if not news_items:
-                # 別のセレクタを試す
-                news_items = soup.find_all('a', href=lambda x: x and '/daily-news/' in x)
+        Returns:
+            ニュース本文（取得できなかった場合は空文字列）
+        """
+        return self._get_news_content(url)
+    
+    def _parse_candidates(self, html: bytes, count: int) -> List[Tuple[str, str]]:
+        """
+        一覧ページのHTMLから候補記事を抽出
+        
+        Args:
+            html: 一覧ページのHTML
+            count: 取得するニュース数
             
-            seen_urls = set()
+        Returns:
+            (タイトル, URL) のリスト
+        """
+        # DMM英会話のDaily Newsページの構造に応じてセレクタを調整（html_parser.LISTING_SELECTORS）
+        # 余分に取得して重複を避ける
+        if self.selector_cache is None:
+            with get_metrics().span('parse', page='listing'):
+                return self._extract_candidates(self.parser.listing_items(html, count * 2))
+        
+        preferred = self._preferred_selector('listing', self.base_url)
+        with get_metrics().span('parse', page='listing'):
+            items, matched = self.parser.listing_items_with_selector(html, count * 2, preferred)
+        self.selector_cache.record(self.selector_cache.key('listing', self.base_url), preferred, matched)
+        return self._extract_candidates(items)
+    
+    def _fetch(self, url: str, reader: Optional[BodyReader] = None, page: str = 'article') -> CachedResponse:
+        """
+        ページを取得（キャッシュが有効な場合は条件付きGETで再検証）
+        
+        ホストごとの同時接続数とリクエストの間隔を制限する（一覧ページ・記事ページ共通）
+        
+        Args:
+            url: 取得するURL
+            reader: 本文を読み込む関数（指定した場合はstream=Trueで取得する）
+            page: 計測用のページ種別（listing / article）
             
-            for item in news_items[:count * 2]:  # 余分に取得して重複を避ける
+        Returns:
+            CachedResponse（本文とキャッシュ利用の有無）
+        """
+        with self.host_limiter.limit(url), get_metrics().span('scrape.fetch', page=page) as span:
+            if self.http_cache is not None:
+                response = self.http_cache.get(self.http, url, reader, headers=self.headers, timeout=30)
+            else:
+                response = self.http.get(url, headers=self.headers, timeout=30, stream=reader is not None)
                 try:
-                    # URLを取得
-                    if item.name == 'a':
-                        url = item.get('href', '')
-                    else:
-                        link = item.find('a')
-                        url = link.get('href', '') if link else ''
-                    
-                    if not url or url in seen_urls:
-                        continue
-                    
-                    # 相対URLを絶対URLに変換
-                    if url.startswith('/'):
-                        url = f"https://eikaiwa.dmm.com{url}"
-                    elif not url.startswith('http'):
-                        continue
-                    
-                    # タイトルを取得
-                    title_elem = item.find(['h1', 'h2', 'h3', 'h4', '.title', '.news-title'])
-                    if not title_elem:
-                        title_elem = item
-                    title = title_elem.get_text(strip=True)
-                    
-                    if not title or len(title) < 10:  # 短すぎるタイトルはスキップ
-                        continue
-                    
-                    # 本文を取得（詳細ページから）
-                    content = self._get_news_content(url)
-                    
-                    if content:
-                        news_list.append({
-                            'title': title,
-                            'url': url,
-                            'content': content,
-                            'date': datetime.now().strftime('%Y-%m-%d')
-                        })
-                        seen_urls.add(url)
-                        
-                        if len(news_list) >= count:
-                            break
-                            
-                except Exception as e:
-                    logger.warning(f"ニュース項目の処理中にエラー: {e}")
-                    continue
+                    response.raise_for_status()
+                    body = reader(response)[0] if reader is not None else response.content
+                finally:
+                    response.close()
+                response = CachedResponse(body, False)
+            span['bytes'] = len(response.content)
+            span['from_cache'] = response.from_cache
+            return response
+    
+    def _log_cache_stats(self):
+        """HTTPキャッシュ・セレクタキャッシュのヒット率をログに出力し、セレクタの学習結果を保存"""
+        if self.http_cache is not None:
+            stats = self.http_cache.stats()
+            logger.info(
+                "HTTPキャッシュ: ヒット %s件 / ミス %s件（ヒット率 %.0f%%、%s件 %sバイト）",
+                stats['hits'], stats['misses'], stats['hit_rate'] * 100, stats['entries'], stats['bytes']
+            )
+        
+        if self.selector_cache is not None:
+            stats = self.selector_cache.stats()
+            logger.info(
+                "セレクタキャッシュ: ヒット %s件 / ミス %s件（ヒット率 %.0f%%、学習し直し %s回）",
+                stats['hits'], stats['misses'], stats['hit_rate'] * 100, stats['relearned']
+            )
+            try:
+                self.selector_cache.save()
+            except Exception as e:
+                logger.warning("セレクタキャッシュを保存できませんでした: %s", e)
+    
+    def _extract_candidates(self, news_items: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        一覧ページの要素から候補記事（タイトル、URL）を抽出
+        
+        Args:
+            news_items: 一覧ページから選択した要素の (タイトル, リンク) のリスト
             
-            if not news_list:
-                logger.warning("ニュースが見つかりませんでした。ページ構造が変更されている可能性があります。")
-                # フォールバック: サンプルデータを返す（テスト用）
-                return self._get_fallback_news(count)
+        Returns:
+            (タイトル, URL) のリスト（一覧ページの順序、URL重複なし）
+        """
+        candidates = []
+        seen_urls = set()
+        
+        for title, url in news_items:
+            try:
+                if not url:
+                    continue
+                
+                # 相対URLを一覧ページと同じホストの絶対URLに変換
+                if url.startswith('/'):
+                    url = urljoin(self.base_url, url)
+                elif not url.startswith('http'):
+                    continue
+                
+                if url in seen_urls:
+                    continue
+                
+                if not title or len(title) < 10:  # 短すぎるタイトルはスキップ
+                    continue
+                
+                seen_urls.add(url)
+                candidates.append((title, url))
+                
+            except Exception as e:
+                logger.warning("ニュース項目の処理中にエラー: %s", e)
+                continue
+        
+        return candidates
+    
+    def _iter_news_contents(self, candidates: List[Tuple[str, str]], count: int) -> Iterator[Dict[str, str]]:
+        """
+        候補記事の本文を並列に取得し、候補の順序で返す
+        
+        Args:
+            candidates: (タイトル, URL) のリスト
+            count: 取得するニュース数
             
-            return news_list[:count]
+        Yields:
+            本文を取得できたニュース
+        """
+        if not candidates:
+            return
+        
+        workers = max(1, min(self.max_workers, len(candidates)))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dmm-fetch')
+        futures = []
+        try:
+            futures = [
+                executor.submit(self._get_news_content, url)
+                for _, url in candidates
+            ]
             
-        except Exception as e:
-            logger.error(f"ニュース取得中にエラーが発生: {e}")
-            return self._get_fallback_news(count)
+            # 一覧ページの順序で結果を回収する
+            found = 0
+            for (title, url), future in zip(candidates, futures):
+                try:
+                    content = future.result()
+                except Exception as e:
+                    logger.warning("ニュース項目の処理中にエラー: %s", e)
+                    continue
+                
+                if content:
+                    found += 1
+                    yield {
+                        'title': title,
+                        'url': url,
+                        'content': content,
+                        'date': datetime.now().strftime('%Y-%m-%d')
+                    }
+                    
+                    if found >= count:
+                        break
+        finally:
+            # 未着手の取得はキャンセル（実行中のものは完了を待たない）
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
     
     def _get_news_content(self, url: str) -> str:
         """
@@ -114,47 +350,99 @@ class DMMNewsScraper:
         Returns:
             ニュース本文
         """
-        try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # 本文を取得（一般的なセレクタを試す）
-            content_selectors = [
-                '.article-content',
-                '.news-content',
-                '.content',
-                'article p',
-                '.text-content',
-                'main p'
-            ]
+        with article_context(url):
+            try:
+                preferred = self._preferred_selector('content', url)
+                reader = (lambda r: self._read_article(r, url, preferred)) if self.streaming else None
+                response = self._fetch(url, reader)
             
-            content = ""
-            for selector in content_selectors:
-                elements = soup.select(selector)
-                if elements:
-                    content = ' '.join([elem.get_text(strip=True) for elem in elements])
-                    if len(content) > 100:  # 十分な長さがある場合
-                        break
+                # ページが更新されていなければ前回抽出した本文を再利用する
+                if response.from_cache:
+                    cached_content = self.http_cache.annotation(url, 'content')
+                    if cached_content:
+                        return cached_content
             
-            if not content or len(content) < 100:
-                # フォールバック: すべてのpタグから取得
-                paragraphs = soup.find_all('p')
-                content = ' '.join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20])
+                content = self._extract_content(response.content, url, preferred)
+                if self.http_cache is not None and content:
+                    self.http_cache.annotate(url, 'content', content)
+                return content
             
-            return content[:5000]  # 長すぎる場合は切り詰め
+            except Exception as e:
+                logger.warning("ニュース本文の取得中にエラー: %s, %s", url, e)
+                return ""
+    
+    def _preferred_selector(self, kind: str, url: str) -> Optional[str]:
+        """同じ種類のページで前回成功したセレクタを取得（セレクタキャッシュが無効な場合はNone）"""
+        if self.selector_cache is None:
+            return None
+        return self.selector_cache.preferred(self.selector_cache.key(kind, url))
+    
+    def _read_article(self, response, url: str, preferred: Optional[str]) -> Tuple[bytes, bool]:
+        """
+        記事ページを少しずつ読み込み、本文が確定するか上限バイト数に達した時点で読み込みを止める
+        
+        本文は最大CONTENT_MAX_LENGTH文字で切り詰めるため、最優先のセレクタで確定した本文がその長さに
+        達していれば、続きを読み込んでも抽出結果は変わらない
+        
+        Args:
+            response: stream=Trueで取得したレスポンス
+            url: 記事ページのURL
+            preferred: 最初に試すセレクタ
             
-        except Exception as e:
-            logger.warning(f"ニュース本文の取得中にエラー: {url}, {e}")
-            return ""
+        Returns:
+            (読み込んだHTML, 最後まで読み込んだか)
+        """
+        from html_parser import CONTENT_MAX_LENGTH
+        
+        buffer = bytearray()
+        next_check = STREAM_FIRST_CHECK_BYTES
+        metrics = get_metrics()
+        host = urlparse(url).netloc
+        for chunk in response.iter_content(chunk_size=ARTICLE_STREAM_CHUNK_SIZE):
+            buffer += chunk
+            metrics.increment('http_response_bytes', len(chunk), host=host)
+            
+            if len(buffer) >= self.max_bytes:
+                logger.warning("記事ページが%sバイトを超えたため、以降の読み込みを打ち切りました: %s", self.max_bytes, url)
+                return _cut_at_tag_end(buffer[:self.max_bytes]), False
+            
+            if len(buffer) >= next_check:
+                next_check *= 2
+                html = _cut_at_tag_end(buffer)
+                if self.parser.settled_content_length(html, preferred) >= CONTENT_MAX_LENGTH:
+                    logger.info("本文が確定したため、%sバイトで読み込みを止めました: %s", len(html), url)
+                    return html, False
+        
+        return bytes(buffer), True
+    
+    def _extract_content(self, html: bytes, url: str, preferred: Optional[str] = None) -> str:
+        """
+        記事ページのHTMLから本文を抽出（同じ種類のページで前回成功したセレクタを最初に試す）
+        
+        Args:
+            html: 記事ページのHTML
+            url: 記事ページのURL
+            preferred: 最初に試すセレクタ
+            
+        Returns:
+            ニュース本文
+        """
+        if self.selector_cache is None:
+            with get_metrics().span('parse', page='article'):
+                return self.parser.extract_content(html)
+        
+        with get_metrics().span('parse', page='article'):
+            content, matched = self.parser.extract_content_with_selector(html, preferred)
+        self.selector_cache.record(self.selector_cache.key('content', url), preferred, matched)
+        return content
     
-    def _get_fallback_news(self, count: int) -> List[Dict[str, str]]:
+    def fallback_news(self, count: int) -> List[Dict[str, str]]:
         """
         フォールバック用のサンプルニュース（テスト用）
         実際のスクレイピングが失敗した場合に使用
         """
         logger.info("フォールバックニュースを使用します")
+        get_metrics().increment('fallbacks', count, kind='news')
         return [
             {
                 'title': 'Sample News Article 1',
@@ -164,3 +452,15 @@ class DMMNewsScraper:
             }
         ] * count
 
+
+def _cut_at_tag_end(buffer: bytearray) -> bytes:
+    """
+    途中までのHTMLを最後のタグの終わりで切る（タグやマルチバイト文字の途中で切れたまま解析しないため）
+    
+    Args:
+        buffer: 読み込んだHTML
+        
+    Returns:
+        最後の'>'までのHTML
+    """
+    return bytes(buffer[:buffer.rfind(b'>') + 1])
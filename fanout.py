@@ -0,0 +1,135 @@
+"""
+ダイジェストを多数の購読者にmulticastで配信するモジュール
+ダイジェストは1回だけメッセージに変換し、最大500人ずつのバッチで並列に送信する
+"""
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from config import FANOUT_WORKERS, MULTICAST_BATCH_SIZE
+from line_bot import LineBotSender, MessageGroup, MAX_MESSAGES_PER_PUSH, MAX_MULTICAST_RECIPIENTS
+from subscriber_store import SubscriberStore
+
+logger = logging.getLogger(__name__)
+
+
+def digest_id_for(messages: List[dict]) -> str:
+    """
+    メッセージ内容からダイジェストIDを生成（同じ内容の再実行は同じダイジェストとして再開される）
+
+    Args:
+        messages: メッセージオブジェクトのリスト
+
+    Returns:
+        ダイジェストID
+    """
+    canonical = json.dumps(messages, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+class FanoutDelivery:
+    """購読者リスト全員にダイジェストをmulticastで配信するクラス"""
+
+    def __init__(self, line_bot: LineBotSender, subscribers: SubscriberStore,
+                 workers: int = FANOUT_WORKERS, batch_size: int = MULTICAST_BATCH_SIZE):
+        """
+        Args:
+            line_bot: 送信に使用するLINE Bot
+            subscribers: 購読者リストと配信状況のストア
+            workers: 並列に送信するバッチ数
+            batch_size: 1回のmulticastで送信する購読者数（最大500）
+        """
+        self.line_bot = line_bot
+        self.subscribers = subscribers
+        self.workers = max(1, workers)
+        self.batch_size = max(1, min(batch_size, MAX_MULTICAST_RECIPIENTS))
+
+    def deliver(self, groups: List[MessageGroup]) -> bool:
+        """
+        ダイジェストを購読者全員に配信
+
+        同じ内容のダイジェストを再度配信した場合は、未配信の購読者にのみ送信する
+
+        Args:
+            groups: 配信するメッセージの送信単位（LineBotSender.send_packedと同じ形式）
+
+        Returns:
+            全員に配信できた場合True
+        """
+        messages = [message for _, message_list in groups for message in message_list]
+        digest_id = digest_id_for(messages)
+        self.subscribers.save_digest(digest_id, messages)
+        return self._deliver_digest(digest_id, messages)
+
+    def retry_failed(self) -> bool:
+        """
+        過去のダイジェストで配信に失敗した購読者に再送
+
+        Returns:
+            再送がすべて成功した場合True
+        """
+        success = True
+        for digest_id in self.subscribers.digests_with_pending():
+            messages = self.subscribers.get_digest(digest_id)
+            if messages is None:
+                continue
+            logger.info("ダイジェスト %s の再送を行います", digest_id)
+            if not self._deliver_digest(digest_id, messages):
+                success = False
+        return success
+
+    def _deliver_digest(self, digest_id: str, messages: List[dict]) -> bool:
+        """未配信の購読者にダイジェストをバッチ単位で並列送信"""
+        recipients = self.subscribers.pending_recipients(digest_id)
+        if not recipients:
+            logger.info("ダイジェスト %s は全員に配信済みです", digest_id)
+            return True
+
+        # メッセージは1回のmulticastで送れる件数ごとに分ける（全バッチで共有）
+        message_chunks = [
+            messages[start:start + MAX_MESSAGES_PER_PUSH]
+            for start in range(0, len(messages), MAX_MESSAGES_PER_PUSH)
+        ]
+
+        # 前回途中まで送信できた購読者は続きから送信するため、送信済みのリクエスト数ごとにバッチを作る
+        by_progress: Dict[int, List[str]] = {}
+        for user_id, chunks_sent in recipients:
+            by_progress.setdefault(chunks_sent, []).append(user_id)
+        batches = [
+            (chunks_sent, user_ids[start:start + self.batch_size])
+            for chunks_sent, user_ids in sorted(by_progress.items())
+            for start in range(0, len(user_ids), self.batch_size)
+        ]
+        logger.info(
+            "ダイジェスト %s を%s人に配信します（%sバッチ × 最大%sリクエスト）",
+            digest_id, len(recipients), len(batches), len(message_chunks)
+        )
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fanout') as executor:
+            results = list(executor.map(
+                lambda batch: self._deliver_batch(digest_id, batch[1], message_chunks, batch[0]),
+                batches
+            ))
+
+        stats = self.subscribers.delivery_stats(digest_id)
+        logger.info("ダイジェスト %s の配信状況: %s", digest_id, stats)
+        return all(results)
+
+    def _deliver_batch(self, digest_id: str, user_ids: List[str], message_chunks: List[List[dict]],
+                       chunks_sent: int) -> bool:
+        """1バッチの購読者にダイジェストの未送信部分を順番に送信し、結果を記録"""
+        error: Optional[str] = None
+        for chunk in message_chunks[chunks_sent:]:
+            error = self.line_bot.multicast(user_ids, chunk)
+            if error is not None:
+                break
+            chunks_sent += 1
+
+        self.subscribers.record_results(digest_id, user_ids, delivered=error is None,
+                                        chunks_sent=chunks_sent, error=error)
+        if error is not None:
+            logger.error("%s人への配信に失敗しました: %s", len(user_ids), error)
+            return False
+        return True
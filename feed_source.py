@@ -0,0 +1,217 @@
+"""
+RSS/Atomフィードからニュースを取得するニュースソースモジュール
+
+フィードの各項目の本文（content:encoded・description・Atomのcontent/summary）が短い場合は、
+記事ページを取得して本文を抽出する（html_parserの汎用セレクタを使用）
+"""
+import html
+import logging
+import re
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from config import SCRAPER_MAX_WORKERS, SCRAPER_PER_HOST_CONCURRENCY, HTTP_CACHE_ENABLED, HTML_PARSER_BACKEND
+from http_cache import CachedResponse, HttpCache
+from http_client import HttpClient, get_http_client
+from logging_config import article_context
+from metrics import get_metrics
+from news_source import HostLimiter, NewsSource
+
+logger = logging.getLogger(__name__)
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+CONTENT_NS = '{http://purl.org/rss/1.0/modules/content/}'
+
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+_SPACE_PATTERN = re.compile(r'\s+')
+
+
+class FeedItem(NamedTuple):
+    """フィードの1項目"""
+    title: str
+    url: str
+    text: str  # フィードに含まれる本文（タグを除いたもの）
+    date: str
+
+
+def _strip_tags(markup: Optional[str]) -> str:
+    """HTMLのタグを除いてテキストにする"""
+    if not markup:
+        return ''
+    return _SPACE_PATTERN.sub(' ', html.unescape(_TAG_PATTERN.sub(' ', markup))).strip()
+
+
+def _format_date(value: Optional[str]) -> str:
+    """RFC 822（RSS）・ISO 8601（Atom）の日時をYYYY-MM-DDにする（解析できない場合は今日の日付）"""
+    if value:
+        value = value.strip()
+        try:
+            return parsedate_to_datetime(value).strftime('%Y-%m-%d')
+        except (TypeError, ValueError):
+            pass
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+def parse_feed(document: bytes) -> List[FeedItem]:
+    """
+    RSS 2.0・Atomのフィードを解析
+
+    Args:
+        document: フィードのXML
+
+    Returns:
+        FeedItemのリスト（フィードの順序、URL重複なし）
+    """
+    root = ET.fromstring(document)
+    items = []
+    for entry in root.iter('item'):
+        items.append(FeedItem(
+            _strip_tags(entry.findtext('title')),
+            (entry.findtext('link') or '').strip(),
+            _strip_tags(entry.findtext(f'{CONTENT_NS}encoded') or entry.findtext('description')),
+            _format_date(entry.findtext('pubDate')),
+        ))
+    for entry in root.iter(f'{ATOM_NS}entry'):
+        links = entry.findall(f'{ATOM_NS}link')
+        link = next((l for l in links if l.get('rel', 'alternate') == 'alternate'), links[0] if links else None)
+        items.append(FeedItem(
+            _strip_tags(entry.findtext(f'{ATOM_NS}title')),
+            (link.get('href', '') if link is not None else '').strip(),
+            _strip_tags(entry.findtext(f'{ATOM_NS}content') or entry.findtext(f'{ATOM_NS}summary')),
+            _format_date(entry.findtext(f'{ATOM_NS}published') or entry.findtext(f'{ATOM_NS}updated')),
+        ))
+
+    seen_urls = set()
+    unique = []
+    for item in items:
+        if item.url.startswith('http') and item.title and item.url not in seen_urls:
+            seen_urls.add(item.url)
+            unique.append(item)
+    return unique
+
+
+class FeedNewsSource(NewsSource):
+    """RSS/Atomフィードのニュースソース"""
+
+    def __init__(self, name: str, feed_url: str, max_workers: Optional[int] = None,
+                 http_client: Optional[HttpClient] = None, http_cache: Optional[HttpCache] = None,
+                 host_limiter: Optional[HostLimiter] = None, parser_backend: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        """
+        Args:
+            name: ソース名
+            feed_url: フィードのURL
+            max_workers: 記事ページを並列取得するワーカー数
+            http_client: 使用するHTTPクライアント（省略時は共有クライアント）
+            http_cache: 条件付きGETキャッシュ（省略時は設定に従って生成）
+            host_limiter: ホストごとの同時接続数・リクエスト間隔の制限（他のニュースソースと共有する場合に指定）
+            parser_backend: 記事ページの解析バックエンド名（省略時は設定に従う）
+            timeout: 取得時間の上限（秒、省略時はSOURCE_TIMEOUT）
+        """
+        self.name = name
+        self.feed_url = feed_url
+        self.timeout = timeout
+        self.max_workers = max_workers or SCRAPER_MAX_WORKERS
+        self.http = http_client or get_http_client()
+        if http_cache is None and HTTP_CACHE_ENABLED:
+            http_cache = HttpCache()
+        self.http_cache = http_cache
+        self.host_limiter = host_limiter or HostLimiter(SCRAPER_PER_HOST_CONCURRENCY)
+        self.parser_backend = parser_backend or HTML_PARSER_BACKEND
+        self._parser = None
+        self._parser_lock = threading.Lock()
+        self.headers = {'User-Agent': 'Mozilla/5.0 (compatible; DailyNewsSummary/1.0)'}
+
+    @property
+    def parser(self):
+        """HTML解析バックエンド（記事ページの取得が必要になった時点で生成する）"""
+        if self._parser is None:
+            with self._parser_lock:
+                if self._parser is None:
+                    from html_parser import create_backend
+                    self._parser = create_backend(self.parser_backend)
+        return self._parser
+
+    def iter_latest_news(self, count: int = 3) -> Iterator[Dict[str, str]]:
+        """
+        フィードの先頭から、本文を取得できたニュースを順に返す
+
+        Args:
+            count: 取得するニュース数
+
+        Yields:
+            ニュース（title, url, content, dateを含む）
+        """
+        try:
+            with get_metrics().span('parse', page='feed'):
+                items = parse_feed(self._fetch(self.feed_url, page='feed').content)
+        except Exception as e:
+            logger.error("フィードの取得中にエラーが発生: %s, %s", self.name, e)
+            return
+
+        # 本文が取得できない項目に備えて余分に候補にする
+        candidates = items[:count * 2]
+        if not candidates:
+            logger.warning("フィードに記事がありませんでした: %s", self.name)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(candidates))),
+                                      thread_name_prefix=f'{self.name}-fetch')
+        futures = []
+        try:
+            futures = [executor.submit(self._news_content, item) for item in candidates]
+            found = 0
+            for item, future in zip(candidates, futures):
+                content = future.result()
+                if not content:
+                    continue
+                found += 1
+                yield {'title': item.title, 'url': item.url, 'content': content, 'date': item.date}
+                if found >= count:
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+            if self.http_cache is not None:
+                self.http_cache.flush()
+
+    def _news_content(self, item: FeedItem) -> str:
+        """フィードの本文が十分な長さならそれを、短ければ記事ページから抽出した本文を返す"""
+        from html_parser import CONTENT_MAX_LENGTH, CONTENT_MIN_LENGTH
+
+        with article_context(item.url):
+            if len(item.text) >= CONTENT_MIN_LENGTH:
+                return item.text[:CONTENT_MAX_LENGTH]
+            try:
+                response = self._fetch(item.url)
+                with get_metrics().span('parse', page='article'):
+                    return self.parser.extract_content(response.content) or item.text
+            except Exception as e:
+                logger.warning("ニュース本文の取得中にエラー: %s, %s", item.url, e)
+                return item.text
+
+    def _fetch(self, url: str, page: str = 'article') -> CachedResponse:
+        """ページを取得（キャッシュが有効な場合は条件付きGETで再検証し、ホストごとの同時接続数と間隔を制限する）"""
+        with self.host_limiter.limit(url), get_metrics().span('scrape.fetch', page=page, source=self.name) as span:
+            if self.http_cache is not None:
+                response = self.http_cache.get(self.http, url, headers=self.headers, timeout=30)
+            else:
+                response = self.http.get(url, headers=self.headers, timeout=30)
+                try:
+                    response.raise_for_status()
+                    body = response.content
+                finally:
+                    response.close()
+                response = CachedResponse(body, False)
+            span['bytes'] = len(response.content)
+            span['from_cache'] = response.from_cache
+            return response
@@ -0,0 +1,229 @@
+"""
+ニュースのダイジェストをLINEのFlex Message（カルーセル）に変換するモジュール
+
+1記事を1つのバブルにし、バブル数（12件）とJSONのサイズ（バブル30KB・カルーセル50KB）の上限に収まるよう
+カルーセルにまとめる。テンプレートは生成時に1回だけ組み立て、固定部分のJSONのサイズを求めておく。
+記事ごとには差し込む値のサイズだけを数えるため、送信時のJSON（requestsの json= と同じ形式）のサイズを
+カルーセル全体を変換し直さずに正確に求められ、記事数に比例した時間で変換できる
+"""
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# 1つのカルーセルに入れられるバブル数の上限
+MAX_CAROUSEL_BUBBLES = 12
+
+# バブル・カルーセルを表すJSONのサイズの上限（バイト）
+MAX_BUBBLE_BYTES = 30 * 1024
+MAX_CAROUSEL_BYTES = 50 * 1024
+
+# 代替テキスト・URIアクションのURIの文字数の上限
+MAX_ALT_TEXT_LENGTH = 400
+MAX_URI_LENGTH = 1000
+
+
+class Slot(NamedTuple):
+    """テンプレートの差し込み位置"""
+    name: str
+
+
+class Rendered(NamedTuple):
+    """変換済みの値と、送信時のJSONでのサイズ（バイト）"""
+    value: Any
+    size: int
+
+
+def json_size(value: Any) -> int:
+    """
+    値を送信時と同じ形式（json.dumpsの既定の区切り・ASCIIエスケープ）にした場合のサイズ
+
+    Args:
+        value: Rendered、そのリスト、またはJSONにできる値
+
+    Returns:
+        サイズ（バイト）
+    """
+    if isinstance(value, Rendered):
+        return value.size
+    if isinstance(value, list):
+        # "[" + 要素を ", " で区切ったもの + "]"
+        return 2 + sum(json_size(item) for item in value) + 2 * max(0, len(value) - 1)
+    return len(json.dumps(value, allow_nan=False))
+
+
+def _unwrap(value: Any) -> Any:
+    if isinstance(value, Rendered):
+        return value.value
+    if isinstance(value, list):
+        return [_unwrap(item) for item in value]
+    return value
+
+
+def _fill(node: Any, values: Dict[str, Any]) -> Any:
+    if isinstance(node, Slot):
+        return _unwrap(values[node.name])
+    if isinstance(node, dict):
+        return {key: _fill(child, values) for key, child in node.items()}
+    if isinstance(node, list):
+        return [_fill(child, values) for child in node]
+    return node
+
+
+def _replace_slots(node: Any) -> Any:
+    if isinstance(node, Slot):
+        return f'\0{node.name}\0'
+    if isinstance(node, dict):
+        return {key: _replace_slots(child) for key, child in node.items()}
+    if isinstance(node, list):
+        return [_replace_slots(child) for child in node]
+    return node
+
+
+def _slot_names(node: Any) -> List[str]:
+    if isinstance(node, Slot):
+        return [node.name]
+    children = node.values() if isinstance(node, dict) else node if isinstance(node, list) else ()
+    return [name for child in children for name in _slot_names(child)]
+
+
+class FlexTemplate:
+    """差し込み位置（Slot）を含むFlex Messageの部品のテンプレート"""
+
+    def __init__(self, skeleton: Any):
+        """
+        Args:
+            skeleton: 部品のJSON（差し込む位置にSlotを置く）
+        """
+        self.skeleton = skeleton
+        self.slot_names = _slot_names(skeleton)
+        # 固定部分のサイズ = 差し込み位置を目印の文字列にしたJSONのサイズ - 目印のサイズ
+        self.static_size = json_size(_replace_slots(skeleton)) - sum(
+            json_size(f'\0{name}\0') for name in self.slot_names
+        )
+
+    def render(self, **values: Any) -> Rendered:
+        """
+        値を差し込んだ部品とそのサイズを返す
+
+        Args:
+            values: 差し込む値（Rendered・そのリスト・JSONにできる値）
+
+        Returns:
+            Rendered
+        """
+        size = self.static_size + sum(json_size(values[name]) for name in self.slot_names)
+        return Rendered(_fill(self.skeleton, values), size)
+
+
+def _text_component(text: Any, **style: Any) -> Dict[str, Any]:
+    return {'type': 'text', 'text': text, **style}
+
+
+class FlexDigestRenderer:
+    """ニュースのダイジェストを1記事1バブルのカルーセルに変換するクラス（テンプレートは生成時に1回だけ組み立てる）"""
+
+    def __init__(self):
+        header = {'type': 'box', 'layout': 'vertical', 'contents': [
+            _text_component(Slot('label'), size='xs', color='#888888'),
+            _text_component(Slot('title'), weight='bold', size='md', wrap=True),
+        ]}
+        body = {'type': 'box', 'layout': 'vertical', 'spacing': 'sm', 'contents': Slot('body')}
+        footer = {'type': 'box', 'layout': 'vertical', 'contents': [{
+            'type': 'button', 'style': 'link', 'height': 'sm',
+            'action': {'type': 'uri', 'label': '記事を読む', 'uri': Slot('url')},
+        }]}
+        self._bubble = FlexTemplate({'type': 'bubble', 'size': 'mega', 'header': header, 'body': body})
+        self._linked_bubble = FlexTemplate(
+            {'type': 'bubble', 'size': 'mega', 'header': header, 'body': body, 'footer': footer})
+        self._text = FlexTemplate(_text_component(Slot('text'), size='sm', wrap=True))
+        self._carousel = FlexTemplate({'type': 'carousel', 'contents': Slot('bubbles')})
+        self._message = FlexTemplate({'type': 'flex', 'altText': Slot('alt'), 'contents': Slot('carousel')})
+
+        # どの記事でも同じ部品は変換済みのものを使い回す
+        self._summary_label = FlexTemplate(
+            _text_component('📝 Summary', weight='bold', size='sm', color='#1DB446')).render()
+        self._phrases_label = FlexTemplate(
+            _text_component('💬 Advanced Phrases & Expressions', weight='bold', size='sm', color='#1DB446')).render()
+        self._separator = FlexTemplate({'type': 'separator', 'margin': 'lg'}).render()
+        self._empty_carousel_size = self._carousel.render(bubbles=[]).size
+
+    def render_bubble(self, index: int, news_data: dict) -> Rendered:
+        """
+        1件のニュースのバブルを生成
+
+        Args:
+            index: ニュース番号（1始まり）
+            news_data: ニュースデータ（title, summary, phrases, urlを含む）
+
+        Returns:
+            バブルとそのサイズ
+        """
+        body = [self._summary_label, self._text.render(text=news_data['summary'] or '-'),
+                self._separator, self._phrases_label]
+        body += [self._text.render(text=f"{i}. {phrase}") for i, phrase in enumerate(news_data['phrases'], 1)]
+
+        values = {'label': f'News {index}', 'title': news_data['title'], 'body': body}
+        url = news_data.get('url', '')
+        if url.startswith(('http://', 'https://')) and len(url) <= MAX_URI_LENGTH:
+            return self._linked_bubble.render(url=url, **values)
+        return self._bubble.render(**values)
+
+    def render(self, items: Iterable[Tuple[int, dict, Any]],
+               fallback: Callable[[int, dict], List[dict]]) -> List[Tuple[List[Any], List[dict]]]:
+        """
+        ニュースをバブル数・サイズの上限に収まるカルーセルにまとめる
+
+        1つのバブルに収まらないニュースは、その位置でfallbackが返すメッセージ（テキストなど）にする
+
+        Args:
+            items: (ニュース番号, ニュースデータ, 配信完了時にon_sentへ渡す値) のリスト
+            fallback: バブルに収まらないニュースのメッセージオブジェクトを生成する関数
+
+        Returns:
+            (含まれるニュースのon_sentへ渡す値のリスト, メッセージオブジェクトのリスト) のリスト（ニュースの順）
+        """
+        groups: List[Tuple[List[Any], List[dict]]] = []
+        keys: List[Any] = []
+        bubbles: List[Rendered] = []
+        titles: List[str] = []
+        size = self._empty_carousel_size
+
+        def flush():
+            nonlocal keys, bubbles, titles, size
+            if bubbles:
+                groups.append((keys, [self._flex_message(bubbles, titles)]))
+                logger.debug("カルーセルを生成しました: %s件、%sバイト", len(bubbles), size)
+            keys, bubbles, titles, size = [], [], [], self._empty_carousel_size
+
+        for index, news_data, key in items:
+            bubble = self.render_bubble(index, news_data)
+            if bubble.size > MAX_BUBBLE_BYTES or self._empty_carousel_size + bubble.size > MAX_CAROUSEL_BYTES:
+                logger.warning("ニュース %s のバブル（%sバイト）はFlex Messageの上限を超えるため、テキストで送信します",
+                               index, bubble.size)
+                get_metrics().increment('line_flex_fallbacks')
+                flush()
+                groups.append(([key], fallback(index, news_data)))
+                continue
+
+            # 区切りの ", " を含めて上限を超える場合は新しいカルーセルにする
+            if len(bubbles) >= MAX_CAROUSEL_BUBBLES or size + 2 + bubble.size > MAX_CAROUSEL_BYTES:
+                flush()
+            size += bubble.size + (2 if bubbles else 0)
+            bubbles.append(bubble)
+            keys.append(key)
+            titles.append(f"News {index}: {news_data['title']}")
+
+        flush()
+        return groups
+
+    def _flex_message(self, bubbles: List[Rendered], titles: List[str]) -> dict:
+        """カルーセルをFlex Messageのメッセージオブジェクトにする"""
+        alt_text = ' / '.join(titles)
+        if len(alt_text) > MAX_ALT_TEXT_LENGTH:
+            alt_text = alt_text[:MAX_ALT_TEXT_LENGTH - 1] + '…'
+        carousel = self._carousel.render(bubbles=bubbles)
+        return self._message.render(alt=alt_text, carousel=carousel).value
@@ -0,0 +1,379 @@
+"""
+一覧ページ・記事ページのHTMLを解析するモジュール
+解析バックエンド（html.parser / lxml / selectolax）を実行時に切り替えられる
+"""
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+from config import HTML_PARSER_BACKEND
+
+logger = logging.getLogger(__name__)
+
+# 一覧ページで候補記事を選択するセレクタ（先頭から順に試す）
+LISTING_SELECTORS = [
+    'article, .news-item, .daily-news-item, a[href*="/daily-news/"]',
+    'a[href*="/daily-news/"]'
+]
+
+# 記事ページの本文を選択するセレクタ（先頭から順に試す）
+CONTENT_SELECTORS = [
+    '.article-content',
+    '.news-content',
+    '.content',
+    'article p',
+    '.text-content',
+    'main p'
+]
+
+# 本文セレクタがすべて失敗した場合に、十分な長さのpタグをすべて集めるセレクタ
+FALLBACK_SELECTOR = 'p'
+
+# 候補記事のタイトルとして使用する見出し
+TITLE_TAGS = ['h1', 'h2', 'h3', 'h4']
+
+CONTENT_MIN_LENGTH = 100  # セレクタで取得した本文がこれより短い場合は次のセレクタを試す
+PARAGRAPH_MIN_LENGTH = 20  # フォールバック時に採用する段落の最小文字数
+CONTENT_MAX_LENGTH = 5000  # 本文の最大文字数
+
+# 途中までのHTMLの末尾に付け加え、読み込んだ位置でまだ閉じていない要素を調べるための目印
+STREAM_END_CLASS = 'dmm-scraper-stream-end'
+_STREAM_END_MARKER = f'<span class="{STREAM_END_CLASS}"></span>'.encode('ascii')
+_STREAM_END_SELECTOR = f'.{STREAM_END_CLASS}'
+
+# 中身がテキストとして扱われるため、途中で切れている場合は目印を付け加えられない要素
+_RAW_TEXT_TAGS = [b'script', b'style']
+
+# セレクタは一度だけコンパイルして使い回す
+_COMPILED_SELECTORS = {
+    selector: soupsieve.compile(selector)
+    for selector in LISTING_SELECTORS + CONTENT_SELECTORS + [FALLBACK_SELECTOR, _STREAM_END_SELECTOR]
+}
+
+
+class _SubtreeStrainer(SoupStrainer):
+    """
+    タグ名またはclass属性が一致する要素の部分木だけを木に残すSoupStrainer
+
+    SoupStrainerの標準の条件はタグ名とclassのAND条件になるため、OR条件で判定するよう置き換える
+    （一致した要素の子孫はすべて残るので、残した部分木に対するセレクタの結果は全体を解析した場合と変わらない）
+    """
+
+    def __init__(self, names: Iterable[str], classes: Iterable[str]):
+        super().__init__()
+        self.names = frozenset(names)
+        self.classes = frozenset(classes)
+
+    def _keep(self, name: str, attrs: Optional[Dict]) -> bool:
+        if name in self.names:
+            return True
+        value = attrs.get('class') if attrs else None
+        if not value:
+            return False
+        if isinstance(value, str):
+            value = value.split()
+        return not self.classes.isdisjoint(value)
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:  # beautifulsoup4 >= 4.13
+        return self._keep(name, attrs)
+
+    def allow_string_creation(self, string) -> bool:  # beautifulsoup4 >= 4.13
+        return False
+
+    def search_tag(self, markup_name=None, markup_attrs={}):  # beautifulsoup4 < 4.13
+        return markup_name if self._keep(markup_name, markup_attrs) else None
+
+
+# 一覧ページ: 候補記事の要素（article・a・記事一覧のclass）以外は木を作らない
+_LISTING_STRAINER = _SubtreeStrainer(['article', 'a'], ['news-item', 'daily-news-item'])
+# 記事ページ: 本文セレクタとフォールバックのpタグに関係する要素以外は木を作らない
+_CONTENT_STRAINER = _SubtreeStrainer(
+    ['article', 'main', 'p'],
+    ['article-content', 'news-content', 'content', 'text-content', STREAM_END_CLASS]
+)
+
+
+def _trim_open_raw_text(html: bytes) -> bytes:
+    """途中までのHTMLが閉じていないscript・style要素の中で終わっている場合、その要素の開始位置で切る"""
+    lower = html.lower()
+    for tag in _RAW_TEXT_TAGS:
+        start = lower.rfind(b'<' + tag)
+        if start != -1 and lower.find(b'</' + tag, start) == -1:
+            html, lower = html[:start], lower[:start]
+    return html
+
+
+class _ParserBackend(ABC):
+    """
+    セレクタを試す順序と抽出ルールを共通化した解析バックエンドの基底クラス
+
+    サブクラスはHTMLの解析・セレクタによる要素の選択・テキストの取得を実装する（実装していない場合は生成時にTypeError）
+    """
+
+    name = ''
+
+    @abstractmethod
+    def _parse_listing(self, html: bytes):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _parse_content(self, html: bytes):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _select(self, tree, selector: str) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _listing_item(self, element) -> Tuple[str, str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _text(self, element) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _ancestor_ids(self, element) -> Set[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _element_id(self, element) -> int:
+        raise NotImplementedError
+
+    def listing_items(self, html: bytes, limit: int, preferred: Optional[str] = None) -> List[Tuple[str, str]]:
+        """
+        一覧ページから候補記事の要素を選択し、タイトルとリンクを取り出す
+
+        Args:
+            html: 一覧ページのHTML
+            limit: 取り出す要素数の上限
+            preferred: 最初に試すセレクタ（前回成功したセレクタ）
+
+        Returns:
+            (タイトル, リンク) のリスト（リンクは相対URLのまま）
+        """
+        return self.listing_items_with_selector(html, limit, preferred)[0]
+
+    def listing_items_with_selector(self, html: bytes, limit: int,
+                                    preferred: Optional[str] = None) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+        """
+        listing_itemsと同じ処理を行い、要素を選択できたセレクタも返す
+
+        Returns:
+            ((タイトル, リンク) のリスト, 使用したセレクタ（見つからない場合はNone）)
+        """
+        tree = self._parse_listing(html)
+
+        selectors = LISTING_SELECTORS
+        if preferred in selectors:
+            selectors = [preferred] + [selector for selector in selectors if selector != preferred]
+
+        for selector in selectors:
+            news_items = self._select(tree, selector)
+            if news_items:
+                return [self._listing_item(item) for item in news_items[:limit]], selector
+        return [], None
+
+    def extract_content(self, html: bytes, preferred: Optional[str] = None) -> str:
+        """
+        記事ページから本文を抽出
+
+        Args:
+            html: 記事ページのHTML
+            preferred: 最初に試すセレクタ（前回成功したセレクタ）
+
+        Returns:
+            ニュース本文
+        """
+        return self.extract_content_with_selector(html, preferred)[0]
+
+    def extract_content_with_selector(self, html: bytes, preferred: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """
+        extract_contentと同じ処理を行い、本文を取得できたセレクタも返す
+
+        preferredで十分な本文が得られた場合は他のセレクタを試さない
+
+        Returns:
+            (ニュース本文, 使用したセレクタ（本文が空の場合はNone）)
+        """
+        tree = self._parse_content(html)
+
+        if preferred:
+            content = self._content_for(tree, preferred)
+            minimum = 0 if preferred == FALLBACK_SELECTOR else CONTENT_MIN_LENGTH
+            if len(content) > minimum:
+                return content[:CONTENT_MAX_LENGTH], preferred
+
+        content, matched = "", None
+        for selector in CONTENT_SELECTORS:
+            elements = self._select(tree, selector)
+            if elements:
+                content, matched = ' '.join([self._text(elem) for elem in elements]), selector
+                if len(content) > CONTENT_MIN_LENGTH:  # 十分な長さがある場合
+                    break
+
+        if not content or len(content) < CONTENT_MIN_LENGTH:
+            # フォールバック: すべてのpタグから取得
+            content, matched = self._content_for(tree, FALLBACK_SELECTOR), FALLBACK_SELECTOR
+
+        # 長すぎる場合は切り詰め
+        return content[:CONTENT_MAX_LENGTH], matched if content else None
+
+    def settled_content_length(self, html: bytes, preferred: Optional[str] = None) -> int:
+        """
+        途中までのHTMLから、続きを読み込んでも変わらないことが確定している本文の長さを求める
+
+        本文は最優先のセレクタ（preferred、なければCONTENT_SELECTORSの先頭）で十分な長さが得られれば確定するため、
+        そのセレクタに一致する要素のうち、閉じている（以降の内容で変化しない）先頭からの要素のテキストだけを数える
+
+        Args:
+            html: 記事ページの先頭部分のHTML（タグの途中で切れていないこと）
+            preferred: 最初に試すセレクタ
+
+        Returns:
+            確定している本文の長さ（extract_contentの結果の先頭この文字数は全体を読み込んでも変わらない）
+        """
+        selector = preferred or CONTENT_SELECTORS[0]
+        tree = self._parse_content(_trim_open_raw_text(html) + _STREAM_END_MARKER)
+
+        # 目印の祖先が、読み込んだ位置でまだ閉じていない要素（目印が見つからない場合は確定していないものとする）
+        markers = self._select(tree, _STREAM_END_SELECTOR)
+        if not markers:
+            return 0
+        open_ids = self._ancestor_ids(markers[-1])
+
+        texts = []
+        for elem in self._select(tree, selector):
+            if self._element_id(elem) in open_ids:
+                break
+            text = self._text(elem)
+            if selector == FALLBACK_SELECTOR and len(text) <= PARAGRAPH_MIN_LENGTH:
+                continue
+            texts.append(text)
+        return len(' '.join(texts))
+
+    def _content_for(self, tree, selector: str) -> str:
+        """1つのセレクタで本文を取得"""
+        texts = [self._text(elem) for elem in self._select(tree, selector)]
+        if selector == FALLBACK_SELECTOR:
+            texts = [text for text in texts if len(text) > PARAGRAPH_MIN_LENGTH]
+        return ' '.join(texts)
+
+
+class BeautifulSoupBackend(_ParserBackend):
+    """BeautifulSoupで解析するバックエンド（html.parser・lxml）"""
+
+    def __init__(self, features: str = 'lxml', strain: bool = True):
+        """
+        Args:
+            features: BeautifulSoupのパーサー名（'html.parser' または 'lxml'）
+            strain: Trueの場合、抽出に必要な部分木だけを解析する
+        """
+        self.name = features if strain else f'{features} (full tree)'
+        self.features = features
+        self.strain = strain
+
+    def _parse(self, html: bytes, strainer: _SubtreeStrainer) -> BeautifulSoup:
+        return BeautifulSoup(html, self.features, parse_only=strainer if self.strain else None)
+
+    def _parse_listing(self, html: bytes) -> BeautifulSoup:
+        return self._parse(html, _LISTING_STRAINER)
+
+    def _parse_content(self, html: bytes) -> BeautifulSoup:
+        return self._parse(html, _CONTENT_STRAINER)
+
+    def _select(self, tree: BeautifulSoup, selector: str) -> list:
+        compiled = _COMPILED_SELECTORS.get(selector)
+        return compiled.select(tree) if compiled is not None else tree.select(selector)
+
+    def _listing_item(self, element) -> Tuple[str, str]:
+        if element.name == 'a':
+            href = element.get('href', '')
+        else:
+            link = element.find('a')
+            href = link.get('href', '') if link else ''
+
+        title_elem = element.find(TITLE_TAGS) or element
+        return title_elem.get_text(strip=True), href
+
+    def _text(self, element) -> str:
+        return element.get_text(strip=True)
+
+    def _ancestor_ids(self, element) -> Set[int]:
+        return {id(parent) for parent in element.parents}
+
+    def _element_id(self, element) -> int:
+        return id(element)
+
+
+class SelectolaxBackend(_ParserBackend):
+    """selectolax（lexbor）で解析するバックエンド（selectolaxが必要）"""
+
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+
+    def _parse_content(self, html: bytes):
+        tree = self._parser(html)
+        # BeautifulSoupのget_textと同様に、スクリプト等の中身は本文に含めない
+        tree.strip_tags(['script', 'style', 'template'])
+        return tree
+
+    _parse_listing = _parse_content
+
+    def _select(self, tree, selector: str) -> list:
+        return tree.css(selector)
+
+    def _listing_item(self, element) -> Tuple[str, str]:
+        if element.tag == 'a':
+            href = element.attributes.get('href') or ''
+        else:
+            link = element.css_first('a')
+            href = (link.attributes.get('href') or '') if link is not None else ''
+
+        title_elem = element.css_first(', '.join(TITLE_TAGS))
+        if title_elem is None:
+            title_elem = element
+        return self._text(title_elem), href
+
+    def _text(self, element) -> str:
+        return element.text(deep=True, separator='', strip=True)
+
+    def _ancestor_ids(self, element) -> Set[int]:
+        ancestor_ids = set()
+        node = element.parent
+        while node is not None:
+            ancestor_ids.add(node.mem_id)
+            node = node.parent
+        return ancestor_ids
+
+    def _element_id(self, element) -> int:
+        return element.mem_id
+
+
+def create_backend(name: str = HTML_PARSER_BACKEND):
+    """
+    解析バックエンドを生成（利用できない場合はhtml.parserを使用）
+
+    Args:
+        name: 'lxml'・'html.parser'・'selectolax' のいずれか
+
+    Returns:
+        解析バックエンド
+    """
+    try:
+        if name == 'selectolax':
+            return SelectolaxBackend()
+        if name == 'lxml':
+            import lxml  # noqa: F401
+            return BeautifulSoupBackend('lxml')
+        if name != 'html.parser':
+            logger.warning("不明なHTML解析バックエンドです: %s", name)
+    except ImportError as e:
+        logger.warning("HTML解析バックエンド %s を利用できません（html.parserを使用します）: %s", name, e)
+    return BeautifulSoupBackend('html.parser')
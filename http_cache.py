@@ -0,0 +1,265 @@
+"""
+条件付きGET（ETag / Last-Modified）によるディスクHTTPキャッシュモジュール
+Daily Newsの一覧ページ・記事ページを再取得する際の転送量と解析時間を削減する
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.json'
+
+# stream=Trueで取得したレスポンスの本文を読み込み、(本文, 最後まで読み込んだか) を返す関数
+BodyReader = Callable[[Any], Tuple[bytes, bool]]
+
+
+class CachedResponse(NamedTuple):
+    """キャッシュを通した取得結果"""
+    content: bytes
+    from_cache: bool
+    truncated: bool = False  # readerが途中で読み込みを止めた本文（先頭部分）か
+
+
+class HttpCache:
+    """ETag / Last-Modifiedで再検証し、本文を圧縮して保存するLRUキャッシュ"""
+
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        """
+        Args:
+            cache_dir: キャッシュの保存先ディレクトリ
+            max_bytes: 保存する圧縮済み本文の合計サイズ上限（バイト）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        # 最終アクセス時刻・導出値だけを更新し、まだ書き込んでいないインデックスの変更があるか
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, INDEX_FILE)
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.z")
+
+    def _load_index(self):
+        """インデックスを読み込む（壊れている場合は空から始める）"""
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        except FileNotFoundError:
+            self._index = {}
+        except Exception as e:
+            logger.warning("HTTPキャッシュのインデックスを読み込めませんでした: %s", e)
+            self._index = {}
+
+    def _save_index(self):
+        """インデックスをアトミックに書き込む（ロック取得済みで呼び出す）"""
+        tmp_path = f"{self._index_path()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp_path, self._index_path())
+        self._dirty = False
+
+    def flush(self):
+        """メモリ上で更新したインデックス（最終アクセス時刻・導出値）をファイルに書き込む"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self._save_index()
+            except OSError as e:
+                logger.warning("HTTPキャッシュのインデックスを保存できませんでした: %s", e)
+
+    def close(self):
+        """未保存のインデックスを書き込む"""
+        self.flush()
+
+    def get(self, http, url: str, reader: Optional[BodyReader] = None, **kwargs) -> CachedResponse:
+        """
+        キャッシュを通してGETリクエストを送信
+
+        保存済みのエントリがあれば条件付きリクエストで再検証し、304の場合は保存済みの本文を返す
+
+        Args:
+            http: 使用するHTTPクライアント
+            url: リクエスト先URL
+            reader: 本文を読み込む関数（指定した場合はstream=Trueで取得する。途中で読み込みを止めた場合は、
+                読み込んだ先頭部分を途中までの本文として保存し、304の場合はそれを返す）
+            **kwargs: HTTPクライアントに渡す引数
+
+        Returns:
+            CachedResponse（本文とキャッシュ利用の有無）
+        """
+        headers = dict(kwargs.pop('headers', None) or {})
+
+        with self._lock:
+            entry = self._index.get(url)
+            entry = dict(entry) if entry else None
+
+        if entry and entry.get('truncated') and reader is None:
+            # 本文全体が必要な場合、途中までの本文しか保存していないエントリは使わない
+            entry = None
+
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        if reader is not None:
+            kwargs['stream'] = True
+        response = http.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry:
+            response.close()
+            body = self._read_body(entry['key'])
+            if body is not None:
+                with self._lock:
+                    self.hits += 1
+                    # 最終アクセス時刻はメモリ上だけで更新し、flush()・次の保存時にまとめて書き込む
+                    if url in self._index:
+                        self._index[url]['last_access'] = time.time()
+                        self._dirty = True
+                get_metrics().increment('cache_lookups', cache='http', result='hit')
+                recorder = getattr(http, 'recorder', None)
+                if recorder is not None:
+                    recorder.attach_cached_body(url, body)
+                return CachedResponse(body, True, bool(entry.get('truncated')))
+
+            # 本文が失われている場合は条件なしで取り直す
+            self.invalidate(url)
+            return self.get(http, url, reader, headers={
+                k: v for k, v in headers.items() if k not in ('If-None-Match', 'If-Modified-Since')
+            }, **kwargs)
+
+        try:
+            response.raise_for_status()
+            body, complete = reader(response) if reader is not None else (response.content, True)
+        finally:
+            response.close()
+
+        with self._lock:
+            self.misses += 1
+        get_metrics().increment('cache_lookups', cache='http', result='miss')
+        # 途中で読み込みを止めた本文も、残りの部分は抽出結果に影響しないため先頭部分として保存する
+        self._store(url, response, body, truncated=not complete)
+        return CachedResponse(body, False, not complete)
+
+    def _read_body(self, key: str) -> Optional[bytes]:
+        """保存済みの本文を展開して返す"""
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                return zlib.decompress(f.read())
+        except Exception as e:
+            logger.warning("HTTPキャッシュの本文を読み込めませんでした: %s, %s", key, e)
+            return None
+
+    def _store(self, url: str, response, body: bytes, truncated: bool = False):
+        """検証用ヘッダーを持つレスポンスの本文（truncatedの場合は先頭部分）を圧縮して保存"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            # 再検証できないレスポンスは保存しない
+            return
+
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        compressed = zlib.compress(body)
+        try:
+            with open(self._body_path(key), 'wb') as f:
+                f.write(compressed)
+        except OSError as e:
+            logger.warning("HTTPキャッシュへの保存に失敗しました: %s, %s", url, e)
+            return
+
+        with self._lock:
+            self._index[url] = {
+                'key': key,
+                'etag': etag,
+                'last_modified': last_modified,
+                'size': len(compressed),
+                'last_access': time.time(),
+                'truncated': truncated,
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        """合計サイズが上限を超えている間、最も古くアクセスされたエントリを削除（ロック取得済みで呼び出す）"""
+        total = sum(entry['size'] for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+
+        for url, entry in sorted(self._index.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            self._remove_entry(url)
+            total -= entry['size']
+            self.evictions += 1
+
+    def _remove_entry(self, url: str):
+        """エントリと本文ファイルを削除（ロック取得済みで呼び出す）"""
+        entry = self._index.pop(url, None)
+        if entry:
+            try:
+                os.remove(self._body_path(entry['key']))
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, url: str):
+        """指定URLのエントリを削除"""
+        with self._lock:
+            self._remove_entry(url)
+            self._save_index()
+
+    def annotation(self, url: str, name: str) -> Any:
+        """
+        本文から導出した値（抽出済みの本文など）を取得
+
+        本文が更新されると導出値は破棄されるため、再検証でヒットした場合のみ再利用できる
+        """
+        with self._lock:
+            entry = self._index.get(url)
+            return entry.get('annotations', {}).get(name) if entry else None
+
+    def annotate(self, url: str, name: str, value: Any):
+        """本文から導出した値をエントリに保存"""
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None:
+                return
+            entry.setdefault('annotations', {})[name] = value
+            self._dirty = True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        キャッシュの統計情報を取得
+
+        Returns:
+            ヒット数・ミス数・ヒット率・エントリ数・合計サイズなど
+        """
+        with self._lock:
+            requests_count = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests_count if requests_count else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._index),
+                'bytes': sum(entry['size'] for entry in self._index.values()),
+            }
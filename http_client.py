@@ -0,0 +1,186 @@
+"""
+共有HTTPクライアントモジュール
+スクレイパー・ニュース処理・LINE送信で接続プール（keep-alive）を共有する
+"""
+import logging
+import threading
+import time
+from typing import Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from config import (
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_ENABLE_HTTP2,
+)
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+Timeout = Union[float, Tuple[float, float], None]
+
+
+class HttpClient:
+    """ホストごとに接続をプールして再利用するHTTPクライアント"""
+
+    def __init__(self, pool_connections: int = HTTP_POOL_CONNECTIONS, pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT, read_timeout: float = HTTP_READ_TIMEOUT,
+                 http2: bool = HTTP_ENABLE_HTTP2):
+        """
+        Args:
+            pool_connections: プールを保持するホスト数
+            pool_maxsize: ホストごとに保持する接続数
+            connect_timeout: 接続タイムアウト（秒）
+            read_timeout: 読み込みタイムアウト（秒）
+            http2: HTTP/2を使用するか（httpx[http2]がインストールされている場合のみ有効）
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # HTTPのやり取りの記録・再生（http_recorderで設定する）
+        self.recorder = None
+        self.replayer = None
+
+        self._http2_client = None
+        if http2:
+            self._http2_client = self._create_http2_client(pool_maxsize)
+
+    def _create_http2_client(self, pool_maxsize: int):
+        """HTTP/2クライアントを生成（httpxが使えない場合はNone）"""
+        try:
+            import httpx
+            return httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=pool_maxsize),
+            )
+        except ImportError:
+            logger.warning("httpx[http2]がインストールされていないため、HTTP/1.1を使用します")
+            return None
+
+    def _resolve_timeout(self, timeout: Timeout) -> Tuple[float, float]:
+        """
+        タイムアウトを(接続, 読み込み)の組に変換
+
+        数値が指定された場合は読み込みタイムアウトとして扱う
+        """
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, tuple):
+            return timeout
+        return (self.connect_timeout, timeout)
+
+    def request(self, method: str, url: str, timeout: Timeout = None, **kwargs) -> requests.Response:
+        """
+        HTTPリクエストを送信
+
+        Args:
+            method: HTTPメソッド
+            url: リクエスト先URL
+            timeout: タイムアウト（数値の場合は読み込みタイムアウト）
+            **kwargs: requests.Session.requestに渡す引数
+
+        Returns:
+            requests.Response
+        """
+        resolved_timeout = self._resolve_timeout(timeout)
+        metrics = get_metrics()
+        host = urlparse(url).netloc
+
+        with metrics.span('http.request', host=host, method=method):
+            started = time.perf_counter()
+            try:
+                if self.replayer is not None:
+                    response = self.replayer.replay(method, url, **kwargs)
+                # ストリーミング読み込みはrequestsのセッションで行う
+                elif self._http2_client is not None and not kwargs.get('stream'):
+                    response = self._request_http2(method, url, resolved_timeout, **kwargs)
+                else:
+                    response = self.session.request(method, url, timeout=resolved_timeout, **kwargs)
+                if self.recorder is not None:
+                    self.recorder.record_response(method, url, kwargs, response, started)
+            except requests.exceptions.RequestException as e:
+                if self.recorder is not None:
+                    self.recorder.record_error(method, url, kwargs, e, started)
+                metrics.increment('http_errors', host=host, error=type(e).__name__)
+                raise
+
+        metrics.increment('http_requests', host=host, method=method, status=response.status_code)
+        if not kwargs.get('stream'):
+            # ストリーミング読み込みの場合は読み込んだ側で数える
+            metrics.increment('http_response_bytes', len(response.content), host=host)
+        return response
+
+    def _request_http2(self, method: str, url: str, timeout: Tuple[float, float], **kwargs) -> requests.Response:
+        """HTTP/2でリクエストを送信し、requests.Responseに変換して返す"""
+        import httpx
+
+        kwargs.pop('stream', None)
+        try:
+            response = self._http2_client.request(
+                method,
+                url,
+                timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+                **kwargs
+            )
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e))
+
+        # 呼び出し側がrequestsの例外・APIをそのまま使えるように変換する
+        converted = requests.Response()
+        converted.status_code = response.status_code
+        converted.headers = CaseInsensitiveDict(response.headers)
+        converted.url = str(response.url)
+        converted.reason = response.reason_phrase
+        converted.encoding = response.encoding
+        converted._content = response.content
+        converted._content_consumed = True
+        converted.elapsed = response.elapsed
+        return converted
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GETリクエストを送信"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POSTリクエストを送信"""
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        """プールしている接続を閉じる"""
+        self.session.close()
+        if self._http2_client is not None:
+            self._http2_client.close()
+
+
+_shared_client: Optional[HttpClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """
+    プロセス全体で共有するHTTPクライアントを取得
+
+    Returns:
+        共有HttpClient
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = HttpClient()
+    return _shared_client
@@ -0,0 +1,402 @@
+"""
+HTTPのやり取りを記録・再生するモジュール
+
+共有HTTPクライアントを通したリクエスト（DMM英会話・Vercel API・LINE）を、レスポンスの本文・ヘッダー・
+所要時間とともにgzip圧縮したJSONLに記録する。記録を再生すると、外部に接続せずに同じ実行を再現できる
+（遅かった日の実行のプロファイリングや、最適化の効果の確認に使う）
+
+    1行目      {"format": "dmm-daily-news-capture", "version": 1, ...}
+    2行目以降  リクエスト1件ごとのレコード（開始時刻のオフセット順）
+               {"cached_result": ...}  結果キャッシュから返したVercel APIの結果（再生前にキャッシュへ入れる）
+"""
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from config import HTTP_CAPTURE_DIR, HTTP_CAPTURE_KEEP
+from http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_FORMAT = 'dmm-daily-news-capture'
+CAPTURE_VERSION = 1
+
+# 記録しないリクエストヘッダー（アクセストークンを記録に残さない）
+REDACTED_HEADERS = ('authorization', 'cookie')
+
+# 再生の速度
+TIMING_RECORDED = 'recorded'  # 記録した所要時間だけ待ってから応答する
+TIMING_FAST = 'fast'          # 待たずに応答する
+
+CONDITIONAL_HEADERS = ('if-none-match', 'if-modified-since')
+
+
+def _encode_body(body: Optional[bytes]) -> Tuple[Optional[str], str]:
+    """本文をJSONに保存できる形式に変換（UTF-8として読めない場合はBase64）"""
+    if body is None:
+        return None, 'utf-8'
+    try:
+        return body.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        return base64.b64encode(body).decode('ascii'), 'base64'
+
+
+def _decode_body(text: Optional[str], encoding: str) -> bytes:
+    if text is None:
+        return b''
+    if encoding == 'base64':
+        return base64.b64decode(text)
+    return text.encode('utf-8')
+
+
+def _request_body(kwargs: Dict[str, Any]) -> Optional[bytes]:
+    """リクエストの本文（json・dataの引数）をバイト列にする"""
+    if kwargs.get('json') is not None:
+        return json.dumps(kwargs['json'], ensure_ascii=False, sort_keys=True).encode('utf-8')
+    data = kwargs.get('data')
+    if data is None:
+        return None
+    if isinstance(data, bytes):
+        return data
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+
+
+def _body_digest(body: Optional[bytes]) -> str:
+    return hashlib.sha256(body or b'').hexdigest()[:16]
+
+
+class HttpRecorder:
+    """共有HTTPクライアントのリクエストとレスポンスを記録するクラス"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 記録の保存先（.jsonl.gz）
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = []
+        self._cached_results: List[Dict[str, Any]] = []
+        self._started = time.perf_counter()
+        self._created_at = datetime.now().astimezone().isoformat()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+    def _base_record(self, method: str, url: str, kwargs: Dict[str, Any], started: float) -> Dict[str, Any]:
+        headers = {
+            key: ('***' if key.lower() in REDACTED_HEADERS else value)
+            for key, value in (kwargs.get('headers') or {}).items()
+        }
+        body = _request_body(kwargs)
+        text, encoding = _encode_body(body)
+        return {
+            'offset': round(started - self._started, 6),
+            'thread': threading.current_thread().name,
+            'request': {
+                'method': method,
+                'url': url,
+                'headers': headers,
+                'body': text,
+                'body_encoding': encoding,
+                'body_digest': _body_digest(body),
+                'stream': bool(kwargs.get('stream')),
+            },
+        }
+
+    def record_response(self, method: str, url: str, kwargs: Dict[str, Any],
+                        response: requests.Response, started: float):
+        """
+        レスポンスを記録
+
+        stream=Trueのレスポンスも本文を最後まで読み込んでから記録する（呼び出し側はそのまま
+        iter_contentで読み込める）ため、所要時間には本文の読み込みを含む
+
+        Args:
+            method: HTTPメソッド
+            url: リクエスト先URL
+            kwargs: HTTPクライアントに渡した引数
+            response: 受け取ったレスポンス
+            started: リクエストを開始した時刻（time.perf_counter()）
+        """
+        content = response.content
+        elapsed = time.perf_counter() - started
+        record = self._base_record(method, url, kwargs, started)
+        text, encoding = _encode_body(content)
+        record.update({
+            'elapsed': round(elapsed, 6),
+            'response': {
+                'status': response.status_code,
+                'reason': response.reason,
+                'url': response.url,
+                'headers': dict(response.headers),
+                'encoding': response.encoding,
+                'body': text,
+                'body_encoding': encoding,
+            },
+        })
+        with self._lock:
+            self._records.append(record)
+
+    def record_error(self, method: str, url: str, kwargs: Dict[str, Any],
+                     error: requests.exceptions.RequestException, started: float):
+        """接続エラー・タイムアウトを記録"""
+        record = self._base_record(method, url, kwargs, started)
+        record.update({
+            'elapsed': round(time.perf_counter() - started, 6),
+            'error': {'type': type(error).__name__, 'message': str(error)},
+        })
+        with self._lock:
+            self._records.append(record)
+
+    def attach_cached_body(self, url: str, body: bytes):
+        """
+        304で再検証したURLの、キャッシュから返した本文を記録に添える
+
+        再生時のHTTPキャッシュが空でも、記録した実行と同じ本文を返せるようにする
+        """
+        text, encoding = _encode_body(body)
+        with self._lock:
+            for record in reversed(self._records):
+                response = record.get('response')
+                if record['request']['url'] == url and response and response['status'] == 304:
+                    response['cached_body'] = text
+                    response['cached_body_encoding'] = encoding
+                    break
+
+    def attach_cached_result(self, endpoint: str, payload: Dict[str, Any], value: Dict[str, Any]):
+        """
+        結果キャッシュから返したVercel APIの結果を記録に添える
+
+        記録時にキャッシュで省略されたリクエストも、再生時に同じ結果を返せるようにする
+        """
+        with self._lock:
+            self._cached_results.append({'endpoint': endpoint, 'payload': payload, 'value': value})
+
+    def save(self) -> str:
+        """
+        記録をgzip圧縮したJSONLとして書き出す
+
+        Returns:
+            保存先のパス
+        """
+        with self._lock:
+            records = sorted(self._records, key=lambda record: record['offset'])
+            cached_results = list(self._cached_results)
+        header = {
+            'format': CAPTURE_FORMAT,
+            'version': CAPTURE_VERSION,
+            'created_at': self._created_at,
+            'records': len(records),
+            'cached_results': len(cached_results),
+        }
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for item in [header] + records + [{'cached_result': cached} for cached in cached_results]:
+                f.write(json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+        os.replace(tmp_path, self.path)
+        logger.info("HTTPのやり取りを記録しました: %s（%s件）", self.path, len(records))
+        return self.path
+
+
+class HttpReplayer:
+    """記録したやり取りを再生してレスポンスを返すクラス"""
+
+    def __init__(self, path: str, timing: str = TIMING_RECORDED):
+        """
+        Args:
+            path: 記録ファイル（.jsonl.gz）
+            timing: TIMING_RECORDED（記録した所要時間で応答する）またはTIMING_FAST（待たずに応答する）
+        """
+        if timing not in (TIMING_RECORDED, TIMING_FAST):
+            raise ValueError(f"不明な再生速度です: {timing}")
+        self.path = path
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._records, self.cached_results = self._load(path)
+        self._used = [False] * len(self._records)
+        self.served = 0
+        self.reused = 0
+        self.unmatched = 0
+        self._last: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        # リクエストの本文まで一致するレコードを優先し、なければメソッドとURLが一致するレコードを記録順に使う
+        self._exact: Dict[Tuple[str, str, str], Deque[int]] = defaultdict(deque)
+        self._loose: Dict[Tuple[str, str], Deque[int]] = defaultdict(deque)
+        for i, record in enumerate(self._records):
+            request = record['request']
+            self._exact[(request['method'], request['url'], request['body_digest'])].append(i)
+            self._loose[(request['method'], request['url'])].append(i)
+
+    @staticmethod
+    def _load(path: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """記録ファイルを読み込み、(HTTPのレコード, 結果キャッシュから返した結果) を返す"""
+        records, cached_results = [], []
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('format') != CAPTURE_FORMAT or header.get('version') != CAPTURE_VERSION:
+                raise ValueError(f"記録ファイルの形式が違います: {path}")
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if 'cached_result' in item:
+                    cached_results.append(item['cached_result'])
+                else:
+                    records.append(item)
+        return records, cached_results
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def unused(self) -> int:
+        """再生されなかったレコードの数"""
+        with self._lock:
+            return self._used.count(False)
+
+    def _take(self, method: str, url: str, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        リクエストに対応するレコードを取り出す
+
+        再生時のタイミングでリクエストの分け方が変わった場合（ストリーミングで送信をまとめる単位など）、
+        記録が足りなくなったURLには直前に返したレコードをもう一度返す
+        """
+        with self._lock:
+            for candidates in (self._exact.get((method, url, digest)), self._loose.get((method, url))):
+                while candidates:
+                    i = candidates.popleft()
+                    if not self._used[i]:
+                        self._used[i] = True
+                        self.served += 1
+                        self._last[(method, url)] = self._records[i]
+                        return self._records[i]
+            record = self._last.get((method, url))
+            if record is not None:
+                self.reused += 1
+            else:
+                self.unmatched += 1
+            return record
+
+    def replay(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        記録したレスポンスを返す（記録した接続エラー・タイムアウトは同じ例外として送出する）
+
+        Args:
+            method: HTTPメソッド
+            url: リクエスト先URL
+            **kwargs: HTTPクライアントに渡された引数
+
+        Returns:
+            requests.Response
+        """
+        record = self._take(method, url, _body_digest(_request_body(kwargs)))
+        if record is None:
+            raise requests.exceptions.ConnectionError(f"記録にないリクエストです: {method} {url}")
+
+        if self.timing == TIMING_RECORDED:
+            time.sleep(record['elapsed'])
+
+        if 'error' in record:
+            error_class = getattr(requests.exceptions, record['error']['type'], None)
+            if not (isinstance(error_class, type) and issubclass(error_class, requests.exceptions.RequestException)):
+                error_class = requests.exceptions.RequestException
+            raise error_class(record['error']['message'])
+
+        recorded = record['response']
+        status = recorded['status']
+        body = _decode_body(recorded['body'], recorded['body_encoding'])
+        headers = {key.lower() for key in (kwargs.get('headers') or {})}
+        if status == 304 and 'cached_body' in recorded and not headers & set(CONDITIONAL_HEADERS):
+            # 再生側のキャッシュにない本文は、記録時にキャッシュから返した本文で応答する
+            status = 200
+            body = _decode_body(recorded['cached_body'], recorded['cached_body_encoding'])
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = 'OK' if status != recorded['status'] else recorded['reason']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        response.url = recorded['url'] or url
+        response.encoding = recorded['encoding']
+        response._content = body
+        response._content_consumed = True
+        response.elapsed = timedelta(seconds=record['elapsed'])
+        return response
+
+
+def capture_path(run_id: str, capture_dir: str = HTTP_CAPTURE_DIR) -> Optional[str]:
+    """実行ごとの記録の保存先（HTTP_CAPTURE_DIRが空の場合はNone）"""
+    if not capture_dir:
+        return None
+    return os.path.join(capture_dir, f'capture-{run_id}.jsonl.gz')
+
+
+def start_recording(path: str) -> HttpRecorder:
+    """共有HTTPクライアントのやり取りの記録を始める"""
+    recorder = HttpRecorder(path)
+    get_http_client().recorder = recorder
+    return recorder
+
+
+def stop_recording(keep: Optional[int] = HTTP_CAPTURE_KEEP) -> Optional[str]:
+    """
+    記録を止めて保存し、同じディレクトリの古い記録を削除
+
+    Args:
+        keep: 残しておく記録の数（Noneの場合は削除しない）
+
+    Returns:
+        保存先のパス（記録していない場合・保存できなかった場合はNone）
+    """
+    client = get_http_client()
+    recorder = client.recorder
+    client.recorder = None
+    if recorder is None:
+        return None
+    try:
+        path = recorder.save()
+    except OSError as e:
+        logger.warning("HTTPのやり取りを保存できませんでした: %s", e)
+        return None
+    if keep is not None:
+        _prune(os.path.dirname(path) or '.', keep)
+    return path
+
+
+def start_replay(path: str, timing: str = TIMING_RECORDED) -> HttpReplayer:
+    """共有HTTPクライアントのリクエストを記録の再生に切り替える"""
+    replayer = HttpReplayer(path, timing)
+    get_http_client().replayer = replayer
+    logger.info("記録を再生します: %s（%s件、%s）", path, len(replayer), timing)
+    return replayer
+
+
+def _prune(capture_dir: str, keep: int):
+    """古い記録を削除（新しい順にkeep個を残す）"""
+    captures = sorted(
+        name for name in os.listdir(capture_dir)
+        if name.startswith('capture-') and name.endswith('.jsonl.gz')
+    )
+    for name in captures[:-max(1, keep)]:
+        try:
+            os.remove(os.path.join(capture_dir, name))
+        except FileNotFoundError:
+            pass
@@ -3,26 +3,82 @@ LINE Bot APIを使用してメッセージを送信するモジュール
 """
 import requests
 import logging
-from typing import List
-from config import LINE_CHANNEL_ACCESS_TOKEN, LINE_USER_ID
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+from config import (
+    LINE_CHANNEL_ACCESS_TOKEN,
+    LINE_USER_ID,
+    LINE_API_BASE_URL,
+    LINE_RATE_LIMIT_PER_SEC,
+    LINE_MAX_RETRIES,
+    LINE_MESSAGE_FORMAT,
+)
+from flex_renderer import FlexDigestRenderer
+from http_client import HttpClient, get_http_client
+from metrics import get_metrics
+from rate_limiter import TokenBucket
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-LINE_API_URL = "https://api.line.me/v2/bot/message/push"
+LINE_API_URL = f"{LINE_API_BASE_URL.rstrip('/')}/v2/bot/message/push"
+LINE_MULTICAST_URL = f"{LINE_API_BASE_URL.rstrip('/')}/v2/bot/message/multicast"
+LINE_BOT_INFO_URL = f"{LINE_API_BASE_URL.rstrip('/')}/v2/bot/info"
+
+# 1回のpush・multicastで送信できるメッセージオブジェクト数の上限
+MAX_MESSAGES_PER_PUSH = 5
+
+# 1回のmulticastで指定できる送信先の上限
+MAX_MULTICAST_RECIPIENTS = 500
+
+# 再送するHTTPステータス（レート制限・サーバーエラー）
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# テキストメッセージの文字数の上限
+MAX_TEXT_LENGTH = 5000
+
+# 送信単位: (配信完了時にon_sentへ渡す値（不要ならNone、複数のニュースをまとめた場合はそのリスト）,
+#            メッセージオブジェクトのリスト)
+MessageGroup = Tuple[Any, List[dict]]
 
 
 class LineBotSender:
     """LINE Bot APIを使用してメッセージを送信するクラス"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[HttpClient] = None, rate_limiter: Optional[TokenBucket] = None):
+        """
+        Args:
+            http_client: 使用するHTTPクライアント（省略時は共有クライアント）
+            rate_limiter: push APIの呼び出しレートを制限するトークンバケット
+        """
+        self.http = http_client or get_http_client()
+        self.rate_limiter = rate_limiter or TokenBucket(LINE_RATE_LIMIT_PER_SEC, LINE_RATE_LIMIT_PER_SEC)
         self.access_token = LINE_CHANNEL_ACCESS_TOKEN
         self.user_id = LINE_USER_ID
+        # Flex Messageのテンプレートは送信するインスタンス（実行）ごとに1回だけ組み立てる
+        self.renderer = FlexDigestRenderer() if LINE_MESSAGE_FORMAT == 'flex' else None
         self.headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {self.access_token}'
         }
     
+    def warm_up(self) -> bool:
+        """
+        LINE APIへの接続を事前に確立しておく（送信時に接続・TLSハンドシェイクを待たないようにする）
+        
+        Returns:
+            APIに接続できた場合True
+        """
+        try:
+            response = self.http.get(LINE_BOT_INFO_URL, headers=self.headers, timeout=10)
+            response.close()
+            return True
+        except requests.exceptions.RequestException as e:
+            logger.warning("LINE APIへの事前接続に失敗しました: %s", e)
+            return False
+    
     def send_message(self, message: str) -> bool:
         """
         テキストメッセージを送信
@@ -33,48 +89,229 @@ class LineBotSender:
         Returns:
             送信成功時True
         """
+        return self.send_packed([(None, [self._text_message(message)])])
+    
+    def send_packed(self, groups: List[MessageGroup], on_sent: Optional[Callable[[Any], None]] = None) -> bool:
+        """
+        複数のメッセージをできるだけ少ないpush回数（1回あたり最大5件）にまとめて順番に送信
+        
+        Args:
+            groups: (配信完了時にon_sentへ渡す値, メッセージオブジェクトのリスト) のリスト
+            on_sent: グループのメッセージがすべて送信できた際に呼び出すコールバック（値がリストの場合は要素ごと）
+            
+        Returns:
+            すべて送信成功時True
+        """
         if not self.access_token or not self.user_id:
             logger.error("LINE_CHANNEL_ACCESS_TOKENまたはLINE_USER_IDが設定されていません")
             return False
         
-        try:
-            payload = {
-                "to": self.user_id,
-                "messages": [
-                    {
-                        "type": "text",
-                        "text": message
-                    }
-                ]
-            }
+        # メッセージを送信順に並べ、どのグループに属するかを記録する
+        flat = [(index, message) for index, (_, messages) in enumerate(groups) for message in messages]
+        failed_groups = set()
+        
+        for start in range(0, len(flat), MAX_MESSAGES_PER_PUSH):
+            chunk = flat[start:start + MAX_MESSAGES_PER_PUSH]
+            if not self._push([message for _, message in chunk]):
+                failed_groups.update(index for index, _ in chunk)
+        
+        if on_sent:
+            for index, (key, _) in enumerate(groups):
+                if index in failed_groups:
+                    continue
+                for item in (key if isinstance(key, list) else [key]):
+                    if item is not None:
+                        on_sent(item)
+        
+        return not failed_groups
+    
+    def _push(self, messages: List[dict]) -> bool:
+        """
+        push APIを1回呼び出す
+        
+        Args:
+            messages: メッセージオブジェクトのリスト（最大5件）
             
-            response = requests.post(
-                LINE_API_URL,
-                headers=self.headers,
-                json=payload,
-                timeout=10
-            )
+        Returns:
+            送信成功時True
+        """
+        payload = {
+            "to": self.user_id,
+            "messages": messages
+        }
+        return self._send_request(LINE_API_URL, payload) is None
+    
+    def multicast(self, user_ids: List[str], messages: List[dict]) -> Optional[str]:
+        """
+        multicast APIで複数のユーザーに同じメッセージを送信
+        
+        Args:
+            user_ids: 送信先のユーザーID（最大500件）
+            messages: メッセージオブジェクトのリスト（最大5件）
             
-            response.raise_for_status()
-            logger.info("LINEメッセージの送信に成功しました")
-            return True
+        Returns:
+            成功時None、失敗時はエラー内容
+        """
+        if not self.access_token:
+            logger.error("LINE_CHANNEL_ACCESS_TOKENが設定されていません")
+            return "LINE_CHANNEL_ACCESS_TOKEN is not set"
+        
+        payload = {
+            "to": user_ids,
+            "messages": messages
+        }
+        return self._send_request(LINE_MULTICAST_URL, payload)
+    
+    def _send_request(self, url: str, payload: dict) -> Optional[str]:
+        """
+        メッセージ送信APIを呼び出す（レート制限に従い、429・サーバーエラー時は再送）
+        
+        再送時も同じX-Line-Retry-Keyを使用するため、重複して配信されることはない
+        
+        Args:
+            url: APIのURL
+            payload: リクエストのJSONボディ
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"LINEメッセージ送信エラー: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                logger.error(f"レスポンス: {e.response.text}")
-            return False
+        Returns:
+            成功時None、失敗時はエラー内容
+        """
+        endpoint = url.rstrip('/').rsplit('/', 1)[-1]
+        metrics = get_metrics()
+        with metrics.span('line.request', endpoint=endpoint) as span:
+            span['messages'] = len(payload['messages'])
+            error = self._post_with_retries(url, payload, endpoint)
+            if error is not None:
+                span['failed'] = error
+        
+        if error is None:
+            metrics.increment('line_messages', len(payload['messages']), endpoint=endpoint)
+        else:
+            metrics.increment('line_failures', endpoint=endpoint)
+        return error
     
-    def send_news_summary(self, news_data: dict) -> bool:
+    def _post_with_retries(self, url: str, payload: dict, endpoint: str) -> Optional[str]:
         """
-        ニュースの要約とフレーズをフォーマットして送信
+        _send_requestの本体（再送を含めてAPIを呼び出す）
         
         Args:
-            news_data: ニュースデータ（title, summary, phrasesを含む）
+            url: APIのURL
+            payload: リクエストのJSONボディ
+            endpoint: 計測用のエンドポイント名（push / multicast）
+            
+        Returns:
+            成功時None、失敗時はエラー内容
+        """
+        headers = dict(self.headers)
+        headers['X-Line-Retry-Key'] = str(uuid.uuid4())
+        message_count = len(payload['messages'])
+        
+        for attempt in range(LINE_MAX_RETRIES + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.http.post(
+                    url,
+                    headers=headers,
+                    json=payload,
+                    timeout=10
+                )
+                
+                if response.status_code == 409 and attempt > 0:
+                    # 同じリトライキーのリクエストが既に受理されている
+                    logger.info("LINEメッセージは前回のリクエストで送信済みです")
+                    return None
+                
+                if response.status_code in RETRYABLE_STATUS and attempt < LINE_MAX_RETRIES:
+                    wait = self._retry_wait(response, attempt)
+                    logger.warning("LINE APIが%sを返しました。%.1f秒後に再送します", response.status_code, wait)
+                    get_metrics().increment('line_retries', endpoint=endpoint, reason=response.status_code)
+                    if response.status_code == 429:
+                        self.rate_limiter.block_for(wait)
+                    else:
+                        time.sleep(wait)
+                    continue
+                
+                response.raise_for_status()
+                logger.info("LINEメッセージの送信に成功しました（%s件）", message_count)
+                return None
+                
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt < LINE_MAX_RETRIES:
+                    wait = self._retry_wait(None, attempt)
+                    logger.warning("LINEメッセージ送信エラー: %s。%.1f秒後に再送します", e, wait)
+                    get_metrics().increment('line_retries', endpoint=endpoint, reason=type(e).__name__)
+                    time.sleep(wait)
+                    continue
+                logger.error("LINEメッセージ送信エラー: %s", e)
+                return str(e)
+            except requests.exceptions.RequestException as e:
+                logger.error("LINEメッセージ送信エラー: %s", e)
+                if hasattr(e, 'response') and e.response is not None:
+                    logger.error("レスポンス: %s", e.response.text)
+                return str(e)
+        
+        return "retry limit exceeded"
+    
+    def _retry_wait(self, response: Optional[requests.Response], attempt: int) -> float:
+        """
+        再送までの待機秒数を決定（Retry-Afterヘッダーがあれば優先し、なければジッター付き指数バックオフ）
+        """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return max(float(retry_after), 0.0)
+                except ValueError:
+                    pass
+        return (2 ** attempt) * (0.5 + random.random() / 2)
+    
+    def _text_message(self, text: str) -> dict:
+        """テキストメッセージオブジェクトを生成"""
+        return {
+            "type": "text",
+            "text": text
+        }
+    
+    def build_intro_messages(self, news_count: Optional[int] = None) -> List[dict]:
+        """
+        本日のニュース件数を知らせる通知のメッセージオブジェクトを生成
+        
+        Args:
+            news_count: 配信するニュース数（件数が確定する前に送信する場合はNone）
+            
+        Returns:
+            メッセージオブジェクトのリスト
+        """
+        count_text = f"{news_count}件の" if news_count is not None else ""
+        intro_message = f"""📚 Daily News Summary - {datetime.now().strftime('%Y年%m月%d日')}
+
+本日は{count_text}ニュースをお届けします。
+各ニュースの要約とAdvancedレベルの英語フレーズ・表現をご確認ください。
+
+"""
+        return [self._text_message(intro_message)]
+    
+    def send_intro(self, news_count: int) -> bool:
+        """
+        本日のニュース件数を知らせる通知を送信
+        
+        Args:
+            news_count: 配信するニュース数
             
         Returns:
             送信成功時True
         """
+        return self.send_packed([(None, self.build_intro_messages(news_count))])
+    
+    def build_news_messages(self, news_data: dict) -> List[dict]:
+        """
+        ニュースの要約とフレーズをフォーマットしたメッセージオブジェクトを生成
+        
+        Args:
+            news_data: ニュースデータ（title, summary, phrasesを含む）
+            
+        Returns:
+            メッセージオブジェクトのリスト（長い場合は分割）
+        """
         # メッセージを構築（LINEの文字数制限を考慮）
         message_parts = []
         
@@ -98,75 +335,134 @@ class LineBotSender:
         message = ''.join(message_parts)
         
         # LINEの文字数制限（5000文字）をチェック
-        if len(message) > 5000:
-            # メッセージを分割して送信
-            return self._send_long_message(message)
+        if len(message) > MAX_TEXT_LENGTH:
+            # メッセージを分割
+            return [self._text_message(part) for part in self._split_long_message(message)]
         else:
-            return self.send_message(message)
+            return [self._text_message(message)]
     
-    def _send_long_message(self, message: str) -> bool:
+    def send_news_summary(self, news_data: dict) -> bool:
         """
-        長いメッセージを分割して送信
+        ニュースの要約とフレーズをフォーマットして送信
         
         Args:
-            message: 送信するメッセージ
+            news_data: ニュースデータ（title, summary, phrasesを含む）
             
         Returns:
             送信成功時True
         """
-        max_length = 4000  # 安全マージンを考慮
+        return self.send_packed([(None, self.build_news_messages(news_data))])
+    
+    def _split_long_message(self, message: str) -> List[str]:
+        """
+        長いメッセージを分割
+        
+        Args:
+            message: 分割するメッセージ
+            
+        Returns:
+            分割したメッセージのリスト（2件目以降に続き番号を付与）
+        """
+        # 続き番号（「[続き 10/10]」と空行）の分を空けておく
+        max_length = MAX_TEXT_LENGTH - 20
         parts = []
         
-        current_part = ""
-        lines = message.split('\n')
+        current_lines: List[str] = []
+        current_length = 0
+        for line in message.split('\n'):
+            # 1行で上限を超える場合は上限の長さごとに区切る
+            for start in range(0, max(len(line), 1), max_length):
+                piece = line[start:start + max_length]
+                if current_lines and current_length + len(piece) + 1 > max_length:
+                    parts.append('\n'.join(current_lines))
+                    current_lines, current_length = [], 0
+                current_lines.append(piece)
+                current_length += len(piece) + 1
         
-        for line in lines:
-            if len(current_part) + len(line) + 1 > max_length:
-                if current_part:
-                    parts.append(current_part)
-                current_part = line + '\n'
-            else:
-                current_part += line + '\n'
+        if current_lines:
+            parts.append('\n'.join(current_lines))
         
-        if current_part:
-            parts.append(current_part)
+        return [
+            f"[続き {i+1}/{len(parts)}]\n\n{part}" if i > 0 else part
+            for i, part in enumerate(parts)
+        ]
+    
+    def numbered_news_group(self, index: int, news_data: dict, key: Any = None) -> MessageGroup:
+        """
+        ニュース番号を付けた1件のニュースの送信単位を生成
         
-        # 各部分を送信
-        success = True
-        for i, part in enumerate(parts):
-            if i > 0:
-                part = f"[続き {i+1}/{len(parts)}]\n\n{part}"
-            if not self.send_message(part):
-                success = False
+        Args:
+            index: ニュース番号（1始まり）
+            news_data: ニュースデータ
+            key: 配信完了時にon_sentへ渡す値
+            
+        Returns:
+            send_packedに渡す送信単位
+        """
+        news_with_number = news_data.copy()
+        news_with_number['title'] = f"News {index}: {news_data['title']}"
+        return (key, self.build_news_messages(news_with_number))
+    
+    def build_news_groups(self, items: List[Tuple[int, dict, Any]]) -> List[MessageGroup]:
+        """
+        番号を付けたニュースの送信単位を生成
         
-        return success
+        Flex Messageの場合は、バブル数・サイズの上限に収まる限り複数のニュースを1つのカルーセルにまとめる
+        （1つのバブルに収まらないニュースはテキストで送信する）
+        
+        Args:
+            items: (ニュース番号（1始まり）, ニュースデータ, 配信完了時にon_sentへ渡す値) のリスト
+            
+        Returns:
+            send_packedに渡す送信単位のリスト（ニュースの順）
+        """
+        if self.renderer is None:
+            return [self.numbered_news_group(index, news_data, key) for index, news_data, key in items]
+        return self.renderer.render(
+            items, fallback=lambda index, news_data: self.numbered_news_group(index, news_data)[1])
     
-    def send_multiple_news(self, news_list: List[dict]) -> bool:
+    def send_multiple_news(self, news_list: List[dict],
+                           on_sent: Optional[Callable[[dict], None]] = None,
+                           include_intro: bool = False) -> bool:
         """
-        複数のニュースを順番に送信
+        複数のニュースをまとめて順番に送信
         
         Args:
             news_list: ニュースデータのリスト
+            on_sent: 各ニュースの送信に成功した際に呼び出すコールバック（引数は元のニュースデータ）
+            include_intro: Trueの場合、最初に全体の通知を含める
             
         Returns:
             すべて送信成功時True
         """
-        success = True
-        for i, news_data in enumerate(news_list, 1):
-            logger.info(f"ニュース {i}/{len(news_list)} を送信中...")
-            
-            # ニュース番号を追加
-            news_with_number = news_data.copy()
-            news_with_number['title'] = f"News {i}: {news_data['title']}"
-            
-            if not self.send_news_summary(news_with_number):
-                success = False
-                logger.error(f"ニュース {i} の送信に失敗しました")
-            
-            # メッセージ間隔を空ける（レート制限対策）
-            import time
-            if i < len(news_list):
-                time.sleep(1)
+        groups: List[MessageGroup] = []
+        if include_intro:
+            groups.append((None, self.build_intro_messages(len(news_list))))
+        groups += self.build_news_groups([(i, news_data, i - 1) for i, news_data in enumerate(news_list, 1)])
         
+        logger.info("%s件のニュースを送信中...", len(news_list))
+        
+        def notify(index: int):
+            if on_sent:
+                on_sent(news_list[index])
+        
+        success = self.send_packed(groups, on_sent=notify)
+        if not success:
+            logger.error("一部のニュースの送信に失敗しました")
         return success
-
+    
+    def send_numbered_news(self, index: int, news_data: dict) -> bool:
+        """
+        ニュース番号を付けて1件のニュースを送信
+        
+        Args:
+            index: ニュース番号（1始まり）
+            news_data: ニュースデータ
+            
+        Returns:
+            送信成功時True
+        """
+        if not self.send_packed(self.build_news_groups([(index, news_data, None)])):
+            logger.error("ニュース %s の送信に失敗しました", index)
+            return False
+        return True
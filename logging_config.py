@@ -0,0 +1,146 @@
+"""
+ロギング設定モジュール
+各モジュールはロガーを取得するだけにし、ハンドラーとフォーマットはエントリーポイント（main.py・backfill.py）で1回だけ設定する
+
+ログを出したスレッドではレコードをキューに入れるだけにし、ファイル・標準出力への書き込み（JSONへの変換、
+ローテーションを含む）はバックグラウンドのスレッドで行う。ログファイルの各行は実行ID（計測のrun_idと同じ）と、
+article_context() の中で出したログには記事ID・URLを含むJSONになる
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional, Tuple
+
+from config import LOG_LEVEL, LOG_FILE, LOG_JSON, LOG_ROTATE, LOG_MAX_BYTES, LOG_BACKUP_COUNT
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 処理中の記事（記事ID, URL）。ワーカースレッドにはコンテキストが引き継がれないため、記事を扱う関数の中で設定する
+_article: ContextVar[Optional[Tuple[str, str]]] = ContextVar('log_article', default=None)
+
+_configured = False
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+@contextmanager
+def article_context(url: str):
+    """
+    この中で出したログに記事ID・URLを付ける
+
+    Args:
+        url: 処理中の記事のURL
+    """
+    from article_store import article_id
+    token = _article.set((article_id(url), url))
+    try:
+        yield
+    finally:
+        _article.reset(token)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """ログを出したスレッドでは実行ID・記事IDを付けてキューに入れるだけにするハンドラー"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 引数があとで変更されても出した時点の内容になるようメッセージだけ組み立て、
+        # 書式の適用・例外のトレースバックの整形は書き込みスレッドに任せる
+        record.msg = record.getMessage()
+        record.args = None
+        record.run_id = get_metrics().run_id
+        article = _article.get()
+        record.article_id, record.article_url = article if article else (None, None)
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """ログレコードを1行のJSONにするフォーマッター"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'run_id': getattr(record, 'run_id', None),
+            'thread': record.threadName,
+        }
+        if getattr(record, 'article_id', None):
+            entry['article_id'] = record.article_id
+            entry['article_url'] = record.article_url
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _file_handler(log_file: str, rotate: str) -> logging.Handler:
+    """ローテーションの設定に従ってログファイルのハンドラーを生成"""
+    if rotate == 'size':
+        return logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    if rotate and rotate != 'none':
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file, when=rotate, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    return logging.FileHandler(log_file, encoding='utf-8')
+
+
+def setup_logging(level: str = LOG_LEVEL, log_file: Optional[str] = LOG_FILE, json_file: bool = LOG_JSON,
+                  rotate: str = LOG_ROTATE):
+    """
+    ルートロガーにハンドラーを設定（2回目以降の呼び出しは何もしない）
+
+    Args:
+        level: ログレベル名（例: 'INFO'）
+        log_file: ログの出力先ファイル（空またはNoneの場合は標準出力のみ）
+        json_file: ログファイルをJSON形式で書き出すか（標準出力は常にテキスト形式）
+        rotate: ログファイルのローテーション（size / midnight・D・H などTimedRotatingFileHandlerのwhen / none）
+    """
+    global _configured, _listener
+    if _configured:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [stream_handler]
+    rotate_error = None
+    if log_file:
+        try:
+            file_handler = _file_handler(log_file, rotate.lower())
+        except ValueError as e:
+            # 不正なローテーションの指定ではローテーションせずに書き出す（警告はハンドラーの設定後に出す）
+            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            rotate_error = e
+        file_handler.setFormatter(JsonFormatter() if json_file else logging.Formatter(LOG_FORMAT))
+        handlers.insert(0, file_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # 終了時にキューに残ったログを書き出してから止める
+    atexit.register(shutdown_logging)
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    root.addHandler(_ContextQueueHandler(log_queue))
+    _configured = True
+
+    if rotate_error is not None:
+        logger.warning("ログのローテーション設定が不正なため無効にします: %s, %s", rotate, rotate_error)
+
+
+def shutdown_logging():
+    """キューに残ったログを書き出し、書き込みスレッドを止める"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -2,98 +2,535 @@
 """
 DMM英会話Daily News要約とフレーズ生成のメインスクリプト
 毎日18時に実行されることを想定
+
+サブコマンド（省略時はrun）:
+    run      取得・処理・送信をまとめて実行（--daemonで常駐）
+    scrape   ニュースを取得して記事ストアに記録
+    process  記録済みの記事の要約とフレーズを生成
+    send     処理済みで未配信の記事をLINE Bot経由で送信
+
+起動を速くするため、スクレイピング・HTML解析・要約・LINE送信のモジュールは使う時点で読み込む
 """
+import argparse
 import logging
 import sys
 from datetime import datetime
-from dmm_scraper import DMMNewsScraper
-from news_processor import NewsProcessor
-from line_bot import LineBotSender
-from config import MAX_NEWS_COUNT, PHRASES_PER_NEWS
-
-# ロギング設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('daily_news.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence
+from article_store import ArticleStore, STATUS_DELIVERED, STATUS_PROCESSED, STATUS_SCRAPED
+from logging_config import article_context, setup_logging
+from metrics import get_metrics
+from subscriber_store import SubscriberStore
+from config import (
+    MAX_NEWS_COUNT, PHRASES_PER_NEWS, INCREMENTAL_MODE, PIPELINE_STREAMING, SUBSCRIBERS_FILE, DIGEST_ENABLED,
+    HTTP_CAPTURE_DIR, HTTP_CAPTURE_KEEP,
 )
+
+if TYPE_CHECKING:
+    from line_bot import LineBotSender
+    from news_processor import NewsProcessor
+
 logger = logging.getLogger(__name__)
 
 
-def main():
-    """メイン処理"""
+def main(incremental: bool = INCREMENTAL_MODE, streaming: bool = PIPELINE_STREAMING, record: Optional[str] = None):
+    """
+    メイン処理
+    
+    Args:
+        incremental: Trueの場合、配信済みで本文が変わっていない記事をスキップし、
+            要約・フレーズ生成済みの記事は保存済みの結果を再利用する
+        streaming: Trueの場合、取得・処理・送信を重ねて実行する
+        record: 指定した場合、HTTPのやり取りをこのファイルに記録する
+    """
     logger.info("=" * 50)
     logger.info("DMM英会話Daily News処理を開始します")
-    logger.info(f"実行日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logger.info("実行日時: %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    if incremental:
+        logger.info("インクリメンタルモード: 新しい記事のみを処理します")
     logger.info("=" * 50)
     
+    return run_recorded(run_all, incremental, streaming, record=record)
+
+
+def run_recorded(command: Callable[..., bool], *args, record: Optional[str] = None) -> bool:
+    """
+    処理時間とカウンターを記録しながら実行し、終了時にJSONレポートとPrometheusのtextfileに書き出す
+    
+    HTTP_CAPTURE_DIRが設定されている場合（またはrecordを指定した場合）は、HTTPのやり取りも記録する
+    
+    Args:
+        command: 実行する処理（成功した場合Trueを返す）
+        *args: commandに渡す引数
+        record: HTTPのやり取りを記録するファイル（省略時はHTTP_CAPTURE_DIRに実行IDの名前で保存）
+        
+    Returns:
+        commandが成功した場合True（例外が発生した場合はFalse）
+    """
+    metrics = get_metrics()
+    metrics.reset()
+    capture = record is not None or bool(HTTP_CAPTURE_DIR)
+    if capture:
+        from http_recorder import capture_path, start_recording
+        start_recording(record or capture_path(metrics.run_id))
+    success = False
     try:
-        # 1. ニュースを取得
-        logger.info("ステップ1: ニュースを取得中...")
-        scraper = DMMNewsScraper()
-        news_list = scraper.get_latest_news(MAX_NEWS_COUNT)
+        success = command(*args)
+        return success
+    except Exception as e:
+        logger.error("予期しないエラーが発生しました: %s", e, exc_info=True)
+        return False
+    finally:
+        if capture:
+            from http_recorder import stop_recording
+            stop_recording(keep=None if record else HTTP_CAPTURE_KEEP)
+        report = metrics.export(success)
+        if report is not None:
+            metrics.log_summary(report)
+
+
+def run_all(incremental: bool, streaming: bool) -> bool:
+    """
+    取得・処理・送信をまとめて実行（runサブコマンド）
+    
+    Args:
+        incremental: 配信済みの記事をスキップするか
+        streaming: 取得・処理・送信を重ねて実行するか
         
+    Returns:
+        すべて成功した場合True
+    """
+    store = ArticleStore()
+    subscribers = None
+    try:
+        # 購読者が登録されている場合はmulticastで全員に配信する
+        subscribers = open_subscribers()
+        if subscribers.count() > 0:
+            logger.info("%s人の購読者に配信します", subscribers.count())
+            # ダイジェストは全記事の処理後に1回だけ生成するため、順番に実行する
+            return run_phased(store, incremental, subscribers=subscribers)
+        elif streaming:
+            return run_streaming(store, incremental)
+        else:
+            return run_phased(store, incremental)
+    finally:
+        store.close()
+        if subscribers is not None:
+            subscribers.close()
+
+
+def scrape_only(limit: int = MAX_NEWS_COUNT) -> bool:
+    """
+    ニュースを取得して記事ストアに記録（scrapeサブコマンド）
+    
+    Args:
+        limit: 取得するニュース数
+        
+    Returns:
+        ニュースを取得できた場合True
+    """
+    from multi_source import create_scraper
+    
+    store = ArticleStore()
+    try:
+        with get_metrics().span('scrape'):
+            news_list = create_scraper().get_latest_news(limit)
         if not news_list:
             logger.error("ニュースの取得に失敗しました")
             return False
         
-        logger.info(f"{len(news_list)}件のニュースを取得しました")
+        for news in news_list:
+            record = store.save_scraped(news)
+            logger.info("記録しました（%s）: %s", record['status'], news['title'])
+        logger.info("%s件のニュースを取得しました", len(news_list))
+        return True
+    finally:
+        store.close()
+
+
+def process_pending(limit: int = MAX_NEWS_COUNT) -> bool:
+    """
+    記録済みで要約・フレーズが未生成の記事を処理（processサブコマンド）
+    
+    Args:
+        limit: 処理する記事数の上限（直近に記録した記事から）
+        
+    Returns:
+        処理が完了した場合True（処理する記事がない場合もTrue）
+    """
+    from news_processor import NewsProcessor
+    
+    store = ArticleStore()
+    try:
+        records = store.list_by_status(STATUS_SCRAPED, limit)
+        if not records:
+            logger.info("要約・フレーズを生成する記事はありませんでした")
+            return True
         
-        # 2. 各ニュースを処理
-        logger.info("ステップ2: ニュースを処理中...")
         processor = NewsProcessor()
-        processed_news = []
-        
-        for i, news in enumerate(news_list, 1):
-            logger.info(f"ニュース {i}/{len(news_list)} を処理中: {news['title']}")
-            
-            # 要約を生成
-            summary = processor.summarize_news(news)
-            logger.info(f"要約を生成しました（{len(summary)}文字）")
-            
-            # フレーズを生成
-            phrases = processor.generate_advanced_phrases(news, summary, PHRASES_PER_NEWS)
-            logger.info(f"{len(phrases)}個のフレーズを生成しました")
-            
-            processed_news.append({
+        with get_metrics().span('process'):
+            results = processor.process_news_batch(records, PHRASES_PER_NEWS)
+        for record, result in zip(records, results):
+            store.save_processed(record['url'], result['summary'], result['phrases'])
+            logger.info("要約とフレーズを生成しました: %s", record['title'])
+        
+        _log_result_cache_stats(processor)
+        publish_digest(store, [record['url'] for record in records])
+        return True
+    finally:
+        store.close()
+
+
+def send_pending(limit: int = MAX_NEWS_COUNT) -> bool:
+    """
+    処理済みで未配信の記事を送信（sendサブコマンド）
+    
+    Args:
+        limit: 送信する記事数の上限（直近に処理した記事から）
+        
+    Returns:
+        すべて送信できた場合True（送信する記事がない場合もTrue）
+    """
+    store = ArticleStore()
+    subscribers = None
+    try:
+        records = store.list_by_status(STATUS_PROCESSED, limit)
+        if not records:
+            logger.info("送信する記事はありませんでした")
+            return True
+        
+        processed_news = [
+            {'title': r['title'], 'url': r['url'], 'summary': r['summary'], 'phrases': r['phrases']}
+            for r in records
+        ]
+        subscribers = open_subscribers()
+        return deliver_news(store, processed_news, subscribers=subscribers if subscribers.count() > 0 else None)
+    finally:
+        store.close()
+        if subscribers is not None:
+            subscribers.close()
+
+
+def open_subscribers() -> SubscriberStore:
+    """購読者ストアを開く（SUBSCRIBERS_FILEが設定されている場合は購読者リストを取り込む）"""
+    subscribers = SubscriberStore()
+    if SUBSCRIBERS_FILE:
+        logger.info("購読者リストを取り込みました: %s件", subscribers.import_file(SUBSCRIBERS_FILE))
+    return subscribers
+
+
+def run_streaming(store: ArticleStore, incremental: bool) -> bool:
+    """
+    取得・処理・送信を重ねて実行
+    
+    Args:
+        store: 処理状況を記録する記事ストア
+        incremental: 配信済みの記事をスキップするか
+        
+    Returns:
+        すべて成功した場合True
+    """
+    from line_bot import LineBotSender
+    from multi_source import create_scraper
+    from news_processor import NewsProcessor
+    from pipeline import StreamingPipeline
+    
+    logger.info("取得・処理・送信をストリーミングで実行します")
+    processor = NewsProcessor()
+    pipeline = StreamingPipeline(
+        create_scraper(), processor, LineBotSender(), store=store, incremental=incremental
+    )
+    with get_metrics().span('pipeline'):
+        result = pipeline.run(MAX_NEWS_COUNT)
+    _log_result_cache_stats(processor)
+    publish_digest(store, result.urls)
+    
+    if not result.scraped:
+        logger.error("ニュースの取得に失敗しました")
+        return False
+    
+    logger.info("%s件のニュースを取得し、%s/%s件を送信しました", result.scraped, result.delivered, result.total)
+    
+    if not result.total:
+        logger.info("新しいニュースはありませんでした")
+        return True
+    
+    if result.success:
+        logger.info("すべての処理が正常に完了しました")
+        return True
+    else:
+        logger.warning("一部の処理でエラーが発生しました")
+        return False
+
+
+def run_phased(store: ArticleStore, incremental: bool, subscribers: Optional[SubscriberStore] = None) -> bool:
+    """
+    取得・処理・送信を順番に実行
+    
+    Args:
+        store: 処理状況を記録する記事ストア
+        incremental: 配信済みの記事をスキップするか
+        subscribers: 指定した場合、LINE_USER_IDではなく購読者全員にmulticastで配信する
+        
+    Returns:
+        すべて成功した場合True
+    """
+    processed_news = prepare_news(store, incremental)
+    if processed_news is None:
+        return False
+    
+    if not processed_news:
+        logger.info("新しいニュースはありませんでした")
+        return True
+    
+    return deliver_news(store, processed_news, subscribers=subscribers)
+
+
+def prepare_news(store: ArticleStore, incremental: bool) -> Optional[List[dict]]:
+    """
+    ニュースを取得し、要約とフレーズを生成（送信の前までの処理）
+    
+    Args:
+        store: 処理状況を記録する記事ストア
+        incremental: 配信済みの記事をスキップするか
+        
+    Returns:
+        配信するニュース（title, url, summary, phrasesを含む）のリスト（取得に失敗した場合はNone）
+    """
+    from multi_source import create_scraper
+    from news_processor import NewsProcessor
+    
+    # 1. ニュースを取得
+    logger.info("ステップ1: ニュースを取得中...")
+    scraper = create_scraper()
+    with get_metrics().span('scrape'):
+        news_list = scraper.get_latest_news(MAX_NEWS_COUNT)
+    
+    if not news_list:
+        logger.error("ニュースの取得に失敗しました")
+        return None
+    
+    logger.info("%s件のニュースを取得しました", len(news_list))
+    
+    # 2. 各ニュースを処理
+    logger.info("ステップ2: ニュースを処理中...")
+    processor = NewsProcessor()
+    processed_news = []
+    pending = []  # 要約・フレーズの生成が必要なニュース
+    
+    for i, news in enumerate(news_list, 1):
+        with article_context(news.get('url', '')):
+            record = store.save_scraped(news)
+        
+            if incremental and record['status'] == STATUS_DELIVERED:
+                logger.info("ニュース %s/%s は配信済みのためスキップします: %s", i, len(news_list), news['title'])
+                continue
+        
+            processed = {
                 'title': news['title'],
                 'url': news.get('url', ''),
-                'summary': summary,
-                'phrases': phrases
-            })
+                'summary': None,
+                'phrases': None
+            }
         
-        # 3. LINE Bot経由で送信
-        logger.info("ステップ3: LINE Bot経由で送信中...")
-        line_bot = LineBotSender()
+            if incremental and record['status'] == STATUS_PROCESSED:
+                # 前回の実行で生成済みの結果から再開する
+                logger.info("ニュース %s/%s は処理済みの結果を再利用します: %s", i, len(news_list), news['title'])
+                processed['summary'] = record['summary']
+                processed['phrases'] = record['phrases']
+            else:
+                logger.info("ニュース %s/%s を処理中: %s", i, len(news_list), news['title'])
+                pending.append((news, processed))
         
-        # 最初に全体の通知を送信
-        intro_message = f"""📚 Daily News Summary - {datetime.now().strftime('%Y年%m月%d日')}
+            processed_news.append(processed)
+    
+    # 要約とフレーズを一括生成（一括処理APIが使えない場合はニュースごとに処理）
+    if pending:
+        with get_metrics().span('process'):
+            results = processor.process_news_batch([news for news, _ in pending], PHRASES_PER_NEWS)
+        for (news, processed), result in zip(pending, results):
+            with article_context(news['url']):
+                processed['summary'] = result['summary']
+                processed['phrases'] = result['phrases']
+                logger.info("要約を生成しました（%s文字）", len(result['summary']))
+                logger.info("%s個のフレーズを生成しました", len(result['phrases']))
+                store.save_processed(news['url'], result['summary'], result['phrases'])
+    
+    _log_result_cache_stats(processor)
+    publish_digest(store, [news.get('url', '') for news in news_list])
+    return processed_news
 
-本日は{len(processed_news)}件のニュースをお届けします。
-各ニュースの要約とAdvancedレベルの英語フレーズ・表現をご確認ください。
 
-"""
-        line_bot.send_message(intro_message)
-        
-        # 各ニュースを送信
-        success = line_bot.send_multiple_news(processed_news)
+def deliver_news(store: ArticleStore, processed_news: List[dict], subscribers: Optional[SubscriberStore] = None,
+                 line_bot: Optional['LineBotSender'] = None) -> bool:
+    """
+    処理済みのニュースをLINE Bot経由で送信
+    
+    Args:
+        store: 処理状況を記録する記事ストア（送信に成功した記事を配信済みにし、フレーズをインデックスに記録する）
+        processed_news: prepare_newsで生成したニュースのリスト
+        subscribers: 指定した場合、LINE_USER_IDではなく購読者全員にmulticastで配信する
+        line_bot: 送信に使用するLINE Bot（省略時は新規作成）
         
-        if success:
-            logger.info("すべての処理が正常に完了しました")
-            return True
+    Returns:
+        すべて送信できた場合True
+    """
+    from fanout import FanoutDelivery
+    from line_bot import LineBotSender
+    from phrase_index import record_delivered
+    
+    # 3. LINE Bot経由で送信
+    logger.info("ステップ3: LINE Bot経由で送信中...")
+    line_bot = line_bot or LineBotSender()
+    
+    def on_sent(news_data: dict):
+        store.mark_delivered(news_data['url'])
+        record_delivered(news_data)
+    
+    with get_metrics().span('send'):
+        if subscribers is not None:
+            # 全体の通知と各ニュースを1つのダイジェストとして購読者全員に配信
+            fanout = FanoutDelivery(line_bot, subscribers)
+            fanout.retry_failed()
+            groups = [(None, line_bot.build_intro_messages(len(processed_news)))]
+            groups += line_bot.build_news_groups([(i, news_data, None) for i, news_data in enumerate(processed_news, 1)])
+            success = fanout.deliver(groups)
+            if success:
+                for news_data in processed_news:
+                    on_sent(news_data)
         else:
-            logger.warning("一部の処理でエラーが発生しました")
-            return False
-            
-    except Exception as e:
-        logger.error(f"予期しないエラーが発生しました: {e}", exc_info=True)
+            # 全体の通知と各ニュースをまとめて送信（送信に成功した記事は配信済みとして記録）
+            success = line_bot.send_multiple_news(
+                processed_news,
+                on_sent=on_sent,
+                include_intro=True
+            )
+    
+    if success:
+        logger.info("すべての処理が正常に完了しました")
+        return True
+    else:
+        logger.warning("一部の処理でエラーが発生しました")
         return False
 
 
-if __name__ == "__main__":
-    success = main()
-    sys.exit(0 if success else 1)
+def publish_digest(store: ArticleStore, urls: Sequence[str]) -> Optional[dict]:
+    """
+    要約・フレーズを生成済みのニュースをWebフロントエンド向けのダイジェストとして書き出す
+    
+    Args:
+        store: 処理状況を記録する記事ストア
+        urls: ダイジェストに含めるニュースのURL（一覧ページの順序）
+        
+    Returns:
+        書き出したダイジェストの情報（無効な場合・書き出せなかった場合はNone）
+    """
+    if not DIGEST_ENABLED:
+        return None
+    
+    from digest_publisher import DigestPublisher
+    
+    news = []
+    for url in urls:
+        record = store.get(url) if url else None
+        if record is None or not record['summary']:
+            continue
+        news.append({
+            'title': record['title'],
+            'url': record['url'],
+            'summary': record['summary'],
+            'phrases': record['phrases'],
+            'date': record['date'] or ''
+        })
+    if not news:
+        return None
+    
+    try:
+        with get_metrics().span('publish'):
+            return DigestPublisher().publish(news)
+    except OSError as e:
+        logger.warning("ダイジェストを書き出せませんでした: %s", e)
+        return None
+
 
+def _log_result_cache_stats(processor: 'NewsProcessor'):
+    """結果キャッシュのヒット率をログに出力"""
+    if processor.result_cache is None:
+        return
+    stats = processor.result_cache.stats()
+    logger.info(
+        "結果キャッシュ: メモリ %s件 / ディスク %s件 / ミス %s件（ヒット率 %.0f%%）",
+        stats['memory_hits'], stats['disk_hits'], stats['misses'], stats['hit_rate'] * 100
+    )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    コマンドライン引数を解析
+    
+    サブコマンドを省略した場合（python main.py --incremental など従来の呼び出し）はrunとして扱う
+    """
+    parser = argparse.ArgumentParser(description="DMM英会話Daily News要約とフレーズ生成")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    run_parser = subparsers.add_parser('run', help='取得・処理・送信をまとめて実行する（省略時）')
+    run_parser.add_argument(
+        '--incremental',
+        action='store_true',
+        default=INCREMENTAL_MODE,
+        help='配信済みで本文が変わっていない記事をスキップする'
+    )
+    run_parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='常駐して配信時刻（DAEMON_SCHEDULE）ごとに実行する（取得・要約は配信時刻の前に済ませておく）'
+    )
+    run_parser.add_argument(
+        '--streaming',
+        action=argparse.BooleanOptionalAction,
+        default=PIPELINE_STREAMING,
+        help='取得・処理・送信を重ねて実行する（--no-streamingで順番に実行）'
+    )
+    run_parser.add_argument(
+        '--record',
+        metavar='PATH',
+        help='HTTPのやり取りを記録する（.jsonl.gz、benchmarks/replay_capture.pyで再生できる）'
+    )
+    
+    for name, help_text in (
+        ('scrape', 'ニュースを取得して記事ストアに記録する'),
+        ('process', '記録済みの記事の要約とフレーズを生成する'),
+        ('send', '処理済みで未配信の記事をLINE Bot経由で送信する'),
+    ):
+        command_parser = subparsers.add_parser(name, help=help_text)
+        command_parser.add_argument('--limit', type=int, default=MAX_NEWS_COUNT, help='対象にする記事数の上限')
+    
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0] not in subparsers.choices and argv[0] not in ('-h', '--help')):
+        argv = ['run'] + argv
+    return parser.parse_args(argv)
+
+
+def cli(argv=None) -> int:
+    """
+    コマンドラインから実行
+    
+    Returns:
+        終了コード（成功した場合0）
+    """
+    args = parse_args(argv)
+    setup_logging()
+    
+    if args.command == 'run':
+        if args.daemon:
+            from scheduler import DailyNewsDaemon
+            DailyNewsDaemon(incremental=args.incremental).run()
+            return 0
+        success = main(incremental=args.incremental, streaming=args.streaming, record=args.record)
+    else:
+        command = {'scrape': scrape_only, 'process': process_pending, 'send': send_pending}[args.command]
+        success = run_recorded(command, args.limit)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
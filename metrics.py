@@ -0,0 +1,288 @@
+"""
+実行ごとの計測（処理時間のスパンとカウンター）を集計するモジュール
+実行の最後にJSONレポートとPrometheusのtextfile（node_exporterのtextfile collector形式）を書き出す
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import METRICS_ENABLED, METRICS_REPORT_DIR, METRICS_TEXTFILE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Prometheusのメトリクス名の接頭辞
+METRIC_PREFIX = 'dmm_daily_news'
+
+# レポートに含めるパーセンタイル
+QUANTILES = (0.5, 0.9, 0.99)
+
+# ラベルを (名前, 値) の組に正規化したもの
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    """最近傍順位法によるパーセンタイル（orderedは昇順）"""
+    if not ordered:
+        return 0.0
+    rank = math.ceil(q * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class Metrics:
+    """1回の実行のスパン（処理時間）とカウンターを記録するクラス"""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        """
+        Args:
+            enabled: Falseの場合は何も記録しない
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """記録を消去し、新しい実行として計測を始める"""
+        with self._lock:
+            self.run_id = datetime.now().strftime('%Y%m%d-%H%M%S')
+            self.started_at = time.time()
+            self._started = time.perf_counter()
+            self._spans: List[Dict[str, Any]] = []
+            self._durations: Dict[Tuple[str, Labels], List[float]] = defaultdict(list)
+            self._counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+            self._next_span_id = 1
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[Dict[str, Any]]:
+        """
+        処理時間を計測するスパン（with文で使用、入れ子にすると親子関係を記録する）
+
+        Args:
+            name: スパン名（例: 'scrape'、'line.push'）
+            **labels: 集計に使うラベル
+
+        Yields:
+            スパンの属性（処理中に 'bytes' などを追加できる）
+        """
+        if not self.enabled:
+            yield {}
+            return
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        with self._lock:
+            span_id = self._next_span_id
+            self._next_span_id += 1
+        attributes: Dict[str, Any] = {}
+        parent_id = stack[-1] if stack else None
+        stack.append(span_id)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attributes
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            record = {
+                'id': span_id,
+                'parent': parent_id,
+                'name': name,
+                'labels': {key: str(value) for key, value in labels.items()},
+                'start': start - self._started,
+                'duration': duration,
+                'thread': threading.current_thread().name,
+            }
+            if attributes:
+                record['attributes'] = attributes
+            if error:
+                record['error'] = error
+            with self._lock:
+                self._spans.append(record)
+                self._durations[(name, _labels(labels))].append(duration)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        カウンターを加算
+
+        Args:
+            name: カウンター名（例: 'http_requests'、'fallbacks'）
+            value: 加算する値
+            **labels: 集計に使うラベル
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, _labels(labels))] += value
+
+    def report(self, success: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        実行レポートを作成
+
+        Args:
+            success: 実行全体が成功したか
+
+        Returns:
+            スパンの集計・カウンター・個々のスパンを含む辞書
+        """
+        with self._lock:
+            spans = list(self._spans)
+            durations = {key: sorted(values) for key, values in self._durations.items()}
+            counters = dict(self._counters)
+
+        return {
+            'run_id': self.run_id,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'duration': time.perf_counter() - self._started,
+            'success': success,
+            'stages': [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': len(values),
+                    'total': sum(values),
+                    'max': values[-1],
+                    **{f'p{int(q * 100)}': _quantile(values, q) for q in QUANTILES},
+                }
+                for (name, labels), values in sorted(durations.items())
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+            'spans': sorted(spans, key=lambda span: span['start']),
+        }
+
+    def prometheus_text(self, report: Dict[str, Any]) -> str:
+        """
+        実行レポートをPrometheusのテキスト形式に変換
+
+        Args:
+            report: reportで作成した実行レポート
+
+        Returns:
+            textfile collectorで読み込めるテキスト
+        """
+        def format_labels(labels: Dict[str, str]) -> str:
+            if not labels:
+                return ''
+            escaped = [
+                '{}="{}"'.format(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                for key, value in sorted(labels.items())
+            ]
+            return '{' + ','.join(escaped) + '}'
+
+        lines = [
+            f'# HELP {METRIC_PREFIX}_last_run_timestamp_seconds 最後に実行した時刻',
+            f'# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge',
+            f'{METRIC_PREFIX}_last_run_timestamp_seconds {self.started_at:.3f}',
+            f'# HELP {METRIC_PREFIX}_last_run_duration_seconds 最後の実行の所要時間',
+            f'# TYPE {METRIC_PREFIX}_last_run_duration_seconds gauge',
+            f'{METRIC_PREFIX}_last_run_duration_seconds {report["duration"]:.6f}',
+        ]
+        if report['success'] is not None:
+            lines += [
+                f'# HELP {METRIC_PREFIX}_last_run_success 最後の実行が成功した場合1',
+                f'# TYPE {METRIC_PREFIX}_last_run_success gauge',
+                f'{METRIC_PREFIX}_last_run_success {int(bool(report["success"]))}',
+            ]
+
+        if report['stages']:
+            metric = f'{METRIC_PREFIX}_stage_duration_seconds'
+            lines += [f'# HELP {metric} 最後の実行のステージごとの処理時間', f'# TYPE {metric} summary']
+            for stage in report['stages']:
+                labels = {'stage': stage['name'], **stage['labels']}
+                for q in QUANTILES:
+                    quantile_labels = format_labels({**labels, 'quantile': str(q)})
+                    lines.append(f'{metric}{quantile_labels} {stage[f"p{int(q * 100)}"]:.6f}')
+                lines.append(f'{metric}_sum{format_labels(labels)} {stage["total"]:.6f}')
+                lines.append(f'{metric}_count{format_labels(labels)} {stage["count"]}')
+
+        by_name: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for counter in report['counters']:
+            by_name[counter['name']].append(counter)
+        for name, counters in sorted(by_name.items()):
+            metric = f'{METRIC_PREFIX}_{name}_total'
+            lines += [f'# HELP {metric} 最後の実行の{name}の合計', f'# TYPE {metric} counter']
+            for counter in counters:
+                lines.append(f'{metric}{format_labels(counter["labels"])} {counter["value"]:g}')
+
+        return '\n'.join(lines) + '\n'
+
+    def export(self, success: Optional[bool] = None, report_dir: str = METRICS_REPORT_DIR,
+               textfile_path: str = METRICS_TEXTFILE_PATH) -> Optional[Dict[str, Any]]:
+        """
+        JSONレポートとPrometheusのtextfileを書き出す
+
+        Args:
+            success: 実行全体が成功したか
+            report_dir: JSONレポートの保存先ディレクトリ（空の場合は書き出さない）
+            textfile_path: textfileのパス（空の場合は書き出さない）
+
+        Returns:
+            書き出した実行レポート（計測が無効な場合はNone）
+        """
+        if not self.enabled:
+            return None
+
+        report = self.report(success)
+        try:
+            if report_dir:
+                _write_atomic(
+                    os.path.join(report_dir, f'run-{self.run_id}.json'),
+                    json.dumps(report, ensure_ascii=False, indent=2)
+                )
+            if textfile_path:
+                _write_atomic(textfile_path, self.prometheus_text(report))
+        except OSError as e:
+            logger.warning("計測結果を書き出せませんでした: %s", e)
+        return report
+
+    def log_summary(self, report: Dict[str, Any]):
+        """ステージごとの合計時間をログに出力"""
+        totals: Dict[str, float] = defaultdict(float)
+        counts: Dict[str, int] = defaultdict(int)
+        for stage in report['stages']:
+            totals[stage['name']] += stage['total']
+            counts[stage['name']] += stage['count']
+        summary = '、'.join(f"{name} {totals[name]:.2f}秒/{counts[name]}回" for name in sorted(totals))
+        logger.info("処理時間（実行 %s、全体 %.2f秒）: %s", report['run_id'], report['duration'], summary)
+
+
+def _write_atomic(path: str, text: str):
+    """一時ファイルに書き込んでから置き換える（読み込み途中のファイルを読まれないようにする）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """
+    プロセス全体で共有する計測を取得
+
+    Returns:
+        共有Metrics
+    """
+    return _metrics
@@ -0,0 +1,255 @@
+"""
+複数のニュースソースを並列に取得してまとめるモジュール
+
+ソースごとにスレッドで取得し、届いたニュースをソースの指定順に1件ずつ交互に取り出して重複（正規化したURL・タイトル）を除く。
+順番のソースのニュースが届いていない場合は待たずに他のソースのニュースを返す。
+ソースごとに取得時間の上限を設け、上限を過ぎたソースの記事は待たずに打ち切るため、1つのソースが遅くても
+実行全体は止まらない。ホストごとの同時接続数とリクエストの間隔はすべてのソースで共有して制限する
+"""
+import importlib
+import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+from article_store import canonical_url
+from config import (
+    NEWS_SOURCES,
+    NEWS_FEEDS,
+    SOURCE_TIMEOUT,
+    SOURCE_TIMEOUTS,
+    SOURCE_HOST_DELAY,
+    SCRAPER_PER_HOST_CONCURRENCY,
+    HTTP_CACHE_ENABLED,
+)
+from metrics import get_metrics
+from news_source import HostLimiter, NewsSource
+
+logger = logging.getLogger(__name__)
+
+# ソースのスレッドから取得の終了を知らせる番兵
+_END = object()
+
+
+def _parse_pairs(value: str) -> Dict[str, str]:
+    """「名前=値」のカンマ区切りを辞書にする"""
+    pairs = {}
+    for item in value.split(','):
+        name, sep, setting = item.partition('=')
+        if sep and name.strip() and setting.strip():
+            pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+def _title_key(title: str) -> str:
+    return re.sub(r'\W+', ' ', title).strip().lower()
+
+
+class MultiSourceScraper(NewsSource):
+    """複数のニュースソースを並列に取得し、重複を除いてまとめるクラス"""
+
+    name = 'multi'
+
+    def __init__(self, sources: List[NewsSource], timeout: float = SOURCE_TIMEOUT):
+        """
+        Args:
+            sources: 取得するニュースソース（この順に1件ずつ交互にまとめる）
+            timeout: ソースごとの取得時間の上限（秒、ソースのtimeoutが指定されている場合はそちらを使う）
+        """
+        self.sources = sources
+        self.timeout = timeout
+
+    def iter_latest_news(self, count: int = 3) -> Iterator[Dict[str, str]]:
+        """
+        すべてのソースを並列に取得し、届いた順に返す
+
+        ニュースはソースの指定順に1件ずつ交互に返すが、順番のソースのニュースがまだ届いていない場合は
+        待たずに他のソースのニュースを返す
+
+        どのソースからも取得できなかった場合は、最初のソースのフォールバックニュースを返す
+
+        Args:
+            count: 取得するニュース数（すべてのソースの合計）
+
+        Yields:
+            ニュース（title, url, content, dateを含む）
+        """
+        # すべてのソースのスレッドが (ソースの番号, ニュース) を1つのキューに入れる
+        results: queue.Queue = queue.Queue()
+        started = time.monotonic()
+        deadlines = {}
+        for index, source in enumerate(self.sources):
+            threading.Thread(
+                target=self._crawl,
+                args=(index, source, count, results),
+                name=f'source-{source.name}',
+                daemon=True
+            ).start()
+            timeout = source.timeout if source.timeout is not None else self.timeout
+            deadlines[index] = started + timeout
+
+        metrics = get_metrics()
+        # 受け取ったが返していないニュース（ソースごと）。複数のソースのニュースがあるときの順番を決めるためだけに使う
+        pending: Dict[int, deque] = {index: deque() for index in deadlines}
+        seen = set()
+        yielded = 0
+        next_index = 0
+        while yielded < count:
+            self._receive(results, deadlines, pending)
+            self._expire(deadlines)
+
+            ready = [index for index, items in pending.items() if items]
+            if not ready:
+                if not deadlines:
+                    break
+                # どのソースのニュースもない場合は、最も早い上限まで次のニュースを待つ
+                wait = max(0.0, min(deadlines.values()) - time.monotonic())
+                try:
+                    index, news = results.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                self._accept(index, news, deadlines, pending)
+                continue
+
+            # 前回返したソースの次から順に、ニュースのあるソースを選ぶ
+            index = min(ready, key=lambda i: (i - next_index) % len(self.sources))
+            next_index = index + 1
+            news = pending[index].popleft()
+            source = self.sources[index]
+
+            keys = {canonical_url(news['url']), _title_key(news['title'])}
+            if keys & seen:
+                logger.info("他のソースと重複するためスキップします: %s, %s", source.name, news['title'])
+                metrics.increment('source_duplicates', source=source.name)
+                continue
+            seen |= keys
+
+            yielded += 1
+            metrics.increment('source_news', source=source.name)
+            yield news
+
+        if not yielded:
+            yield from self.fallback_news(count)
+
+    def _receive(self, results: queue.Queue, deadlines: Dict[int, float], pending: Dict[int, deque]):
+        """キューに届いているニュースを待たずにすべて受け取る"""
+        while True:
+            try:
+                index, news = results.get_nowait()
+            except queue.Empty:
+                return
+            self._accept(index, news, deadlines, pending)
+
+    def _accept(self, index: int, news, deadlines: Dict[int, float], pending: Dict[int, deque]):
+        """受け取ったニュースをソースごとに振り分ける（打ち切ったソースのものは捨てる）"""
+        if index not in deadlines:
+            return
+        if news is _END:
+            del deadlines[index]
+        else:
+            pending[index].append(news)
+
+    def _expire(self, deadlines: Dict[int, float]):
+        """取得時間の上限を過ぎたソースを打ち切る（受け取り済みのニュースは返す）"""
+        now = time.monotonic()
+        for index, deadline in list(deadlines.items()):
+            if deadline <= now:
+                source = self.sources[index]
+                logger.warning("ニュースソースの取得が時間内に終わらなかったため打ち切ります: %s", source.name)
+                get_metrics().increment('source_timeouts', source=source.name)
+                del deadlines[index]
+
+    def _crawl(self, index: int, source: NewsSource, count: int, results: queue.Queue):
+        """1つのソースを取得し、取得でき次第 (ソースの番号, ニュース) を共有のキューに入れる"""
+        try:
+            with get_metrics().span('source', source=source.name):
+                for news in source.iter_latest_news(count):
+                    results.put((index, news))
+        except Exception as e:
+            logger.error("ニュースソースの取得中にエラーが発生: %s, %s", source.name, e, exc_info=True)
+        finally:
+            results.put((index, _END))
+
+    def fallback_news(self, count: int) -> List[Dict[str, str]]:
+        return self.sources[0].fallback_news(count) if self.sources else []
+
+
+def create_source(name: str, host_limiter: Optional[HostLimiter] = None, http_cache=None,
+                  fallback: bool = True) -> NewsSource:
+    """
+    名前からニュースソースを生成
+
+    Args:
+        name: dmm、NEWS_FEEDSで定義した名前、または「モジュール名:クラス名」（NewsSourceのサブクラス）
+        host_limiter: ホストごとの同時接続数・リクエスト間隔の制限
+        http_cache: 条件付きGETキャッシュ（同じディレクトリを複数のインスタンスで開かないよう共有する）
+        fallback: 1件も取得できない場合にサンプルニュースを返すか（DMM英会話のみ）
+
+    Returns:
+        NewsSource
+
+    Raises:
+        ValueError: 不明なソース名の場合
+        TypeError: 独自のソースがNewsSourceのメソッドを実装していない場合
+    """
+    timeouts = _parse_pairs(SOURCE_TIMEOUTS)
+    if name == 'dmm':
+        from dmm_scraper import DMMNewsScraper
+        source = DMMNewsScraper(http_cache=http_cache, host_limiter=host_limiter, fallback=fallback)
+    elif name in _parse_pairs(NEWS_FEEDS):
+        from feed_source import FeedNewsSource
+        source = FeedNewsSource(name, _parse_pairs(NEWS_FEEDS)[name], http_cache=http_cache, host_limiter=host_limiter)
+    elif ':' in name:
+        module_name, _, class_name = name.partition(':')
+        source_class = getattr(importlib.import_module(module_name), class_name)
+        if not (isinstance(source_class, type) and issubclass(source_class, NewsSource)):
+            raise ValueError(f"NewsSourceのサブクラスではありません: {name}")
+        source = source_class()
+    else:
+        raise ValueError(f"不明なニュースソースです: {name}")
+
+    if source.name in timeouts:
+        source.timeout = float(timeouts[source.name])
+    return source
+
+
+def create_scraper(names: str = NEWS_SOURCES) -> NewsSource:
+    """
+    NEWS_SOURCESに従ってニュースの取得元を生成
+
+    ソースが1つの場合はそのソースをそのまま返す（従来のDMMNewsScraperと同じ動作）
+
+    Args:
+        names: ニュースソース名のカンマ区切り
+
+    Returns:
+        NewsSource
+    """
+    names = [name.strip() for name in names.split(',') if name.strip()] or ['dmm']
+    host_limiter = HostLimiter(SCRAPER_PER_HOST_CONCURRENCY, SOURCE_HOST_DELAY)
+    if len(names) == 1:
+        try:
+            return create_source(names[0], host_limiter)
+        except (ImportError, AttributeError, ValueError, TypeError) as e:
+            logger.error("ニュースソースを生成できませんでした。DMM英会話から取得します: %s", e)
+            return create_source('dmm', host_limiter)
+
+    # HTTPキャッシュと接続の制限はすべてのソースで共有する
+    http_cache = None
+    if HTTP_CACHE_ENABLED:
+        from http_cache import HttpCache
+        http_cache = HttpCache()
+
+    sources = []
+    for name in dict.fromkeys(names):
+        try:
+            sources.append(create_source(name, host_limiter, http_cache, fallback=False))
+        except (ImportError, AttributeError, ValueError, TypeError) as e:
+            logger.warning("ニュースソースを生成できないためスキップします: %s, %s", name, e)
+    if not sources:
+        sources.append(create_source('dmm', host_limiter, http_cache, fallback=False))
+    logger.info("%s個のニュースソースから取得します: %s", len(sources), ', '.join(s.name for s in sources))
+    return MultiSourceScraper(sources)
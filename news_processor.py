@@ -4,17 +4,86 @@ Vercel API経由でOpenAI APIを呼び出す
 """
 import requests
 import logging
-from typing import List, Dict
-from config import VERCEL_API_URL
+from typing import Any, List, Dict, Optional
+from config import (
+    VERCEL_API_URL,
+    RESULT_CACHE_ENABLED,
+    BATCH_API_ENABLED,
+    BATCH_API_MAX_ARTICLES,
+    VERCEL_BATCH_TIMEOUTS,
+    SUMMARIZER_CONDENSE_ENABLED,
+    SUMMARIZER_CONDENSE_CHARS,
+    PHRASE_INDEX_ENABLED,
+    PHRASE_REFILL_ATTEMPTS,
+)
+from article_store import canonical_url
+from http_client import HttpClient, get_http_client
+from metrics import get_metrics
+from phrase_index import PhraseIndex, get_phrase_index
+from resilience import ResilientCaller
+from result_cache import ResultCache
+from summarizer import ExtractiveSummarizer
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Vercel APIが使えない場合のサンプルフレーズ（フレーズインデックスが有効な場合は未配信のものから選ぶ）
+SAMPLE_PHRASES = [
+    "From my perspective - 私の見解では",
+    "It is worth noting that - 注目すべきは",
+    "This raises the question of - これは～という疑問を提起する",
+    "To put it differently - 言い換えれば",
+    "This underscores the importance of - これは～の重要性を強調している",
+    "A compelling argument - 説得力のある議論",
+    "To delve deeper into - より深く掘り下げる",
+    "This phenomenon can be attributed to - この現象は～に起因すると考えられる",
+    "It is imperative that - ～することが不可欠である",
+    "This warrants further investigation - これはさらなる調査が必要である",
+    "On the flip side - その反面",
+    "There is a growing consensus that - ～という見方が広がりつつある",
+    "It remains to be seen whether - ～かどうかはまだわからない",
+    "This could have far-reaching implications - これは広範な影響を及ぼしうる",
+    "To play devil's advocate - あえて反対の立場から言うと",
+    "A double-edged sword - 諸刃の剣",
+    "Strike a balance between - ～の間でバランスを取る",
+    "In light of recent developments - 最近の動向を踏まえると",
+    "This sheds light on - これは～を浮き彫りにする",
+    "It goes without saying that - ～は言うまでもない",
+    "Be at odds with - ～と食い違っている",
+    "A step in the right direction - 正しい方向への一歩",
+    "Raise concerns about - ～について懸念を示す",
+    "By and large - 概して",
+    "Weigh the pros and cons - 長所と短所を比較検討する",
+    "Pave the way for - ～への道を開く",
+    "Come under scrutiny - 厳しい目にさらされる",
+    "A wake-up call - 警鐘",
+    "Bridge the gap between - ～の溝を埋める",
+    "Take into account - ～を考慮に入れる",
+]
+
 
 class NewsProcessor:
     """ニュースを処理して要約とフレーズを生成するクラス"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[HttpClient] = None, result_cache: Optional[ResultCache] = None,
+                 caller: Optional[ResilientCaller] = None, phrase_index: Optional[PhraseIndex] = None):
+        """
+        Args:
+            http_client: 使用するHTTPクライアント（省略時は共有クライアント）
+            result_cache: APIの結果キャッシュ（省略時は設定に従って生成）
+            caller: API呼び出しの再試行・サーキットブレーカー（省略時は設定に従って生成、
+                実行ごとの期限はこのインスタンスの生成時から数える）
+            phrase_index: 配信済みのフレーズのインデックス（省略時は設定に従って共有のものを使う）
+        """
+        self.http = http_client or get_http_client()
+        self.api = caller or ResilientCaller(self.http)
+        self.summarizer = ExtractiveSummarizer()
+        if result_cache is None and RESULT_CACHE_ENABLED:
+            result_cache = ResultCache()
+        self.result_cache = result_cache
+        if phrase_index is None and PHRASE_INDEX_ENABLED:
+            phrase_index = get_phrase_index()
+        self.phrase_index = phrase_index
+        self._batch_supported = BATCH_API_ENABLED
         self.vercel_api_url = VERCEL_API_URL.rstrip('/') if VERCEL_API_URL else None
         if not self.vercel_api_url:
             logger.warning("VERCEL_API_URLが設定されていません。Vercel APIを使用できません。")
@@ -29,41 +98,40 @@ class NewsProcessor:
         Returns:
             要約されたテキスト
         """
-        if not self.vercel_api_url:
-            logger.warning("Vercel API URLが設定されていないため、簡易要約を返します")
-            return self._simple_summary(news['content'])
-        
-        try:
-            url = f"{self.vercel_api_url}/api/summarize"
-            payload = {
-                "title": news['title'],
-                "content": news['content'][:3000]
-            }
+        with get_metrics().span('summarize'):
+            if not self.vercel_api_url:
+                logger.warning("Vercel API URLが設定されていないため、簡易要約を返します")
+                return self._simple_summary(news['content'])
             
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
+            try:
+                payload = {
+                    "title": news['title'],
+                    "content": self._api_content(news['content'])
+                }
             
-            result = response.json()
-            summary = result.get('summary', '')
+                result = self._post_api('/api/summarize', payload, 'summary')
+                summary = result.get('summary', '')
             
-            if summary:
-                logger.info(f"要約を生成しました（{len(summary)}文字）")
-                return summary
-            else:
-                logger.warning("要約が空でした。簡易要約を返します")
-                return self._simple_summary(news['content'])
+                if summary:
+                    logger.info("要約を生成しました（%s文字）", len(summary))
+                    return summary
+                else:
+                    logger.warning("要約が空でした。簡易要約を返します")
+                    return self._simple_summary(news['content'])
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"要約生成API呼び出し中にエラー: {e}")
-            return self._simple_summary(news['content'])
-        except Exception as e:
-            logger.error(f"要約生成中にエラー: {e}")
-            return self._simple_summary(news['content'])
+            except requests.exceptions.RequestException as e:
+                logger.error("要約生成API呼び出し中にエラー: %s", e)
+                return self._simple_summary(news['content'])
+            except Exception as e:
+                logger.error("要約生成中にエラー: %s", e)
+                return self._simple_summary(news['content'])
     
     def generate_advanced_phrases(self, news: Dict[str, str], summary: str, count: int = 10) -> List[str]:
         """
         Advancedレベルの英語フレーズ、表現、単語を生成（Vercel API経由）
         
+        過去に別の記事で配信したフレーズは除き、不足分は追加で生成する
+        
         Args:
             news: ニュース辞書
             summary: ニュースの要約
@@ -72,37 +140,166 @@ class NewsProcessor:
         Returns:
             フレーズのリスト
         """
-        if not self.vercel_api_url:
-            logger.warning("Vercel API URLが設定されていないため、サンプルフレーズを返します")
-            return self._get_sample_phrases(count)
+        with get_metrics().span('phrases'):
+            if not self.vercel_api_url:
+                logger.warning("Vercel API URLが設定されていないため、サンプルフレーズを返します")
+                return self._get_sample_phrases(count, news)
+            
+            try:
+                payload = {
+                    "title": news['title'],
+                    "summary": summary,
+                    "count": count
+                }
+            
+                result = self._post_api('/api/phrases', payload, 'phrases')
+                phrases = result.get('phrases', [])
+            
+                if phrases:
+                    logger.info("%s個のフレーズを生成しました", len(phrases))
+                    return self._select_fresh_phrases(news, summary, phrases, count)
+                else:
+                    logger.warning("フレーズが空でした。サンプルフレーズを返します")
+                    return self._get_sample_phrases(count, news)
+            
+            except requests.exceptions.RequestException as e:
+                logger.error("フレーズ生成API呼び出し中にエラー: %s", e)
+                return self._get_sample_phrases(count, news)
+            except Exception as e:
+                logger.error("フレーズ生成中にエラー: %s", e)
+                return self._get_sample_phrases(count, news)
+    
+    def process_news_batch(self, news_list: List[Dict[str, str]], count: int = 10) -> List[Dict[str, Any]]:
+        """
+        複数のニュースの要約とフレーズを一括生成（/api/batch経由）
         
-        try:
-            url = f"{self.vercel_api_url}/api/phrases"
+        一括処理APIが使えない場合や一部のニュースが失敗した場合は、
+        該当ニュースのみsummarize_news / generate_advanced_phrasesで個別に処理する
+        
+        Args:
+            news_list: ニュース辞書のリスト
+            count: ニュース1件あたりのフレーズ数
+            
+        Returns:
+            ニュースと同じ順序の結果リスト（summary, phrasesを含む）
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(news_list)
+        
+        if self.vercel_api_url and self._batch_supported:
+            indexed = list(enumerate(news_list))
+            for start in range(0, len(indexed), BATCH_API_MAX_ARTICLES):
+                chunk = indexed[start:start + BATCH_API_MAX_ARTICLES]
+                self._process_batch_chunk(chunk, count, results)
+                if not self._batch_supported:
+                    break
+        
+        for i, news in enumerate(news_list):
+            if results[i] is None:
+                summary = self.summarize_news(news)
+                phrases = self.generate_advanced_phrases(news, summary, count)
+                results[i] = {'summary': summary, 'phrases': phrases}
+        
+        return results
+    
+    def _process_batch_chunk(self, chunk: List[tuple], count: int, results: List[Optional[Dict[str, Any]]]):
+        """
+        一括処理APIを1回呼び出し、成功したニュースの結果をresultsに格納
+        
+        Args:
+            chunk: (インデックス, ニュース辞書) のリスト
+            count: ニュース1件あたりのフレーズ数
+            results: 結果を格納するリスト
+        """
+        pending = []
+        news_by_index = dict(chunk)
+        for i, news in chunk:
             payload = {
                 "title": news['title'],
-                "summary": summary,
+                "content": self._api_content(news['content']),
                 "count": count
             }
+            cached = self._cached_result('/api/batch', payload)
+            if cached is not None:
+                results[i] = self._with_fresh_phrases(news, cached, count)
+            else:
+                pending.append((i, payload))
+        
+        if not pending:
+            logger.info("キャッシュされた結果を使用します: /api/batch")
+            return
+        
+        try:
+            with get_metrics().span('batch') as span:
+                span['articles'] = len(pending)
+                response = self.api.post(
+                    f"{self.vercel_api_url}/api/batch",
+                    '/api/batch',
+                    {
+                        "articles": [{"title": p['title'], "content": p['content']} for _, p in pending],
+                        "count": count
+                    },
+                    timeouts=VERCEL_BATCH_TIMEOUTS
+                )
+            
+            if response.status_code in (404, 405):
+                # 一括処理APIがデプロイされていない場合は以降も個別処理にする
+                logger.warning("一括処理APIが利用できません。ニュースごとに処理します")
+                self._batch_supported = False
+                return
             
-            response = requests.post(url, json=payload, timeout=30)
             response.raise_for_status()
+            items = response.json().get('results', [])
             
-            result = response.json()
-            phrases = result.get('phrases', [])
+            for (i, payload), item in zip(pending, items):
+                if item.get('summary') and item.get('phrases'):
+                    result = {'summary': item['summary'], 'phrases': item['phrases'][:count]}
+                    if self.result_cache is not None:
+                        self.result_cache.set('/api/batch', payload, result)
+                    results[i] = self._with_fresh_phrases(news_by_index[i], result, count)
+                else:
+                    logger.warning("一括処理で結果が得られませんでした: %s, %s", payload['title'], item.get('error', ''))
             
-            if phrases:
-                logger.info(f"{len(phrases)}個のフレーズを生成しました")
-                return phrases[:count]
-            else:
-                logger.warning("フレーズが空でした。サンプルフレーズを返します")
-                return self._get_sample_phrases(count)
+            logger.info("一括処理で%s件のニュースを処理しました", sum(1 for i, _ in pending if results[i] is not None))
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"フレーズ生成API呼び出し中にエラー: {e}")
-            return self._get_sample_phrases(count)
+            logger.error("一括処理API呼び出し中にエラー: %s", e)
         except Exception as e:
-            logger.error(f"フレーズ生成中にエラー: {e}")
-            return self._get_sample_phrases(count)
+            logger.error("一括処理中にエラー: %s", e)
+    
+    def _cached_result(self, endpoint: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """結果キャッシュを参照（HTTPのやり取りを記録中の場合は、再生時に同じ結果を返せるよう記録に添える）"""
+        if self.result_cache is None:
+            return None
+        cached = self.result_cache.get(endpoint, payload)
+        recorder = getattr(self.http, 'recorder', None)
+        if cached is not None and recorder is not None:
+            recorder.attach_cached_result(endpoint, payload, cached)
+        return cached
+    
+    def _post_api(self, endpoint: str, payload: Dict[str, Any], result_key: str) -> Dict[str, Any]:
+        """
+        Vercel APIを呼び出す（同一リクエストの結果はキャッシュから返す）
+        
+        Args:
+            endpoint: APIのパス（例: /api/summarize）
+            payload: リクエストのJSONボディ
+            result_key: レスポンス中の結果のキー（空の結果はキャッシュしない）
+            
+        Returns:
+            APIのレスポンス
+        """
+        cached = self._cached_result(endpoint, payload)
+        if cached is not None:
+            logger.info("キャッシュされた結果を使用します: %s", endpoint)
+            return cached
+        
+        response = self.api.post(f"{self.vercel_api_url}{endpoint}", endpoint, payload)
+        response.raise_for_status()
+        result = response.json()
+        
+        if self.result_cache is not None and result.get(result_key):
+            self.result_cache.set(endpoint, payload, result)
+        return result
     
     def _parse_phrases(self, text: str) -> List[str]:
         """生成されたテキストからフレーズを抽出"""
@@ -124,52 +321,113 @@ class NewsProcessor:
         
         return phrases if phrases else [text]  # パースに失敗した場合は全体を返す
     
-    def _generate_additional_phrases(self, news: Dict[str, str], summary: str, count: int) -> List[str]:
-        """追加のフレーズを生成（Vercel API経由）"""
+    def _generate_additional_phrases(self, news: Dict[str, str], summary: str, count: int,
+                                     exclude: Optional[List[str]] = None) -> List[str]:
+        """
+        追加のフレーズを生成（Vercel API経由）
+        
+        Args:
+            news: ニュース辞書
+            summary: ニュースの要約
+            count: 生成するフレーズ数
+            exclude: 生成結果に含めないフレーズ（リクエストが変わるため、結果キャッシュの同じ結果も返らない）
+            
+        Returns:
+            フレーズのリスト（生成できなかった場合は空）
+        """
         if not self.vercel_api_url:
             return []
         
         try:
-            url = f"{self.vercel_api_url}/api/phrases"
             payload = {
                 "title": news['title'],
                 "summary": summary,
-                "count": count
+                "count": count,
+                "exclude": exclude or []
             }
             
-            response = requests.post(url, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
+            result = self._post_api('/api/phrases', payload, 'phrases')
             phrases = result.get('phrases', [])
             return phrases[:count]
             
         except Exception as e:
-            logger.warning(f"追加フレーズ生成中にエラー: {e}")
+            logger.warning("追加フレーズ生成中にエラー: %s", e)
             return []
     
+    def _select_fresh_phrases(self, news: Dict[str, str], summary: str, phrases: List[str], count: int) -> List[str]:
+        """
+        過去に別の記事で配信したフレーズ（この実行で別の記事に予約したものを含む）を除き、不足分を_generate_additional_phrasesで補う
+
+        選んだフレーズは予約するだけで、インデックスへの記録は配信に成功した時点で行う
+        
+        Args:
+            news: ニュース辞書
+            summary: ニュースの要約
+            phrases: 生成されたフレーズ
+            count: フレーズ数
+            
+        Returns:
+            未配信のフレーズ（最大count件、追加生成しても1件も得られない場合は生成されたフレーズをそのまま使う）
+        """
+        if self.phrase_index is None:
+            return phrases[:count]
+        
+        source = canonical_url(news.get('url', ''))
+        selected = self.phrase_index.reserve(phrases, source, count)
+        # 除いた件数は追加生成で補う前の選択結果から数える
+        repeated = len(phrases[:count]) - len(selected)
+        requested = list(phrases)
+        metrics = get_metrics()
+        
+        for _ in range(PHRASE_REFILL_ATTEMPTS):
+            shortfall = count - len(selected)
+            if shortfall <= 0:
+                break
+            additional = self._generate_additional_phrases(news, summary, shortfall, exclude=requested)
+            if not additional:
+                break
+            requested += additional
+            refilled = self.phrase_index.reserve(additional, source, shortfall)
+            selected += refilled
+            metrics.increment('phrases_refilled', len(refilled))
+        
+        if repeated > 0:
+            metrics.increment('phrases_repeated', repeated)
+            if not selected:
+                logger.warning("未配信のフレーズがないため、配信済みのフレーズを使用します: %s", news['title'])
+                return phrases[:count]
+            logger.info("配信済みのフレーズを%s件除きました: %s", repeated, news['title'])
+        return selected
+    
+    def _with_fresh_phrases(self, news: Dict[str, str], result: Dict[str, Any], count: int) -> Dict[str, Any]:
+        """一括処理の結果のフレーズを未配信のものにする（キャッシュの値は変更しない）"""
+        return dict(result, phrases=self._select_fresh_phrases(news, result['summary'], result['phrases'], count))
+    
+    def _api_content(self, content: str) -> str:
+        """Vercel APIに送る本文（設定に従い重要な文だけに圧縮し、プロンプトのトークン数を減らす）"""
+        if SUMMARIZER_CONDENSE_ENABLED:
+            return self.summarizer.condense(content, SUMMARIZER_CONDENSE_CHARS)
+        return content[:3000]
+    
     def _simple_summary(self, content: str) -> str:
-        """簡易要約（OpenAI APIが使えない場合）"""
-        # 最初の200文字を要約として使用
+        """簡易要約（OpenAI APIが使えない場合、本文から重要な文を抽出）"""
+        get_metrics().increment('fallbacks', kind='summary')
+        summary = self.summarizer.summarize(content)
+        if summary:
+            return summary
+        
+        # 文に分割できない場合は最初の50語を要約として使用
         words = content.split()
         summary = ' '.join(words[:50])
         if len(words) > 50:
             summary += "..."
         return summary
     
-    def _get_sample_phrases(self, count: int) -> List[str]:
-        """サンプルフレーズ（テスト用）"""
-        sample_phrases = [
-            "From my perspective - 私の見解では",
-            "It is worth noting that - 注目すべきは",
-            "This raises the question of - これは～という疑問を提起する",
-            "To put it differently - 言い換えれば",
-            "This underscores the importance of - これは～の重要性を強調している",
-            "A compelling argument - 説得力のある議論",
-            "To delve deeper into - より深く掘り下げる",
-            "This phenomenon can be attributed to - この現象は～に起因すると考えられる",
-            "It is imperative that - ～することが不可欠である",
-            "This warrants further investigation - これはさらなる調査が必要である"
-        ]
-        return sample_phrases[:count]
-
+    def _get_sample_phrases(self, count: int, news: Optional[Dict[str, str]] = None) -> List[str]:
+        """サンプルフレーズ（テスト用、newsを指定した場合は未配信のものを優先する）"""
+        get_metrics().increment('fallbacks', kind='phrases')
+        if self.phrase_index is not None and news is not None:
+            fresh = self.phrase_index.reserve(SAMPLE_PHRASES, canonical_url(news.get('url', '')), count)
+            # 未配信のものが足りない場合は配信済みのサンプルで補う（常にcount件にする）
+            return fresh + [phrase for phrase in SAMPLE_PHRASES if phrase not in fresh][:count - len(fresh)]
+        return SAMPLE_PHRASES[:count]
@@ -0,0 +1,116 @@
+"""
+ニュースソースの共通インターフェースモジュール
+
+ニュースソースは最新のニュースを {'title', 'url', 'content', 'date'} の辞書として返す。
+DMM英会話のDaily News（dmm_scraper.DMMNewsScraper）のほか、RSS/Atomフィード（feed_source.FeedNewsSource）や
+独自のソース（NEWS_SOURCESに「モジュール名:クラス名」で指定）を multi_source.MultiSourceScraper でまとめて取得する
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+
+class NewsSource(ABC):
+    """ニュースソースの基底クラス（iter_latest_newsを実装していないサブクラスは生成時にTypeError）"""
+
+    # ソース名（ログ・計測・NEWS_SOURCESでの指定に使用）
+    name = 'source'
+
+    # ソースごとの取得時間の上限（秒、Noneの場合はSOURCE_TIMEOUT）
+    timeout: Optional[float] = None
+
+    @abstractmethod
+    def iter_latest_news(self, count: int = 3) -> Iterator[Dict[str, str]]:
+        """
+        最新のニュースを取得でき次第返す
+
+        Args:
+            count: 取得するニュース数
+
+        Yields:
+            ニュース（title, url, content, dateを含む）
+        """
+        raise NotImplementedError
+
+    def get_latest_news(self, count: int = 3) -> List[Dict[str, str]]:
+        """
+        最新のニュースを取得
+
+        Args:
+            count: 取得するニュース数
+
+        Returns:
+            ニュースのリスト（title, url, content, dateを含む）
+        """
+        return list(self.iter_latest_news(count))
+
+    def fallback_news(self, count: int) -> List[Dict[str, str]]:
+        """どのソースからもニュースを取得できなかった場合に使うニュース（ない場合は空のリスト）"""
+        return []
+
+
+class HostThrottle:
+    """同じホストへのリクエストの間隔を一定以上空けるクラス（複数スレッドから呼び出せる）"""
+
+    def __init__(self, interval: float):
+        """
+        Args:
+            interval: 同じホストへのリクエストの最小間隔（秒）
+        """
+        self.interval = interval
+        self._next_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """
+        URLのホストに次のリクエストを送れるまで待機
+
+        Args:
+            url: これからリクエストするURL
+        """
+        if self.interval <= 0:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at.get(host, now))
+            self._next_at[host] = start_at + self.interval
+        if start_at > now:
+            time.sleep(start_at - now)
+
+
+class HostLimiter:
+    """ホストごとの同時接続数とリクエストの間隔を制限するクラス（複数のニュースソースで共有できる）"""
+
+    def __init__(self, per_host_limit: int, interval: float = 0.0):
+        """
+        Args:
+            per_host_limit: 同じホストへの同時接続数の上限
+            interval: 同じホストへのリクエストの最小間隔（秒）
+        """
+        self.per_host_limit = max(1, per_host_limit)
+        self.throttle = HostThrottle(interval)
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def limit(self, url: str):
+        """
+        URLのホストへの接続枠を確保し、リクエストの間隔を空けてから処理を実行する
+
+        Args:
+            url: これからリクエストするURL
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._semaphores[host] = semaphore
+
+        with semaphore:
+            self.throttle.wait(url)
+            yield
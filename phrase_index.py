@@ -0,0 +1,217 @@
+"""
+配信したフレーズを記録し、別の記事で同じフレーズを繰り返さないようにするインデックスモジュール
+正規化したフレーズのハッシュ（64ビット）をキーにSQLiteへ保存し、存在確認はメモリ上の集合で行う。
+生成時はインデックスと実行中の予約を確認するだけにし、インデックスへは配信に成功したフレーズだけを記録する
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from article_store import canonical_url
+from config import PHRASE_INDEX_ENABLED, PHRASE_INDEX_PATH
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS phrases (
+    digest INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    phrase TEXT NOT NULL,
+    source TEXT,
+    created_at TEXT NOT NULL
+)
+"""
+
+# フレーズと日本語の説明の区切り（例: "From my perspective - 私の見解では"）
+_GLOSS_SEPARATOR = re.compile(r'\s+[-–—]\s+')
+_WHITESPACE = re.compile(r'\s+')
+_APOSTROPHES = re.compile(r"['’]")
+
+# 1回のクエリで指定するハッシュの数の上限（SQLiteの変数の上限より小さくする）
+_QUERY_CHUNK = 500
+
+
+def normalize_phrase(phrase: str) -> str:
+    """
+    フレーズを比較用に正規化（日本語の説明・大文字小文字・記号・余分な空白を除去）
+
+    Args:
+        phrase: 生成されたフレーズ（例: "It is worth noting that - 注目すべきは"）
+
+    Returns:
+        正規化したキー（例: "it is worth noting that"）
+    """
+    text = unicodedata.normalize('NFKC', phrase)
+    text = _APOSTROPHES.sub('', _GLOSS_SEPARATOR.split(text, 1)[0])
+    text = ''.join(' ' if unicodedata.category(c)[0] in 'PS' else c for c in text.lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def phrase_digest(key: str) -> int:
+    """正規化したキーの64ビットハッシュ（SQLiteのINTEGERに収まる符号付き整数）"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+class PhraseIndex:
+    """配信したフレーズを記事ごとに記録するインデックス（複数スレッドから呼び出せる）"""
+
+    def __init__(self, path: str = PHRASE_INDEX_PATH):
+        """
+        Args:
+            path: SQLiteデータベースのパス
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(SCHEMA)
+        self._digests: Optional[Set[int]] = None
+        # この実行の中で処理した記事に予約したフレーズ（ハッシュ → 記事のURL、配信前のため記録していないもの）
+        self._reserved: Dict[int, str] = {}
+
+    def reserve(self, phrases: Iterable[str], source: str, limit: int) -> List[str]:
+        """
+        まだ配信していないフレーズを最大limit件選び、この実行の中でsourceの記事のものとして予約
+
+        インデックスへは書き込まない（配信に成功したらrecordで記録する）。同じ記事で以前に記録・予約した
+        フレーズは配信していないものとして扱う（同じ記事の再処理で除外しない）。選択と予約を同じロックの中で
+        行うため、並列に処理している記事どうしでも同じフレーズを選ばない
+
+        Args:
+            phrases: 候補のフレーズ（優先する順）
+            source: フレーズを配信する記事のURL
+            limit: 選ぶフレーズ数の上限
+
+        Returns:
+            選んだフレーズ（候補の順序のまま）
+        """
+        candidates = self._candidates(phrases)
+        with self._lock:
+            digests = self._load_digests()
+            known = [digest for digest in candidates if digest in digests]
+            owners = self._sources(known) if known else {}
+
+            selected = []
+            for digest, (_, phrase) in candidates.items():
+                if len(selected) >= limit:
+                    break
+                if digest in digests and owners.get(digest) != source:
+                    continue
+                if self._reserved.get(digest, source) != source:
+                    continue
+                selected.append(phrase)
+                self._reserved[digest] = source
+        return selected
+
+    def record(self, phrases: Iterable[str], source: str):
+        """
+        配信したフレーズをsourceの記事のものとして記録（記録済みのフレーズは変更しない）
+
+        Args:
+            phrases: 配信したフレーズ
+            source: フレーズを配信した記事のURL
+        """
+        candidates = self._candidates(phrases)
+        if not candidates:
+            return
+        now = datetime.now().isoformat()
+        records = [(digest, key, phrase, source, now) for digest, (key, phrase) in candidates.items()]
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO phrases (digest, key, phrase, source, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)", records
+                    )
+            except sqlite3.Error as e:
+                logger.warning("フレーズインデックスへの記録に失敗しました: %s", e)
+                return
+            self._load_digests().update(candidates)
+            for digest in candidates:
+                self._reserved.pop(digest, None)
+
+    def contains(self, phrase: str) -> bool:
+        """フレーズ（正規化後）が記録済みか"""
+        key = normalize_phrase(phrase)
+        with self._lock:
+            return bool(key) and phrase_digest(key) in self._load_digests()
+
+    def count(self) -> int:
+        """記録済みのフレーズ数"""
+        with self._lock:
+            return len(self._load_digests())
+
+    def close(self):
+        """データベース接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _candidates(phrases: Iterable[str]) -> Dict[int, tuple]:
+        """フレーズを正規化したキーのハッシュごとにまとめる（最初のものを使う）"""
+        candidates: Dict[int, tuple] = {}
+        for phrase in phrases:
+            key = normalize_phrase(phrase)
+            if key:
+                candidates.setdefault(phrase_digest(key), (key, phrase))
+        return candidates
+
+    def _load_digests(self) -> Set[int]:
+        """記録済みのハッシュの集合（初回のみデータベースから読み込む、ロック取得済みで呼び出す）"""
+        if self._digests is None:
+            self._digests = {row[0] for row in self._conn.execute("SELECT digest FROM phrases")}
+        return self._digests
+
+    def _sources(self, digests: List[int]) -> Dict[int, str]:
+        """記録済みのフレーズを配信した記事（ロック取得済みで呼び出す）"""
+        owners = {}
+        for start in range(0, len(digests), _QUERY_CHUNK):
+            chunk = digests[start:start + _QUERY_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT digest, source FROM phrases WHERE digest IN ({','.join('?' * len(chunk))})", chunk
+            )
+            owners.update(rows)
+        return owners
+
+
+_shared_index: Optional[PhraseIndex] = None
+_shared_index_lock = threading.Lock()
+
+
+def get_phrase_index() -> Optional[PhraseIndex]:
+    """
+    プロセス全体で共有するフレーズインデックスを取得（生成時の予約と配信時の記録で同じものを使う）
+
+    Returns:
+        共有PhraseIndex（PHRASE_INDEX_ENABLEDが無効の場合はNone）
+    """
+    global _shared_index
+    if not PHRASE_INDEX_ENABLED:
+        return None
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                _shared_index = PhraseIndex()
+    return _shared_index
+
+
+def record_delivered(news_data: dict):
+    """
+    配信に成功したニュースのフレーズをインデックスに記録
+
+    Args:
+        news_data: 配信したニュースデータ（url, phrasesを含む）
+    """
+    index = get_phrase_index()
+    if index is not None:
+        index.record(news_data.get('phrases') or [], canonical_url(news_data.get('url', '')))
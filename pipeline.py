@@ -0,0 +1,255 @@
+"""
+取得・処理・送信を重ねて実行するストリーミングパイプラインモジュール
+記事は取得でき次第処理に回し、処理が終わった記事から順番を保って送信する
+"""
+import logging
+import queue
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from article_store import ArticleStore, STATUS_DELIVERED, STATUS_PROCESSED
+from config import BATCH_API_MAX_ARTICLES, PHRASES_PER_NEWS, PIPELINE_PROCESS_WORKERS, PIPELINE_QUEUE_SIZE
+from line_bot import LineBotSender
+from logging_config import article_context
+from news_processor import NewsProcessor
+from news_source import NewsSource
+from phrase_index import record_delivered
+
+logger = logging.getLogger(__name__)
+
+# ステージ間で終了を知らせる番兵
+_END = object()
+
+
+class PipelineResult(NamedTuple):
+    """パイプラインの実行結果"""
+    scraped: int    # 取得したニュース数
+    delivered: int  # 送信に成功したニュース数
+    total: int      # 配信対象のニュース数（インクリメンタルモードでスキップした記事を除く）
+    success: bool   # 配信対象のニュースをすべて送信できた場合True
+    urls: Tuple[str, ...] = ()  # 取得したニュースのURL（一覧ページの順序、配信済みでスキップした記事を含む）
+
+
+class StreamingPipeline:
+    """取得・処理・送信の各ステージを有界キューでつないで並行に実行するクラス"""
+
+    def __init__(self, scraper: NewsSource, processor: NewsProcessor, line_bot: LineBotSender,
+                 store: Optional[ArticleStore] = None, incremental: bool = False,
+                 process_workers: int = PIPELINE_PROCESS_WORKERS, queue_size: int = PIPELINE_QUEUE_SIZE):
+        """
+        Args:
+            scraper: ニュースの取得元（取得ステージの並列数はソースの設定に従う）
+            processor: 要約・フレーズ生成に使用するプロセッサー
+            line_bot: 送信に使用するLINE Bot
+            store: 処理状況を記録する記事ストア
+            incremental: Trueの場合、配信済みの記事をスキップし処理済みの結果を再利用する
+            process_workers: 処理ステージの並列数
+            queue_size: ステージ間キューの最大長
+        """
+        self.scraper = scraper
+        self.processor = processor
+        self.line_bot = line_bot
+        self.store = store
+        self.incremental = incremental
+        self.process_workers = max(1, process_workers)
+        self.queue_size = max(1, queue_size)
+
+    def run(self, count: int) -> PipelineResult:
+        """
+        パイプラインを実行
+
+        全体の通知は先頭のニュースと一緒に、各ニュースは一覧ページの順序で処理が終わり次第送信する
+        （取得ステージの完了は待たない）。配信件数は取得ステージの完了後に結果で報告する
+
+        Args:
+            count: 取得するニュース数
+
+        Returns:
+            PipelineResult
+        """
+        process_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        send_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        counts: Dict[str, Any] = {'scraped': 0, 'urls': []}
+
+        threads = [threading.Thread(
+            target=self._scrape_stage,
+            args=(count, process_queue, send_queue, counts),
+            name='pipeline-scrape',
+            daemon=True
+        )]
+        threads += [
+            threading.Thread(
+                target=self._process_stage,
+                args=(process_queue, send_queue),
+                name=f'pipeline-process-{i}',
+                daemon=True
+            )
+            for i in range(self.process_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        delivered, total, success = self._send_stage(send_queue)
+
+        for thread in threads:
+            thread.join()
+
+        return PipelineResult(counts['scraped'], delivered, total, success, tuple(counts['urls']))
+
+    def _scrape_stage(self, count: int, process_queue: queue.Queue, send_queue: queue.Queue,
+                      counts: Dict[str, Any]):
+        """ニュースを取得でき次第、処理キューに投入する"""
+        seq = 0
+        try:
+            for news in self.scraper.iter_latest_news(count):
+                counts['scraped'] += 1
+                counts['urls'].append(news.get('url', ''))
+                with article_context(news.get('url', '')):
+                    logger.info("ニュースを取得しました: %s", news['title'])
+
+                    record = self.store.save_scraped(news) if self.store is not None else None
+                    if self.incremental and record and record['status'] == STATUS_DELIVERED:
+                        logger.info("配信済みのためスキップします: %s", news['title'])
+                        continue
+
+                process_queue.put((seq, news, record))
+                seq += 1
+        except Exception as e:
+            logger.error("取得ステージでエラーが発生: %s", e, exc_info=True)
+        finally:
+            # 配信件数を送信ステージに知らせ、処理ワーカーを終了させる
+            send_queue.put(('total', seq, None))
+            for _ in range(self.process_workers):
+                process_queue.put(_END)
+
+    def _process_stage(self, process_queue: queue.Queue, send_queue: queue.Queue):
+        """
+        処理キューのニュースの要約とフレーズを生成し、送信キューに投入する
+
+        取り出した時点でキューに待っているニュースも（BATCH_API_MAX_ARTICLES件まで）まとめて取り出し、
+        一括処理APIを1回だけ呼び出す
+        """
+        while True:
+            item = process_queue.get()
+            if item is _END:
+                break
+
+            batch = [item]
+            finished = False
+            while len(batch) < BATCH_API_MAX_ARTICLES:
+                try:
+                    item = process_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _END:
+                    finished = True
+                    break
+                batch.append(item)
+
+            self._process_batch(batch, send_queue)
+            if finished:
+                break
+
+    def _process_batch(self, batch: List[Tuple[int, dict, Optional[dict]]], send_queue: queue.Queue):
+        """
+        まとめて取り出したニュースを処理し、それぞれの順番（seq）で送信キューに投入する
+
+        途中でエラーが発生しても、送信キューに投入していないニュースは失敗として投入する
+        （送信ステージがそのニュースを待ち続けないようにする）
+        """
+        reported = set()
+        try:
+            pending = []
+            for seq, news, record in batch:
+                with article_context(news.get('url', '')):
+                    if self.incremental and record and record['status'] == STATUS_PROCESSED:
+                        # 前回の実行で生成済みの結果から再開する
+                        logger.info("処理済みの結果を再利用します: %s", news['title'])
+                        self._put_processed(send_queue, seq, news, record['summary'], record['phrases'])
+                        reported.add(seq)
+                    else:
+                        logger.info("ニュースを処理中: %s", news['title'])
+                        pending.append((seq, news))
+
+            if pending:
+                results = self.processor.process_news_batch([news for _, news in pending], PHRASES_PER_NEWS)
+                if len(results) != len(pending):
+                    raise ValueError(f"処理結果の件数が一致しません: {len(results)}件（{len(pending)}件を処理）")
+
+                for (seq, news), result in zip(pending, results):
+                    with article_context(news.get('url', '')):
+                        try:
+                            if self.store is not None:
+                                self.store.save_processed(news['url'], result['summary'], result['phrases'])
+                            self._put_processed(send_queue, seq, news, result['summary'], result['phrases'])
+                        except Exception as e:
+                            logger.error("ニュースの処理中にエラーが発生: %s, %s", news['title'], e, exc_info=True)
+                            send_queue.put(('failed', seq, None))
+                        reported.add(seq)
+        except Exception as e:
+            logger.error("ニュースの処理中にエラーが発生: %s", e, exc_info=True)
+
+        for seq, _, _ in batch:
+            if seq not in reported:
+                send_queue.put(('failed', seq, None))
+
+    def _put_processed(self, send_queue: queue.Queue, seq: int, news: dict, summary: str, phrases: List[str]):
+        send_queue.put(('article', seq, {
+            'title': news['title'],
+            'url': news.get('url', ''),
+            'summary': summary,
+            'phrases': phrases
+        }))
+
+    def _send_stage(self, send_queue: queue.Queue):
+        """
+        処理済みのニュースを一覧ページの順序で送信する
+
+        その時点で順番が揃っているニュース（と未送信の全体の通知）はまとめて1回のpushで送信する。
+        配信件数は取得ステージが完了するまで分からないため、全体の通知には件数を含めない
+
+        Returns:
+            (送信に成功した件数, 配信対象の件数, すべて成功したか)
+        """
+        ready: Dict[int, Optional[dict]] = {}
+        next_seq = 0
+        total = None
+        intro_sent = False
+        delivered = []
+        success = True
+
+        def on_sent(processed: dict):
+            delivered.append(processed)
+            if self.store is not None:
+                self.store.mark_delivered(processed['url'])
+            record_delivered(processed)
+
+        while total is None or next_seq < total:
+            kind, seq, processed = send_queue.get()
+            if kind == 'total':
+                total = seq
+                continue
+            ready[seq] = processed
+
+            # 全体の通知は先頭のニュースと同じpushで送信する
+            groups = []
+            if not intro_sent and next_seq in ready:
+                groups.append((None, self.line_bot.build_intro_messages()))
+                intro_sent = True
+
+            items = []
+            while next_seq in ready:
+                processed = ready.pop(next_seq)
+                next_seq += 1
+                if processed is None:
+                    success = False
+                    continue
+
+                logger.info("ニュース %s を送信中...", next_seq)
+                items.append((next_seq, processed, processed))
+            groups += self.line_bot.build_news_groups(items)
+
+            if groups and not self.line_bot.send_packed(groups, on_sent=on_sent):
+                success = False
+
+        return len(delivered), total, success
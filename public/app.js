@@ -4,31 +4,26 @@ const API_BASE_URL = window.location.origin;
 // ローカルストレージのキー
 const STORAGE_KEY = 'daily-news-data';
 
+// main.pyが書き出すダイジェスト（静的ファイル、ETagで再検証される）
+const DIGEST_URL = `${API_BASE_URL}/digest/latest.json`;
+
 /**
- * ニュース一覧を取得（ローカルストレージから、またはAPIから）
+ * ニュース一覧を取得（ダイジェストから、なければ保存済みの一覧APIから）
+ * 閲覧のたびにスクレイピングやOpenAI APIの呼び出しが発生しないよう、/api/daily-newsは呼び出さない
  */
 async function fetchNewsList() {
     try {
-        // まずローカルストレージから取得を試みる
-        const cachedData = localStorage.getItem(STORAGE_KEY);
-        if (cachedData) {
-            const data = JSON.parse(cachedData);
-            // キャッシュが24時間以内なら使用（1日1回更新なので）
-            const cacheAge = Date.now() - new Date(data.lastUpdated).getTime();
-            const oneDayInMs = 24 * 60 * 60 * 1000; // 24時間
-            if (data.lastUpdated && cacheAge < oneDayInMs) {
-                return data;
-            }
+        // ブラウザのキャッシュはETagで再検証し、変更がなければ304で済ませる
+        let response = await fetch(DIGEST_URL, { cache: 'no-cache' });
+        if (!response.ok) {
+            response = await fetch(`${API_BASE_URL}/api/news-list`, { cache: 'no-cache' });
         }
-
-        // キャッシュがないか古い場合は、daily-news APIを呼び出してデータを取得・処理
-        const response = await fetch(`${API_BASE_URL}/api/daily-news`);
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         const data = await response.json();
         
-        // ローカルストレージに保存
+        // ローカルストレージに保存（取得できない場合の表示用）
         if (data.news && data.news.length > 0) {
             localStorage.setItem(STORAGE_KEY, JSON.stringify(data));
         }
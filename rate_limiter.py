@@ -0,0 +1,57 @@
+"""
+トークンバケット方式のレート制限モジュール
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """一定のレートでトークンを補充し、取得できるまで待機するレートリミッター"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 1秒あたりに補充するトークン数
+            capacity: バケットに貯められるトークン数の上限（バースト量）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        トークンを取得（不足している場合は補充されるまで待機）
+
+        Args:
+            tokens: 取得するトークン数
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(self._blocked_until - now, 0.0)
+                if wait == 0.0:
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return
+                    wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """
+        サーバーから待機を指示された場合（Retry-Afterなど）、指定秒数の間トークンの払い出しを止める
+
+        Args:
+            seconds: 待機する秒数
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def _refill(self, now: float):
+        """経過時間に応じてトークンを補充（ロック取得済みで呼び出す）"""
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
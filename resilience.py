@@ -0,0 +1,284 @@
+"""
+Vercel API呼び出しの再試行・ヘッジ・サーキットブレーカーのモジュール
+一時的なエラー（サーバーレス関数のコールドスタートなど）では再試行し、
+APIが使えない状態が続く場合は以降の呼び出しを止めてすぐにフォールバックできるようにする
+"""
+import logging
+import math
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, Optional, Sequence
+
+import requests
+
+from config import (
+    VERCEL_TIMEOUTS,
+    VERCEL_RETRY_BACKOFF,
+    VERCEL_RUN_DEADLINE,
+    VERCEL_CIRCUIT_FAILURES,
+    VERCEL_HEDGE_ENABLED,
+    VERCEL_HEDGE_DELAY,
+    VERCEL_HEDGE_MIN_DELAY,
+)
+from http_client import HttpClient
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# 再試行するHTTPステータス
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# 追加送信までの待機時間に使う応答時間のパーセンタイルと、それを使い始めるまでに必要な記録数
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 10
+
+# エンドポイントごとに保持する応答時間の記録数
+LATENCY_WINDOW = 100
+
+# 再試行の待機時間の上限（秒）
+MAX_BACKOFF = 10.0
+
+# ヘッジ用スレッドの数（応答しないリクエストが残っていても新しい呼び出しを受け付けられるようにする）
+HEDGE_WORKERS = 8
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """失敗が続いたため呼び出しを止めている"""
+
+
+class DeadlineExceededError(requests.exceptions.Timeout):
+    """実行ごとの呼び出し時間の上限に達した"""
+
+
+class CircuitBreaker:
+    """連続して失敗した場合に、以降の呼び出しを止めるサーキットブレーカー（実行中は閉じ直さない）"""
+
+    def __init__(self, failure_threshold: int = VERCEL_CIRCUIT_FAILURES):
+        """
+        Args:
+            failure_threshold: 呼び出しを止めるまでの連続失敗回数（0以下で無効）
+        """
+        self.failure_threshold = failure_threshold
+        self._failures = 0
+        self._open = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._open
+
+    def record_success(self):
+        """呼び出しの成功を記録（連続失敗回数をリセット）"""
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self) -> bool:
+        """
+        呼び出しの失敗を記録
+
+        Returns:
+            この失敗で呼び出しを止めた場合True
+        """
+        with self._lock:
+            self._failures += 1
+            if self._open or self.failure_threshold <= 0 or self._failures < self.failure_threshold:
+                return False
+            self._open = True
+            return True
+
+
+class LatencyTracker:
+    """エンドポイントごとの最近の応答時間から、追加送信までの待機時間を決める"""
+
+    def __init__(self, default_delay: float = VERCEL_HEDGE_DELAY, min_delay: float = VERCEL_HEDGE_MIN_DELAY):
+        """
+        Args:
+            default_delay: 記録が少ない間の待機時間（秒）
+            min_delay: 待機時間の下限（秒）
+        """
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float):
+        """成功した呼び出しの応答時間を記録"""
+        with self._lock:
+            self._samples[endpoint].append(seconds)
+
+    def hedge_delay(self, endpoint: str) -> float:
+        """
+        追加送信までの待機時間（最近の応答時間のp95、記録が少ない間はdefault_delay）
+
+        Args:
+            endpoint: APIのパス
+
+        Returns:
+            待機時間（秒）
+        """
+        with self._lock:
+            ordered = sorted(self._samples[endpoint])
+        if len(ordered) < HEDGE_MIN_SAMPLES:
+            return max(self.default_delay, self.min_delay)
+        rank = math.ceil(HEDGE_PERCENTILE * len(ordered))
+        return max(ordered[rank - 1], self.min_delay)
+
+
+class ResilientCaller:
+    """試行ごとのタイムアウト・指数バックオフ・ヘッジ・サーキットブレーカー・実行ごとの期限付きでAPIを呼び出す"""
+
+    def __init__(self, http: HttpClient, timeouts: Sequence[float] = VERCEL_TIMEOUTS,
+                 backoff: float = VERCEL_RETRY_BACKOFF, deadline: float = VERCEL_RUN_DEADLINE,
+                 hedge: bool = VERCEL_HEDGE_ENABLED, breaker: Optional[CircuitBreaker] = None,
+                 latency: Optional[LatencyTracker] = None):
+        """
+        Args:
+            http: リクエストに使用するHTTPクライアント
+            timeouts: 試行ごとの読み込みタイムアウト（秒、要素数が最大試行回数）
+            backoff: 再試行の待機時間の基準（秒）
+            deadline: このインスタンスでの呼び出しに使える合計時間（秒、生成時から数える）
+            hedge: 応答が遅い場合に同じリクエストをもう1回送る
+            breaker: サーキットブレーカー（省略時は新規作成）
+            latency: 応答時間の記録（省略時は新規作成）
+        """
+        self.http = http
+        self.timeouts = tuple(timeouts) or (30.0,)
+        self.backoff = backoff
+        self.deadline_at = time.monotonic() + deadline
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = latency or LatencyTracker()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """期限までの残り時間（秒）"""
+        return self.deadline_at - time.monotonic()
+
+    def post(self, url: str, endpoint: str, payload: Dict[str, Any],
+             timeouts: Optional[Sequence[float]] = None) -> requests.Response:
+        """
+        APIにPOSTする（接続エラー・タイムアウト・429・5xxは期限内で再試行）
+
+        Args:
+            url: リクエストURL
+            endpoint: 計測・ヘッジに使うAPIのパス（例: /api/summarize）
+            payload: リクエストのJSONボディ
+            timeouts: 試行ごとの読み込みタイムアウト（省略時はインスタンスの設定）
+
+        Returns:
+            レスポンス（再試行しないステータスはそのまま返す）
+
+        Raises:
+            CircuitOpenError: 失敗が続いたため呼び出しを止めている
+            DeadlineExceededError: 実行ごとの期限に達した
+            requests.exceptions.RequestException: すべての試行が失敗した
+        """
+        metrics = get_metrics()
+        if self.breaker.is_open:
+            metrics.increment('vercel_rejected', endpoint=endpoint, reason='circuit_open')
+            raise CircuitOpenError(f"Vercel APIの呼び出しを停止しています: {endpoint}")
+
+        timeouts = tuple(timeouts or self.timeouts)
+        last_error: Optional[requests.exceptions.RequestException] = None
+        for attempt, tier in enumerate(timeouts):
+            remaining = self.remaining()
+            if remaining <= 0:
+                metrics.increment('vercel_rejected', endpoint=endpoint, reason='deadline')
+                raise DeadlineExceededError(f"Vercel APIの呼び出し期限を過ぎました: {endpoint}") from last_error
+            timeout = min(tier, remaining)
+
+            response = None
+            try:
+                response = self._attempt(url, endpoint, payload, timeout)
+            except requests.exceptions.RequestException as e:
+                last_error = e
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    self.breaker.record_success()
+                    return response
+                last_error = requests.exceptions.HTTPError(
+                    f"{response.status_code} Server Error for url: {url}", response=response
+                )
+                reason = str(response.status_code)
+
+            if attempt == len(timeouts) - 1:
+                break
+            wait_seconds = self._retry_wait(response, attempt)
+            if wait_seconds >= self.remaining():
+                break
+            logger.warning("Vercel APIの呼び出しに失敗しました（%s, %s）。%.1f秒後に再試行します", endpoint, reason, wait_seconds)
+            metrics.increment('vercel_retries', endpoint=endpoint, reason=reason)
+            time.sleep(wait_seconds)
+
+        if self.breaker.record_failure():
+            logger.error("Vercel APIの呼び出しが%s回続けて失敗したため、この実行では呼び出しを停止します", self.breaker.failure_threshold)
+            metrics.increment('vercel_circuit_opened')
+        raise last_error
+
+    def _attempt(self, url: str, endpoint: str, payload: Dict[str, Any], timeout: float) -> requests.Response:
+        """1回分の試行（ヘッジが有効な場合は、応答が遅ければ同じリクエストをもう1回送り、先に返った方を使う）"""
+        if not self.hedge:
+            return self._send(url, endpoint, payload, timeout)
+
+        executor = self._get_executor()
+        futures = [executor.submit(self._send, url, endpoint, payload, timeout)]
+        done, _ = wait(futures, timeout=self.latency.hedge_delay(endpoint))
+        if not done and self.remaining() > 0:
+            get_metrics().increment('vercel_hedges', endpoint=endpoint)
+            futures.append(executor.submit(self._send, url, endpoint, payload, min(timeout, self.remaining())))
+
+        # 成功したレスポンスを優先し、どちらも失敗した場合は最後の結果を使う
+        pending = set(futures)
+        result: Any = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except requests.exceptions.RequestException as e:
+                    result = e
+                    continue
+                if result.status_code not in RETRYABLE_STATUS:
+                    if future is not futures[0]:
+                        get_metrics().increment('vercel_hedge_wins', endpoint=endpoint)
+                    return result
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _send(self, url: str, endpoint: str, payload: Dict[str, Any], timeout: float) -> requests.Response:
+        """リクエストを1回送信し、成功した場合は応答時間を記録"""
+        start = time.perf_counter()
+        response = self.http.post(url, json=payload, timeout=timeout)
+        if response.status_code < 400:
+            self.latency.record(endpoint, time.perf_counter() - start)
+        return response
+
+    def _retry_wait(self, response: Optional[requests.Response], attempt: int) -> float:
+        """再試行までの待機秒数（Retry-Afterヘッダーがあれば優先し、なければフルジッター付き指数バックオフ）"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return max(float(retry_after), 0.0)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * (2 ** attempt)))
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='vercel-hedge')
+            return self._executor
+
+    def close(self):
+        """ヘッジ用のスレッドを終了（応答待ちのリクエストは待たない）"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -0,0 +1,188 @@
+"""
+Vercel API（要約・フレーズ生成）の結果をキャッシュするモジュール
+リクエスト内容のハッシュをキーに、メモリ（LRU）とディスク（SQLite）の2段で保存する
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from config import (
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_TTL,
+    RESULT_CACHE_MEMORY_SIZE,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_BYPASS,
+)
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def make_key(endpoint: str, payload: Dict[str, Any]) -> str:
+    """
+    エンドポイントとリクエスト内容からキャッシュキーを生成
+
+    Args:
+        endpoint: APIのパス（例: /api/summarize）
+        payload: リクエストのJSONボディ（countを含む）
+
+    Returns:
+        SHA-256のキー
+    """
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{endpoint}\n{canonical}".encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """メモリLRUとディスクの2段構成の結果キャッシュ"""
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, ttl: float = RESULT_CACHE_TTL,
+                 memory_size: int = RESULT_CACHE_MEMORY_SIZE, max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 bypass: bool = RESULT_CACHE_BYPASS):
+        """
+        Args:
+            path: ディスクキャッシュ（SQLite）のパス
+            ttl: 有効期限（秒）
+            memory_size: メモリに保持するエントリ数
+            max_entries: ディスクに保持するエントリ数の上限
+            bypass: Trueの場合はキャッシュを参照せず、新しい結果の保存のみ行う
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.bypass = bypass
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(SCHEMA)
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, endpoint: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュされた結果を取得
+
+        Args:
+            endpoint: APIのパス
+            payload: リクエストのJSONボディ
+
+        Returns:
+            キャッシュされたレスポンス（存在しない・期限切れ・バイパス時はNone）
+        """
+        if self.bypass:
+            with self._lock:
+                self.misses += 1
+            get_metrics().increment('cache_lookups', cache='result', result='bypass')
+            return None
+
+        key = make_key(endpoint, payload)
+        now = time.time()
+
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                value, created_at = item
+                if now - created_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    get_metrics().increment('cache_lookups', cache='result', result='memory_hit')
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] < self.ttl:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                self.disk_hits += 1
+                get_metrics().increment('cache_lookups', cache='result', result='disk_hit')
+                return value
+
+            self.misses += 1
+        get_metrics().increment('cache_lookups', cache='result', result='miss')
+        return None
+
+    def set(self, endpoint: str, payload: Dict[str, Any], value: Dict[str, Any]):
+        """
+        結果を保存
+
+        Args:
+            endpoint: APIのパス
+            payload: リクエストのJSONボディ
+            value: APIのレスポンス
+        """
+        key = make_key(endpoint, payload)
+        created_at = time.time()
+
+        with self._lock:
+            self._remember(key, value, created_at)
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO results (key, value, created_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value, ensure_ascii=False), created_at)
+                    )
+                    self._evict_disk(created_at)
+            except sqlite3.Error as e:
+                logger.warning("結果キャッシュへの保存に失敗しました: %s", e)
+
+    def _remember(self, key: str, value: Dict[str, Any], created_at: float):
+        """メモリに保存し、上限を超えた古いエントリを削除（ロック取得済みで呼び出す）"""
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float):
+        """期限切れと上限超過のエントリをディスクから削除（ロック取得済みで呼び出す）"""
+        self._conn.execute("DELETE FROM results WHERE created_at <= ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM results ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        キャッシュの統計情報を取得
+
+        Returns:
+            メモリヒット数・ディスクヒット数・ミス数・ヒット率
+        """
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / total if total else 0.0,
+            }
+
+    def close(self):
+        """データベース接続を閉じる"""
+        with self._lock:
+            self._conn.close()
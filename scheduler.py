@@ -0,0 +1,328 @@
+"""
+常駐して決まった時刻にDaily Newsを配信するスケジューラーモジュール
+
+配信時刻（cron形式）の前にニュースの取得・要約・フレーズ生成を済ませておき、
+配信時刻にはLINEへの送信だけを行う。HTTPセッションはプロセス内で使い回すため、
+毎回プロセスを起動する場合と違ってモジュールの読み込みや接続の確立を待たない
+"""
+import json
+import logging
+import signal
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set
+from zoneinfo import ZoneInfo
+
+from config import (
+    INCREMENTAL_MODE,
+    DAEMON_SCHEDULE,
+    DAEMON_TIMEZONE,
+    DAEMON_PREFETCH_LEAD,
+    DAEMON_WARMUP_LEAD,
+    DAEMON_HEALTH_HOST,
+    DAEMON_HEALTH_PORT,
+    HTTP_CAPTURE_DIR,
+)
+from http_client import get_http_client
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# cron式の各フィールドの範囲（分, 時, 日, 月, 曜日）
+_FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+_MONTH_NAMES = {name: i for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+_WEEKDAY_NAMES = {name: i for i, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+# 次の実行時刻を探す期間の上限（2月29日のみの指定なども見つけられる長さ）
+_SEARCH_LIMIT = timedelta(days=366 * 5)
+
+
+class CronSchedule:
+    """cron形式（分 時 日 月 曜日）の実行時刻をタイムゾーン付きで求めるクラス"""
+
+    def __init__(self, expression: str = DAEMON_SCHEDULE, timezone: str = DAEMON_TIMEZONE):
+        """
+        Args:
+            expression: cron式（例: '0 18 * * *'、'*/15 9-17 * * mon-fri'）
+            timezone: 時刻を解釈するタイムゾーン（例: 'Asia/Tokyo'）
+
+        Raises:
+            ValueError: cron式を解釈できない場合
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron式は5つのフィールドで指定してください: {expression!r}")
+
+        self.expression = expression
+        self.tz = ZoneInfo(timezone)
+        names = [None, None, None, _MONTH_NAMES, _WEEKDAY_NAMES]
+        self.minutes, self.hours, self.days, self.months, weekdays = [
+            self._parse_field(field, low, high, name_map)
+            for field, (low, high), name_map in zip(fields, _FIELD_RANGES, names)
+        ]
+        # 曜日の7は日曜日（0）として扱う
+        self.weekdays = {day % 7 for day in weekdays}
+        # 日と曜日の両方を指定した場合は、どちらかに一致すれば実行する（cronと同じ）
+        self._day_restricted = not fields[2].startswith('*')
+        self._weekday_restricted = not fields[4].startswith('*')
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int, names: Optional[Dict[str, int]]) -> Set[int]:
+        def value(text: str) -> int:
+            return names[text] if names and text in names else int(text)
+
+        values: Set[int] = set()
+        for part in field.lower().split(','):
+            value_range, _, step_text = part.partition('/')
+            step = int(step_text) if step_text else 1
+            if value_range == '*':
+                start, end = low, high
+            else:
+                start_text, _, end_text = value_range.partition('-')
+                start = value(start_text)
+                if end_text:
+                    end = value(end_text)
+                else:
+                    # '5/15' は5から範囲の終わりまで15おき
+                    end = high if step_text else start
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"cron式のフィールドが範囲外です: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, day: datetime) -> bool:
+        day_match = day.day in self.days
+        weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+        if self._day_restricted and self._weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_after(self, after: datetime) -> datetime:
+        """
+        指定時刻より後の次の実行時刻
+
+        Args:
+            after: 基準の時刻（タイムゾーン付き）
+
+        Returns:
+            次の実行時刻（スケジュールのタイムゾーン付き）
+        """
+        local = after.astimezone(self.tz).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = local + _SEARCH_LIMIT
+        while local < limit:
+            if local.month not in self.months:
+                local = (local.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(local):
+                local = local.replace(hour=0, minute=0) + timedelta(days=1)
+            elif local.hour not in self.hours:
+                local = local.replace(minute=0) + timedelta(hours=1)
+            elif local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+            else:
+                return local.replace(tzinfo=self.tz)
+        raise ValueError(f"実行時刻が見つかりません: {self.expression!r}")
+
+
+class DailyNewsDaemon:
+    """配信時刻の前に取得・要約を済ませておき、配信時刻に送信だけを行う常駐プロセス"""
+
+    def __init__(self, schedule: Optional[CronSchedule] = None, prefetch_lead: float = DAEMON_PREFETCH_LEAD,
+                 warmup_lead: float = DAEMON_WARMUP_LEAD, incremental: bool = INCREMENTAL_MODE,
+                 health_host: str = DAEMON_HEALTH_HOST, health_port: int = DAEMON_HEALTH_PORT):
+        """
+        Args:
+            schedule: 配信時刻（省略時は設定に従う）
+            prefetch_lead: 配信時刻の何秒前に取得・要約を始めるか
+            warmup_lead: 配信時刻の何秒前にLINE APIへ接続しておくか
+            incremental: 配信済みで本文が変わっていない記事をスキップする
+            health_host: ヘルスチェック・状態確認エンドポイントのアドレス
+            health_port: ヘルスチェック・状態確認エンドポイントのポート（0で無効）
+        """
+        self.schedule = schedule or CronSchedule()
+        self.prefetch_lead = prefetch_lead
+        self.warmup_lead = warmup_lead
+        self.incremental = incremental
+        self.health_host = health_host
+        self.health_port = health_port
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._status: Dict[str, Any] = {
+            'state': 'starting',
+            'started_at': datetime.now(self.schedule.tz).isoformat(),
+            'schedule': self.schedule.expression,
+            'timezone': str(self.schedule.tz),
+            'next_delivery': None,
+            'prefetched': None,
+            'last_run': None,
+        }
+
+    def run(self):
+        """停止を指示されるまで、配信時刻ごとに取得・要約と送信を繰り返す"""
+        self._install_signal_handlers()
+        self._start_health_server()
+        logger.info("常駐モードで起動しました（配信時刻: %s %s）", self.schedule.expression, self.schedule.tz)
+        try:
+            while not self._stop.is_set():
+                scheduled_at = self.schedule.next_after(datetime.now(self.schedule.tz))
+                self._update_status(next_delivery=scheduled_at.isoformat())
+                self._run_once(scheduled_at)
+        finally:
+            self._update_status(state='stopped')
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+            get_http_client().close()
+            logger.info("常駐モードを終了しました")
+
+    def stop(self):
+        """実行中の処理が終わった時点で終了する"""
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        """現在の状態（状態確認エンドポイントの応答）"""
+        with self._lock:
+            return dict(self._status)
+
+    def _run_once(self, scheduled_at: datetime):
+        """1回分の配信（配信時刻の前に取得・要約し、配信時刻に送信する）"""
+        # mainから起動されるため、配信処理（main）はここで読み込む
+        from article_store import ArticleStore
+        from line_bot import LineBotSender
+        from main import deliver_news, open_subscribers, prepare_news
+
+        self._update_status(state='waiting')
+        if not self._wait_until(scheduled_at - timedelta(seconds=self.prefetch_lead)):
+            return
+
+        metrics = get_metrics()
+        metrics.reset()
+        if HTTP_CAPTURE_DIR:
+            from http_recorder import capture_path, start_recording
+            start_recording(capture_path(metrics.run_id))
+        attempted = False
+        success = False
+        store = ArticleStore()
+        subscribers = open_subscribers()
+        try:
+            self._update_status(state='prefetching')
+            logger.info("%sの配信に向けてニュースを取得・処理します", scheduled_at.strftime('%Y-%m-%d %H:%M'))
+            processed_news = self._prepare(prepare_news, store)
+            self._update_status(state='ready', prefetched=None if processed_news is None else len(processed_news))
+
+            line_bot = LineBotSender()
+            if not self._wait_until(scheduled_at - timedelta(seconds=self.warmup_lead)):
+                return
+            line_bot.warm_up()
+            if not self._wait_until(scheduled_at):
+                return
+
+            attempted = True
+            self._update_status(state='delivering')
+            if processed_news is None:
+                # 事前の取得に失敗した場合は配信時刻にもう一度取得する
+                logger.warning("事前の取得に失敗したため、もう一度取得してから送信します")
+                processed_news = self._prepare(prepare_news, store)
+
+            if processed_news is None:
+                success = False
+            elif not processed_news:
+                logger.info("新しいニュースはありませんでした")
+                success = True
+            else:
+                with metrics.span('deliver') as span:
+                    success = deliver_news(
+                        store, processed_news, line_bot=line_bot,
+                        subscribers=subscribers if subscribers.count() > 0 else None
+                    )
+                    lag = (datetime.now(self.schedule.tz) - scheduled_at).total_seconds()
+                    span['lag'] = lag
+                logger.info("配信時刻から%.2f秒で送信を完了しました", lag)
+        except Exception as e:
+            logger.error("予期しないエラーが発生しました: %s", e, exc_info=True)
+        finally:
+            store.close()
+            subscribers.close()
+            if HTTP_CAPTURE_DIR:
+                from http_recorder import stop_recording
+                stop_recording()
+            self._update_status(state='idle', prefetched=None)
+            if attempted:
+                report = metrics.export(success)
+                if report is not None:
+                    metrics.log_summary(report)
+                self._update_status(last_run={
+                    'scheduled_at': scheduled_at.isoformat(),
+                    'finished_at': datetime.now(self.schedule.tz).isoformat(),
+                    'success': success,
+                })
+
+    def _prepare(self, prepare_news, store) -> Optional[List[dict]]:
+        try:
+            return prepare_news(store, self.incremental)
+        except Exception as e:
+            logger.error("ニュースの取得・処理中にエラーが発生しました: %s", e, exc_info=True)
+            return None
+
+    def _wait_until(self, when: datetime) -> bool:
+        """
+        指定時刻まで待機（停止を指示された場合はすぐに戻る）
+
+        Returns:
+            指定時刻に達した場合True、停止を指示された場合False
+        """
+        while not self._stop.is_set():
+            remaining = (when - datetime.now(self.schedule.tz)).total_seconds()
+            if remaining <= 0:
+                return True
+            # 時計の変更やスリープからの復帰に追従するため、長い待機は分割する
+            self._stop.wait(min(remaining, 60))
+        return False
+
+    def _update_status(self, **values):
+        with self._lock:
+            self._status.update(values)
+
+    def _install_signal_handlers(self):
+        """SIGTERM・SIGINTで、実行中の処理が終わった時点で終了する"""
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def handle(signum, frame):
+            logger.info("終了シグナル（%s）を受信しました。実行中の処理が終わり次第終了します", signal.Signals(signum).name)
+            self.stop()
+
+        signal.signal(signal.SIGTERM, handle)
+        signal.signal(signal.SIGINT, handle)
+
+    def _start_health_server(self):
+        """/healthz（生存確認）と /status（状態）を返すHTTPサーバーを別スレッドで起動"""
+        if not self.health_port:
+            return
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path == '/healthz':
+                    status, body = 200, {'status': 'ok'}
+                elif path == '/status':
+                    status, body = 200, daemon.status()
+                else:
+                    status, body = 404, {'error': 'Not found'}
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.health_host, self.health_port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='daemon-health', daemon=True).start()
+        logger.info("状態確認エンドポイント: http://%s:%s/status", self.health_host, self._server.server_address[1])
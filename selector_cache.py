@@ -0,0 +1,180 @@
+"""
+ホスト・ページ種別ごとに成功したセレクタを記憶するモジュール
+記憶したセレクタを最初に試すことで、ほとんどのページを1回のセレクタ評価で抽出できるようにする
+"""
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from config import SELECTOR_CACHE_PATH, SELECTOR_CACHE_RELEARN_MISSES
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+_DIGIT_PATTERN = re.compile(r'\d')
+
+
+def page_template(url: str) -> str:
+    """
+    URLからページ種別（ホストとパスのテンプレート）を求める
+
+    数字を含むパス要素は :id に、それ以降の要素（記事のスラッグなど）は :slug に置き換える
+    例: https://eikaiwa.dmm.com/app/daily-news/article/1234/some-title
+        → eikaiwa.dmm.com/app/daily-news/article/:id/:slug
+
+    Args:
+        url: ページのURL
+
+    Returns:
+        ページ種別を表す文字列
+    """
+    parsed = urlparse(url)
+    segments = []
+    after_id = False
+    for segment in parsed.path.split('/'):
+        if not segment:
+            continue
+        if after_id:
+            segments.append(':slug')
+        elif _DIGIT_PATTERN.search(segment):
+            segments.append(':id')
+            after_id = True
+        else:
+            segments.append(segment)
+    return parsed.netloc + '/' + '/'.join(segments)
+
+
+class SelectorCache:
+    """ページ種別ごとに最後に成功したセレクタを記憶し、連続して失敗した場合は学習し直すキャッシュ"""
+
+    def __init__(self, path: str = SELECTOR_CACHE_PATH, relearn_misses: int = SELECTOR_CACHE_RELEARN_MISSES):
+        """
+        Args:
+            path: 学習結果を保存するJSONファイルのパス
+            relearn_misses: 記憶したセレクタがこの回数連続して失敗したら、成功したセレクタに置き換える
+        """
+        self.path = path
+        self.relearn_misses = max(1, relearn_misses)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.relearned = 0
+
+        self._load()
+
+    @staticmethod
+    def key(kind: str, url: str) -> str:
+        """
+        キャッシュのキーを生成
+
+        Args:
+            kind: 抽出対象の種類（'listing' または 'content'）
+            url: ページのURL
+
+        Returns:
+            キャッシュのキー
+        """
+        return f"{kind}:{page_template(url)}"
+
+    def _load(self):
+        """学習結果を読み込む（壊れている場合は空から始める）"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            self._entries = {}
+        except Exception as e:
+            logger.warning("セレクタキャッシュを読み込めませんでした: %s", e)
+            self._entries = {}
+
+    def save(self):
+        """学習結果に変更があればアトミックに書き込む"""
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def preferred(self, key: str) -> Optional[str]:
+        """
+        最初に試すセレクタを取得
+
+        Args:
+            key: キャッシュのキー
+
+        Returns:
+            記憶しているセレクタ（未学習の場合はNone）
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['selector'] if entry else None
+
+    def record(self, key: str, preferred: Optional[str], matched: Optional[str]):
+        """
+        抽出結果を記録し、必要に応じてセレクタを学習する
+
+        Args:
+            key: キャッシュのキー
+            preferred: 最初に試したセレクタ（preferredで取得した値）
+            matched: 実際に抽出できたセレクタ（抽出できなかった場合はNone）
+        """
+        hit = preferred is not None and matched == preferred
+        get_metrics().increment('cache_lookups', cache='selector', result='hit' if hit else 'miss')
+        with self._lock:
+            entry = self._entries.get(key)
+            if hit:
+                self.hits += 1
+                if entry and entry['misses']:
+                    entry['misses'] = 0
+                    self._dirty = True
+                return
+
+            self.misses += 1
+            if matched is None:
+                return
+
+            if entry is None:
+                # 未学習: 成功したセレクタをそのまま記憶する
+                self._entries[key] = self._new_entry(matched)
+            else:
+                # 1回の失敗では置き換えず、連続して失敗した場合に学習し直す
+                entry['misses'] += 1
+                if entry['misses'] >= self.relearn_misses:
+                    logger.info("セレクタを学習し直しました: %s %r → %r", key, entry['selector'], matched)
+                    self._entries[key] = self._new_entry(matched)
+                    self.relearned += 1
+            self._dirty = True
+
+    @staticmethod
+    def _new_entry(selector: str) -> Dict[str, Any]:
+        return {'selector': selector, 'misses': 0, 'learned_at': datetime.now().isoformat()}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        キャッシュの統計情報を取得
+
+        Returns:
+            ヒット数・ミス数・ヒット率・学習し直した回数・エントリ数
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'relearned': self.relearned,
+                'entries': len(self._entries),
+            }
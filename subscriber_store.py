@@ -0,0 +1,204 @@
+"""
+配信先（購読者）リストと配信結果を管理するモジュール
+購読者ID・ダイジェストごとの配信状況（失敗時の再送キュー）をSQLiteに記録する
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import SUBSCRIBERS_DB_PATH, FANOUT_MAX_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+# 配信状況
+DELIVERY_PENDING = 'pending'
+DELIVERY_DELIVERED = 'delivered'
+DELIVERY_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscribers (
+    user_id TEXT PRIMARY KEY,
+    active INTEGER NOT NULL DEFAULT 1,
+    added_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS digests (
+    digest_id TEXT PRIMARY KEY,
+    messages TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    digest_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    chunks_sent INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (digest_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS deliveries_status ON deliveries (digest_id, status);
+"""
+
+
+class SubscriberStore:
+    """購読者リストとダイジェストごとの配信状況を記録するSQLiteストア"""
+
+    def __init__(self, path: str = SUBSCRIBERS_DB_PATH):
+        """
+        Args:
+            path: SQLiteデータベースのパス
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def add(self, user_ids: Iterable[str]) -> int:
+        """
+        購読者を追加（登録済みの場合は有効化）
+
+        Args:
+            user_ids: LINEのユーザーID
+
+        Returns:
+            処理した件数
+        """
+        now = datetime.now().isoformat()
+        rows = [(user_id.strip(), now) for user_id in user_ids if user_id.strip()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO subscribers (user_id, active, added_at) VALUES (?, 1, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET active = 1",
+                rows
+            )
+        return len(rows)
+
+    def import_file(self, path: str) -> int:
+        """
+        1行に1つのユーザーIDを記載したファイルから購読者を追加（#で始まる行は無視）
+
+        Args:
+            path: ファイルのパス
+
+        Returns:
+            処理した件数
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            user_ids = [line for line in f if line.strip() and not line.lstrip().startswith('#')]
+        return self.add(user_ids)
+
+    def remove(self, user_ids: Iterable[str]):
+        """購読者を無効化"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE subscribers SET active = 0 WHERE user_id = ?",
+                [(user_id,) for user_id in user_ids]
+            )
+
+    def count(self) -> int:
+        """有効な購読者数を取得"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM subscribers WHERE active = 1").fetchone()[0]
+
+    def save_digest(self, digest_id: str, messages: List[dict]):
+        """
+        ダイジェストを登録し、有効な購読者全員を配信待ちにする（登録済みの場合は何もしない）
+
+        Args:
+            digest_id: ダイジェストのID
+            messages: 配信するメッセージオブジェクトのリスト
+        """
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO digests (digest_id, messages, created_at) VALUES (?, ?, ?)",
+                (digest_id, json.dumps(messages, ensure_ascii=False), now)
+            )
+            if cursor.rowcount:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO deliveries (digest_id, user_id, status, attempts, updated_at) "
+                    "SELECT ?, user_id, ?, 0, ? FROM subscribers WHERE active = 1",
+                    (digest_id, DELIVERY_PENDING, now)
+                )
+
+    def get_digest(self, digest_id: str) -> Optional[List[dict]]:
+        """ダイジェストのメッセージオブジェクトを取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT messages FROM digests WHERE digest_id = ?", (digest_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def pending_recipients(self, digest_id: str, max_attempts: int = FANOUT_MAX_ATTEMPTS) -> List[Tuple[str, int]]:
+        """
+        未配信（配信待ち・再送待ち）の購読者を取得
+
+        Args:
+            digest_id: ダイジェストのID
+            max_attempts: この回数以上失敗した購読者は除外する
+
+        Returns:
+            (ユーザーID, 送信済みのリクエスト数) のリスト
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, chunks_sent FROM deliveries "
+                "WHERE digest_id = ? AND status != ? AND attempts < ? ORDER BY user_id",
+                (digest_id, DELIVERY_DELIVERED, max_attempts)
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def digests_with_pending(self, max_attempts: int = FANOUT_MAX_ATTEMPTS) -> List[str]:
+        """再送待ちの購読者が残っているダイジェストIDを古い順に取得"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.digest_id FROM digests d WHERE EXISTS ("
+                "SELECT 1 FROM deliveries v WHERE v.digest_id = d.digest_id AND v.status = ? AND v.attempts < ?) "
+                "ORDER BY d.created_at",
+                (DELIVERY_FAILED, max_attempts)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def record_results(self, digest_id: str, user_ids: List[str], delivered: bool, chunks_sent: int,
+                       error: Optional[str] = None):
+        """
+        配信結果を記録
+
+        Args:
+            digest_id: ダイジェストのID
+            user_ids: 対象のユーザーID
+            delivered: 配信に成功した場合True
+            chunks_sent: 送信済みのリクエスト数（再送時はこの続きから送信する）
+            error: 失敗時のエラー内容
+        """
+        now = datetime.now().isoformat()
+        status = DELIVERY_DELIVERED if delivered else DELIVERY_FAILED
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE deliveries SET status = ?, attempts = attempts + 1, chunks_sent = ?, "
+                "last_error = ?, updated_at = ? WHERE digest_id = ? AND user_id = ?",
+                [(status, chunks_sent, error, now, digest_id, user_id) for user_id in user_ids]
+            )
+
+    def delivery_stats(self, digest_id: str) -> Dict[str, int]:
+        """ダイジェストの配信状況ごとの件数を取得"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM deliveries WHERE digest_id = ? GROUP BY status",
+                (digest_id,)
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        """データベース接続を閉じる"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,179 @@
+"""
+ローカルの抽出型要約モジュール（ネットワーク不要）
+文をTF-IDFベクトルにし、文どうしの類似度グラフのTextRankで重要な文を選ぶ。
+/api/summarizeに送る本文の圧縮と、APIが使えない場合の簡易要約に使用する
+"""
+import importlib.util
+import logging
+import re
+from typing import List, Optional
+
+from config import SUMMARIZER_FALLBACK_SENTENCES
+
+logger = logging.getLogger(__name__)
+
+# numpyは読み込みに時間がかかるため、最初に文の重要度を計算するときに読み込む（ない場合は先頭の文から選ぶ）
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+# 文の区切り（文末記号と空白の後に大文字・数字・引用符が続く位置、または段落が空白なしで連結された位置）
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?。！？])\s+(?=["\'“‘(A-Z0-9])|(?<=[a-z][.!?])(?=[A-Z][a-z])|(?<=[。！？])')
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# 文末記号の直後でも文を区切らない略語
+_ABBREVIATIONS = {'mr', 'mrs', 'ms', 'dr', 'prof', 'st', 'jr', 'sr', 'vs', 'etc', 'inc', 'ltd', 'co', 'no', 'u.s', 'u.k', 'e.g', 'i.e'}
+
+_STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only or other
+our ours ourselves out over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours yourself yourselves said says also
+""".split())
+
+# TextRankの設定
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+
+# これより短い文は要約に含めない（見出しの断片など）
+MIN_SENTENCE_LENGTH = 20
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    テキストを文に分割
+
+    Args:
+        text: 本文
+
+    Returns:
+        文のリスト（前後の空白を除去済み）
+    """
+    sentences: List[str] = []
+    for part in _SENTENCE_BOUNDARY.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        # 略語（Mr. や U.S. など）で区切られた場合は前の文につなげる
+        if sentences:
+            last_word = sentences[-1].rsplit(None, 1)[-1].rstrip('.').lower()
+            if last_word in _ABBREVIATIONS:
+                sentences[-1] = f"{sentences[-1]} {part}"
+                continue
+        sentences.append(part)
+    return sentences
+
+
+def _tokenize(sentence: str) -> List[str]:
+    return [word for word in _WORD.findall(sentence.lower()) if word not in _STOP_WORDS]
+
+
+class ExtractiveSummarizer:
+    """TF-IDFとTextRankで重要な文を選ぶ抽出型要約"""
+
+    def __init__(self, max_sentences: int = SUMMARIZER_FALLBACK_SENTENCES):
+        """
+        Args:
+            max_sentences: summarizeで選ぶ文の数の既定値
+        """
+        self.max_sentences = max_sentences
+        if not HAS_NUMPY:
+            logger.warning("numpyがインストールされていないため、先頭の文を要約として使用します")
+
+    def summarize(self, text: str, max_sentences: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+        """
+        重要な文を元の順序のまま連結して要約を作成
+
+        Args:
+            text: 本文
+            max_sentences: 選ぶ文の数の上限（省略時はインスタンスの設定）
+            max_chars: 要約の文字数の上限（省略時は制限なし）
+
+        Returns:
+            要約（文に分割できない場合は空文字列）
+        """
+        sentences = [s for s in split_sentences(text) if len(s) >= MIN_SENTENCE_LENGTH]
+        if not sentences:
+            return ''
+        limit = max_sentences if max_sentences is not None else self.max_sentences
+        if max_chars is None and len(sentences) <= limit:
+            return ' '.join(sentences)
+
+        ranking = self._ranking(sentences)
+        selected: List[int] = []
+        length = 0
+        for index in ranking:
+            if len(selected) >= limit:
+                break
+            added = len(sentences[index]) + (1 if selected else 0)
+            if max_chars is not None and length + added > max_chars:
+                continue
+            selected.append(index)
+            length += added
+
+        if not selected:
+            # 最も重要な文も上限を超える場合は文の途中で切る
+            return sentences[ranking[0]][:max_chars]
+        return ' '.join(sentences[i] for i in sorted(selected))
+
+    def condense(self, text: str, max_chars: int) -> str:
+        """
+        本文を重要な文だけに圧縮（max_chars以下の場合はそのまま返す）
+
+        Args:
+            text: 本文
+            max_chars: 圧縮後の文字数の上限
+
+        Returns:
+            圧縮した本文
+        """
+        if len(text) <= max_chars:
+            return text
+        condensed = self.summarize(text, max_sentences=len(text), max_chars=max_chars)
+        return condensed or text[:max_chars]
+
+    def _ranking(self, sentences: List[str]) -> List[int]:
+        """文のインデックスを重要度の高い順に返す（同点の場合は前の文を優先）"""
+        if not HAS_NUMPY or len(sentences) < 3:
+            return list(range(len(sentences)))
+        scores = self._textrank(self._tfidf(sentences))
+        return sorted(range(len(sentences)), key=lambda i: (-scores[i], i))
+
+    def _tfidf(self, sentences: List[str]) -> 'np.ndarray':
+        """文ごとのTF-IDFベクトル（L2正規化済み、文数×語彙数）"""
+        import numpy as np
+        tokenized = [_tokenize(sentence) for sentence in sentences]
+        vocabulary = {}
+        rows, cols = [], []
+        for row, tokens in enumerate(tokenized):
+            for token in tokens:
+                rows.append(row)
+                cols.append(vocabulary.setdefault(token, len(vocabulary)))
+
+        counts = np.zeros((len(sentences), max(len(vocabulary), 1)))
+        np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1.0)
+
+        document_frequency = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1.0
+        weights = counts * idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        return weights / np.where(norms == 0, 1.0, norms)
+
+    def _textrank(self, vectors: 'np.ndarray') -> 'np.ndarray':
+        """コサイン類似度を重みとするグラフでのPageRank（べき乗法）"""
+        import numpy as np
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, 0.0)
+        out_weight = similarity.sum(axis=1, keepdims=True)
+        # どの文とも似ていない文は全体に均等に遷移させる
+        n = len(similarity)
+        transition = np.where(out_weight > 0, similarity / np.where(out_weight == 0, 1.0, out_weight), 1.0 / n)
+
+        scores = np.full(n, 1.0 / n)
+        for _ in range(MAX_ITERATIONS):
+            updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+            if np.abs(updated - scores).sum() < TOLERANCE:
+                return updated
+            scores = updated
+        return scores
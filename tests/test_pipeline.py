@@ -0,0 +1,143 @@
+"""
+ストリーミングパイプラインのテスト
+
+LINE・Vercel APIには接続せず、送信（send_packed）と処理（process_news_batch）を置き換えて実行する
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pipeline  # noqa: E402
+from line_bot import LineBotSender  # noqa: E402
+from news_source import NewsSource  # noqa: E402
+from pipeline import StreamingPipeline  # noqa: E402
+
+
+def make_news(i: int) -> dict:
+    return {'title': f'News {i}', 'url': f'https://example.com/news/{i}', 'content': 'Body.', 'date': ''}
+
+
+class SlowSource(NewsSource):
+    """1件目をすぐに返し、その後は取得の完了をfinishedが設定されるまで待つソース"""
+
+    name = 'slow'
+
+    def __init__(self, wait: float):
+        self.wait = wait
+        self.finished = threading.Event()
+
+    def iter_latest_news(self, count: int = 3):
+        yield make_news(0)
+        time.sleep(self.wait)
+        self.finished.set()
+
+
+class ListSource(NewsSource):
+    name = 'list'
+
+    def __init__(self, news_list):
+        self.news_list = news_list
+
+    def iter_latest_news(self, count: int = 3):
+        yield from self.news_list[:count]
+
+
+class FakeProcessor:
+    def __init__(self, drop_last: bool = False):
+        self.drop_last = drop_last
+
+    def process_news_batch(self, news_list, count):
+        results = [{'summary': f"Summary of {news['title']}", 'phrases': ['Phrase']} for news in news_list]
+        return results[:-1] if self.drop_last else results
+
+
+class RecordingLineBot(LineBotSender):
+    """送信せず、send_packedが呼ばれた時点とメッセージを記録するLINE Bot"""
+
+    def __init__(self, source=None):
+        super().__init__()
+        self.source = source
+        self.pushes = []
+
+    def send_packed(self, groups, on_sent=None):
+        finished = self.source.finished.is_set() if self.source is not None else None
+        self.pushes.append((finished, groups))
+        if on_sent:
+            for key, _ in groups:
+                for item in key if isinstance(key, list) else [key]:
+                    if item is not None:
+                        on_sent(item)
+        return True
+
+
+class FakeStore:
+    def __init__(self, record):
+        self.record = record
+
+    def save_scraped(self, news):
+        return dict(self.record, url=news['url'])
+
+    def save_processed(self, url, summary, phrases):
+        pass
+
+    def mark_delivered(self, url):
+        pass
+
+
+class StreamingPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        # 配信したフレーズをインデックス（data/phrases.db）に記録しない
+        patcher = mock.patch.object(pipeline, 'record_delivered')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_pipeline(self, pipe: StreamingPipeline, count: int, timeout: float = 10):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(pipe.run(count)), daemon=True)
+        thread.start()
+        thread.join(timeout)
+        self.assertFalse(thread.is_alive(), 'パイプラインが終了しません')
+        return results[0]
+
+    def test_first_article_is_pushed_before_scrape_finishes(self):
+        source = SlowSource(wait=1.0)
+        line_bot = RecordingLineBot(source)
+        result = self.run_pipeline(StreamingPipeline(source, FakeProcessor(), line_bot), 3)
+
+        self.assertTrue(line_bot.pushes)
+        finished, groups = line_bot.pushes[0]
+        self.assertFalse(finished, '取得ステージの完了前に送信されていません')
+        # 全体の通知と先頭のニュースが同じpushで送信される
+        self.assertIsNone(groups[0][0])
+        self.assertEqual(result.delivered, 1)
+        self.assertEqual(result.total, 1)
+        self.assertTrue(result.success)
+
+    def test_reused_record_without_phrases_fails_instead_of_hanging(self):
+        store = FakeStore({'status': pipeline.STATUS_PROCESSED, 'summary': 'Stored summary'})
+        line_bot = RecordingLineBot()
+        pipe = StreamingPipeline(ListSource([make_news(0)]), FakeProcessor(), line_bot, store=store, incremental=True)
+        result = self.run_pipeline(pipe, 1)
+
+        self.assertEqual(result.total, 1)
+        self.assertEqual(result.delivered, 0)
+        self.assertFalse(result.success)
+
+    def test_short_batch_result_fails_missing_articles(self):
+        line_bot = RecordingLineBot()
+        pipe = StreamingPipeline(ListSource([make_news(i) for i in range(3)]), FakeProcessor(drop_last=True), line_bot)
+        result = self.run_pipeline(pipe, 3)
+
+        self.assertEqual(result.total, 3)
+        self.assertEqual(result.delivered, 0)
+        self.assertFalse(result.success)
+
+
+if __name__ == '__main__':
+    unittest.main()